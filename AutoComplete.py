@@ -6,6 +6,8 @@ a window with all available names, for the user to select from.
 import os
 import sys
 import string
+import threading
+from collections import ChainMap, OrderedDict
 
 from idlelib.configHandler import idleConf
 
@@ -16,6 +18,7 @@ ID_CHARS = string.ascii_letters + string.digits + "_"
 COMPLETE_ATTRIBUTES, COMPLETE_FILES = range(1, 2+1)
 
 from idlelib import AutoCompleteWindow
+from idlelib import CodeIndex
 from idlelib.HyperParser import HyperParser
 
 import __main__
@@ -24,6 +27,71 @@ SEPS = os.sep
 if os.altsep:  # e.g. '/' on Windows...
     SEPS += os.altsep
 
+CACHE_SIZE = 64  # Attribute completion lists kept by each AutoComplete.
+
+# Bumped whenever user code may have changed the namespace, which makes
+# cached completion lists stale.
+namespace_version = 0
+
+def namespace_changed():
+    "Note that user code has run, so that completion lists are rebuilt."
+    global namespace_version
+    namespace_version += 1
+
+LISTING_WAIT = 0.05  # Seconds to wait for a directory before showing a part.
+LISTING_LIMIT = 10000  # Most names read from one directory.
+LISTINGS_KEPT = 32  # Directory listings cached.
+LISTING_REFRESH = 100  # Milliseconds between refreshes of a partial list.
+
+class Listing:
+    "The names in a directory, read by a background thread."
+
+    def __init__(self, path):
+        self.path = path
+        self.names = []
+        self.done = threading.Event()
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def read(self):
+        names = self.names
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    names.append(entry.name)
+                    if len(names) >= LISTING_LIMIT:
+                        break
+        except OSError:
+            pass
+        finally:
+            self.done.set()
+
+_listings = OrderedDict()  # Listing by (path, mtime).
+_listings_lock = threading.Lock()
+
+def list_directory(path, wait=LISTING_WAIT):
+    """Return the names in directory path read so far, and whether that is
+    all of them.
+
+    A directory is read once until its modification time changes; the
+    first call waits at most wait seconds for it.  Only the first
+    LISTING_LIMIT names are read.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return [], True
+    key = path, mtime
+    with _listings_lock:
+        listing = _listings.get(key)
+        if listing is None:
+            listing = _listings[key] = Listing(path)
+            if len(_listings) > LISTINGS_KEPT:
+                _listings.popitem(last=False)
+        else:
+            _listings.move_to_end(key)
+    listing.done.wait(wait)
+    return listing.names[:], listing.done.is_set()
+
 class AutoComplete:
 
     menudefs = [
@@ -37,6 +105,10 @@ class AutoComplete:
 
     def __init__(self, editwin=None):
         self.editwin = editwin
+        # Attribute completion lists by the expression completed, or ""
+        # for names.  Cleared when namespace_version changes.
+        self.cache = OrderedDict()
+        self.cache_version = namespace_version
         if editwin is None:  # subprocess and test
             return
         self.text = editwin.text
@@ -156,13 +228,34 @@ class AutoComplete:
 
         if complete and not comp_what and not comp_start:
             return
-        comp_lists = self.fetch_completions(comp_what, mode)
+        done = True
+        if mode == COMPLETE_FILES:
+            smalll, bigl, done = self.fetch_file_completions(comp_what)
+            comp_lists = smalll, bigl
+            # Don't complete from part of a directory.
+            complete = complete and done
+        else:
+            comp_lists = self.fetch_completions(comp_what, mode)
         if not comp_lists[0]:
             return
-        self.autocompletewindow = self._make_autocomplete_window()
-        return not self.autocompletewindow.show_window(
-                comp_lists, "insert-%dc" % len(comp_start),
-                complete, mode, userWantsWin)
+        self.autocompletewindow = window = self._make_autocomplete_window()
+        opened = not window.show_window(comp_lists,
+                                        "insert-%dc" % len(comp_start),
+                                        complete, mode, userWantsWin)
+        if not done and window.is_active():
+            self.text.after(LISTING_REFRESH, self._refresh_file_completions,
+                            comp_what, window)
+        return opened
+
+    def _refresh_file_completions(self, what, window):
+        "Show more of a directory in window, while it is being read."
+        if window is not self.autocompletewindow or not window.is_active():
+            return
+        smalll, bigl, done = self.fetch_file_completions(what)
+        window.update_completions((smalll, bigl))
+        if not done:
+            self.text.after(LISTING_REFRESH, self._refresh_file_completions,
+                            what, window)
 
     def fetch_completions(self, what, mode):
         """Return a pair of lists of completions for something. The first list
@@ -175,7 +268,16 @@ class AutoComplete:
         The subprocess environment is that of the most recently run script.  If
         two unrelated modules are being edited some calltips in the current
         module may be inoperative if the module was not the last to run.
+
+        In an editor window, attributes are looked up in the static
+        CodeIndex of its text first.
         """
+        if mode == COMPLETE_ATTRIBUTES and self.editwin is not None:
+            index = CodeIndex.for_editor(self.editwin)
+            info = index and index.current()
+            lists = info and CodeIndex.completions(info, what)
+            if lists:
+                return lists
         try:
             rpcclt = self.editwin.flist.pyshell.interp.rpcclt
         except:
@@ -185,41 +287,80 @@ class AutoComplete:
                                      (what, mode), {})
         else:
             if mode == COMPLETE_ATTRIBUTES:
-                if what == "":
-                    namespace = __main__.__dict__.copy()
-                    namespace.update(__main__.__builtins__.__dict__)
-                    bigl = eval("dir()", namespace)
-                    bigl.sort()
-                    if "__all__" in bigl:
-                        smalll = sorted(eval("__all__", namespace))
-                    else:
-                        smalll = [s for s in bigl if s[:1] != '_']
-                else:
-                    try:
-                        entity = self.get_entity(what)
-                        bigl = dir(entity)
-                        bigl.sort()
-                        if "__all__" in bigl:
-                            smalll = sorted(entity.__all__)
-                        else:
-                            smalll = [s for s in bigl if s[:1] != '_']
-                    except:
-                        return [], []
-
-            elif mode == COMPLETE_FILES:
-                if what == "":
-                    what = "."
                 try:
-                    expandedpath = os.path.expanduser(what)
-                    bigl = os.listdir(expandedpath)
-                    bigl.sort()
-                    smalll = [s for s in bigl if s[:1] != '.']
-                except OSError:
+                    return self.attribute_completions(what)
+                except:
                     return [], []
 
-            if not smalll:
-                smalll = bigl
-            return smalll, bigl
+            elif mode == COMPLETE_FILES:
+                return self.file_completions(what)[:2]
+
+    def fetch_file_completions(self, what):
+        """Return file_completions(what), from the subprocess if there is
+        one, since relative names are in its current directory."""
+        try:
+            rpcclt = self.editwin.flist.pyshell.interp.rpcclt
+        except:
+            rpcclt = None
+        if rpcclt:
+            return rpcclt.remotecall("exec", "get_the_file_completions",
+                                     (what,), {})
+        return self.file_completions(what)
+
+    def file_completions(self, what):
+        """Return the pair of completion lists for the files in directory
+        what, and whether the directory has been read completely.
+
+        A directory being read gives the names read so far.
+        """
+        if what == "":
+            what = "."
+        path = os.path.abspath(os.path.expanduser(what))
+        names, done = list_directory(path)
+        bigl = sorted(names)
+        smalll = [s for s in bigl if s[:1] != '.']
+        if not smalll:
+            smalll = bigl
+        return smalll, bigl, done
+
+    def attribute_completions(self, what):
+        """Return the pair of completion lists for the attributes of what.
+
+        what is an expression, or "" to complete names in __main__.  Lists
+        are cached by what until namespace_changed() is next called, so
+        completing the same expression again evaluates nothing.
+        """
+        cache = self.cache
+        if self.cache_version != namespace_version:
+            cache.clear()
+            self.cache_version = namespace_version
+        lists = cache.get(what)
+        if lists is not None:
+            cache.move_to_end(what)
+            return lists
+        if what == "":
+            namespace = ChainMap(__main__.__dict__,
+                                 __main__.__builtins__.__dict__)
+            bigl = sorted(namespace)
+            if "__all__" in namespace:
+                smalll = sorted(namespace["__all__"])
+            else:
+                smalll = [s for s in bigl if s[:1] != '_']
+        else:
+            entity = self.get_entity(what)
+            bigl = dir(entity)
+            bigl.sort()
+            if "__all__" in bigl:
+                smalll = sorted(entity.__all__)
+            else:
+                smalll = [s for s in bigl if s[:1] != '_']
+        if not smalll:
+            smalll = bigl
+        lists = smalll, bigl
+        cache[what] = lists
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        return lists
 
     def get_entity(self, name):
         """Lookup name in a namespace spanning sys.modules and __main.dict__"""
@@ -1,6 +1,12 @@
 """
 An auto-completion window for IDLE, used by the AutoComplete extension
+
+The list shows the completions that match what has been typed: all those
+it starts, then those containing its characters in order, best first.
+Of the latter, only the best are put in the listbox, up to LIMIT rows in
+all.  Until something matches, the whole list is shown.
 """
+import heapq
 from tkinter import *
 from idlelib.MultiCall import MC_SHIFT
 from idlelib.AutoComplete import COMPLETE_FILES, COMPLETE_ATTRIBUTES
@@ -18,6 +24,144 @@ KEYRELEASE_SEQUENCE = "<KeyRelease>"
 LISTUPDATE_SEQUENCE = "<B1-ButtonRelease>"
 WINCONFIG_SEQUENCE = "<Configure>"
 DOUBLECLICK_SEQUENCE = "<B1-Double-ButtonRelease>"
+LIMIT = 100  # Most rows in the listbox with fuzzy matches.
+WORD_SEPARATORS = "_.-"
+
+def _subsequence(typed, s):
+    "Return True if the characters of typed appear in s in order."
+    pos = 0
+    for c in typed:
+        pos = s.find(c, pos) + 1
+        if not pos:
+            return False
+    return True
+
+def _word_starts(s):
+    "Return the set of positions in s where a word of a name starts."
+    starts = {0}
+    for i in range(1, len(s)):
+        c, prev = s[i], s[i-1]
+        if ((prev in WORD_SEPARATORS and c not in WORD_SEPARATORS) or
+                (c.isupper() and not prev.isupper()) or
+                (c.isdigit() and not prev.isdigit())):
+            starts.add(i)
+    return starts
+
+
+class Matcher:
+    """Find and rank the completions in a sorted list matching a string.
+
+    A completion matches if the characters typed appear in it in order,
+    ignoring case.  Completions starting with the string, with its case
+    and then without, come first, in list order.  Then come those
+    starting with its first character, then the rest, each group ranked
+    by score(), which prefers characters at the start of words, in
+    'foo_bar' or 'fooBar', and runs of consecutive characters.
+
+    For each character, the numbers of the completions containing it
+    are kept, so only completions containing all the characters typed
+    are looked at.  When the string grows, only the previous matches
+    are looked at.  A group is scored only if the groups before it
+    leave room in the list, so a common prefix scores nothing.
+    """
+
+    def __init__(self, completions):
+        self.completions = completions
+        self.lowered = [s.lower() for s in completions]
+        self.containing = containing = {}
+        for i, s in enumerate(self.lowered):
+            for c in set(s):
+                containing.setdefault(c, []).append(i)
+        self.typed = None  # Lowered string last matched, and its matches.
+        self.found = None
+        self.starts = {}  # Sorted word starts of the completions scored.
+
+    def matches(self, typed):
+        "Return the numbers of the completions matching typed, in order."
+        typed = typed.lower()
+        if not typed:
+            found = list(range(len(self.completions)))
+        else:
+            if self.typed is not None and typed.startswith(self.typed):
+                pool = self.found
+            else:
+                lists = sorted((self.containing.get(c, ())
+                                for c in set(typed)), key=len)
+                pool = set(lists[0])
+                for numbers in lists[1:]:
+                    pool.intersection_update(numbers)
+                pool = sorted(pool)
+            lowered = self.lowered
+            found = [i for i in pool if _subsequence(typed, lowered[i])]
+        self.typed, self.found = typed, found
+        return found
+
+    def score(self, typed, i):
+        """Return how well completion i matches typed; higher is better.
+
+        The characters are placed both leftmost and preferring word
+        starts, and the better placement counts.
+        """
+        s = self.completions[i]
+        low = self.lowered[i]
+        lowtyped = typed.lower()
+        starts = self.starts.get(i)
+        if starts is None:
+            starts = self.starts[i] = sorted(_word_starts(s))
+        best = None
+        for prefer_starts in (False, True):
+            total = 0
+            last = -1
+            for k, c in enumerate(lowtyped):
+                j = low.find(c, last + 1)
+                if prefer_starts and j != last + 1:
+                    for start in starts:
+                        if start >= j and low[start] == c:
+                            j = start
+                            break
+                if j < 0 or not _subsequence(lowtyped[k+1:], low[j+1:]):
+                    total = None
+                    break
+                if j in starts:
+                    total += 8
+                if j == last + 1:
+                    total += 4
+                if s[j] == typed[k]:
+                    total += 1
+                total -= j - last - 1  # Characters skipped.
+                last = j
+            if total is not None and (best is None or total > best):
+                best = total
+        return best
+
+    def rank(self, typed, limit=LIMIT):
+        """Return the numbers of the completions to list for typed.
+
+        These are all the completions that typed starts, then the best of
+        the others that match, while there are fewer than limit.
+        """
+        found = self.matches(typed)
+        if not typed:
+            return found
+        lowtyped = typed.lower()
+        completions, lowered = self.completions, self.lowered
+        prefixed = [i for i in found if lowered[i].startswith(lowtyped)]
+        cased = [completions[i].startswith(typed) for i in prefixed]
+        ranked = ([i for i, c in zip(prefixed, cased) if c] +
+                  [i for i, c in zip(prefixed, cased) if not c])
+        if len(ranked) >= limit or len(ranked) == len(found):
+            return ranked
+        prefixed = set(prefixed)
+        rest = [i for i in found if i not in prefixed]
+        first = lowtyped[0]
+        key = lambda i: (-self.score(typed, i), len(completions[i]), i)
+        for group in ([i for i in rest if lowered[i][0] == first],
+                      [i for i in rest if lowered[i][0] != first]):
+            ranked += heapq.nsmallest(limit - len(ranked), group, key=key)
+            if len(ranked) >= limit:
+                break
+        return ranked
+
 
 class AutoCompleteWindow:
 
@@ -34,6 +178,11 @@ class AutoCompleteWindow:
         self.completions = None
         # A list with more completions, or None
         self.morecompletions = None
+        # The Matcher of completions, the numbers of the completions in the
+        # listbox, and whether they match start
+        self.matcher = None
+        self.shown = None
+        self.matching = False
         # The completion mode. Either AutoComplete.COMPLETE_ATTRIBUTES or
         # AutoComplete.COMPLETE_FILES
         self.mode = None
@@ -41,9 +190,6 @@ class AutoCompleteWindow:
         self.start = None
         # The index of the start of the completion
         self.startindex = None
-        # The last typed start, used so that when the selection changes,
-        # the new start will be as close as possible to the last typed one.
-        self.lasttypedstart = None
         # Do we have an indication that the user wants the completion window
         # (for example, he clicked the list)
         self.userwantswindow = None
@@ -110,41 +256,54 @@ class AutoCompleteWindow:
             i += 1
         return first_comp[:i]
 
-    def _selection_changed(self):
-        """Should be called when the selection of the Listbox has changed.
-        Updates the Listbox display and calls _change_start."""
-        cursel = int(self.listbox.curselection()[0])
-
-        self.listbox.see(cursel)
-
-        lts = self.lasttypedstart
-        selstart = self.completions[cursel]
-        if self._binary_search(lts) == cursel:
-            newstart = lts
-        else:
-            min_len = min(len(lts), len(selstart))
-            i = 0
-            while i < min_len and lts[i] == selstart[i]:
-                i += 1
-            newstart = selstart[:i]
-        self._change_start(newstart)
-
-        if self.completions[cursel][:len(self.start)] == self.start:
-            # start is a prefix of the selected completion
-            self.listbox.configure(selectbackground=self.origselbackground,
-                                   selectforeground=self.origselforeground)
-        else:
-            self.listbox.configure(selectbackground=self.listbox.cget("bg"),
-                                   selectforeground=self.listbox.cget("fg"))
-            # If there are more completions, show them, and call me again.
+    def _item(self, row):
+        "Return the completion in row of the listbox."
+        return self.completions[self.shown[row]]
+
+    def _start_changed(self):
+        """Should be called when start was typed.
+        Shows the completions matching start, best first and selected.
+        If none match, switches to the list of more completions if there
+        is one, or shows the whole list with the completion following
+        start selected, drawn as if unselected."""
+        shown = self.matcher.rank(self.start)
+        self.matching = bool(shown)
+        if not shown:
             if self.morecompletions:
                 self.completions = self.morecompletions
                 self.morecompletions = None
-                self.listbox.delete(0, END)
-                for item in self.completions:
-                    self.listbox.insert(END, item)
-                self.listbox.select_set(self._binary_search(self.start))
-                self._selection_changed()
+                self.matcher = Matcher(self.completions)
+                self._start_changed()
+                return
+            shown = list(range(len(self.completions)))
+            row = self._binary_search(self.start)
+        else:
+            row = 0
+        listbox = self.listbox
+        if shown != self.shown:
+            self.shown = shown
+            listbox.delete(0, END)
+            listbox.insert(END, *[self.completions[i] for i in shown])
+        listbox.select_clear(0, END)
+        listbox.select_set(row)
+        listbox.see(row)
+        if self.matching:
+            listbox.configure(selectbackground=self.origselbackground,
+                              selectforeground=self.origselforeground)
+        else:
+            listbox.configure(selectbackground=listbox.cget("bg"),
+                              selectforeground=listbox.cget("fg"))
+
+    def _select(self, row):
+        "Select row of the listbox, and put its completion in the text."
+        self.listbox.select_clear(0, END)
+        self.listbox.select_set(row)
+        self.listbox.see(row)
+        self._change_start(self._item(row))
+        if not self.matching:
+            self.matching = True
+            self.listbox.configure(selectbackground=self.origselbackground,
+                                   selectforeground=self.origselforeground)
 
     def show_window(self, comp_lists, index, complete, mode, userWantsWin):
         """Show the autocomplete list, bind events.
@@ -166,7 +325,6 @@ class AutoCompleteWindow:
                 # There is exactly one matching completion
                 return completed == start
         self.userwantswindow = userWantsWin
-        self.lasttypedstart = self.start
 
         # Put widgets in place
         self.autocompletewindow = acw = Toplevel(self.widget)
@@ -185,8 +343,6 @@ class AutoCompleteWindow:
         self.scrollbar = scrollbar = Scrollbar(acw, orient=VERTICAL)
         self.listbox = listbox = Listbox(acw, yscrollcommand=scrollbar.set,
                                          exportselection=False, bg="white")
-        for item in self.completions:
-            listbox.insert(END, item)
         self.origselforeground = listbox.cget("selectforeground")
         self.origselbackground = listbox.cget("selectbackground")
         scrollbar.config(command=listbox.yview)
@@ -194,9 +350,10 @@ class AutoCompleteWindow:
         listbox.pack(side=LEFT, fill=BOTH, expand=True)
         acw.lift()  # work around bug in Tk 8.5.18+ (issue #24570)
 
-        # Initialize the listbox selection
-        self.listbox.select_set(self._binary_search(self.start))
-        self._selection_changed()
+        # Fill the listbox with the completions matching start
+        self.matcher = Matcher(self.completions)
+        self.shown = None
+        self._start_changed()
 
         # bind events
         self.hideid = self.widget.bind(HIDE_VIRTUAL_EVENT_NAME,
@@ -216,6 +373,20 @@ class AutoCompleteWindow:
         self.doubleclickid = listbox.bind(DOUBLECLICK_SEQUENCE,
                                           self.doubleclick_event)
 
+    def update_completions(self, comp_lists):
+        """Replace the lists of completions with longer ones, as when more
+        of a directory has been read, and show the matches of start."""
+        completions, morecompletions = comp_lists
+        if self.morecompletions is None:
+            # Already showing the list of more completions.
+            completions, morecompletions = morecompletions, None
+        if completions == self.completions:
+            return
+        self.completions = completions
+        self.morecompletions = morecompletions
+        self.matcher = Matcher(completions)
+        self._start_changed()
+
     def winconfig_event(self, event):
         if not self.is_active():
             return
@@ -247,12 +418,12 @@ class AutoCompleteWindow:
             return
         self.userwantswindow = True
         cursel = int(self.listbox.curselection()[0])
-        self._change_start(self.completions[cursel])
+        self._select(cursel)
 
     def doubleclick_event(self, event):
         # Put the selected completion in the text, and close the list
         cursel = int(self.listbox.curselection()[0])
-        self._change_start(self.completions[cursel])
+        self._change_start(self._item(cursel))
         self.hide_window()
 
     def keypress_event(self, event):
@@ -284,10 +455,7 @@ class AutoCompleteWindow:
                     self.hide_window()
                     return
                 self._change_start(self.start[:-1])
-            self.lasttypedstart = self.start
-            self.listbox.select_clear(0, int(self.listbox.curselection()[0]))
-            self.listbox.select_set(self._binary_search(self.start))
-            self._selection_changed()
+            self._start_changed()
             return "break"
 
         elif keysym == "Return":
@@ -300,13 +468,13 @@ class AutoCompleteWindow:
              (self.mode == COMPLETE_FILES and keysym in
               ("slash", "backslash", "quotedbl", "apostrophe")) \
              and not (state & ~MC_SHIFT):
-            # If start is a prefix of the selection, but is not '' when
+            # If the selection matches start, but start is not '' when
             # completing file names, put the whole
             # selected completion. Anyway, close the list.
             cursel = int(self.listbox.curselection()[0])
-            if self.completions[cursel][:len(self.start)] == self.start \
+            if self.matching \
                and (self.mode == COMPLETE_ATTRIBUTES or self.start):
-                self._change_start(self.completions[cursel])
+                self._change_start(self._item(cursel))
             self.hide_window()
             return
 
@@ -318,7 +486,7 @@ class AutoCompleteWindow:
             if keysym == "Home":
                 newsel = 0
             elif keysym == "End":
-                newsel = len(self.completions)-1
+                newsel = len(self.shown)-1
             elif keysym in ("Prior", "Next"):
                 jump = self.listbox.nearest(self.listbox.winfo_height()) - \
                        self.listbox.nearest(0)
@@ -326,23 +494,20 @@ class AutoCompleteWindow:
                     newsel = max(0, cursel-jump)
                 else:
                     assert keysym == "Next"
-                    newsel = min(len(self.completions)-1, cursel+jump)
+                    newsel = min(len(self.shown)-1, cursel+jump)
             elif keysym == "Up":
                 newsel = max(0, cursel-1)
             else:
                 assert keysym == "Down"
-                newsel = min(len(self.completions)-1, cursel+1)
-            self.listbox.select_clear(cursel)
-            self.listbox.select_set(newsel)
-            self._selection_changed()
-            self._change_start(self.completions[newsel])
+                newsel = min(len(self.shown)-1, cursel+1)
+            self._select(newsel)
             return "break"
 
         elif (keysym == "Tab" and not state):
             if self.lastkey_was_tab:
                 # two tabs in a row; insert current selection and close acw
                 cursel = int(self.listbox.curselection()[0])
-                self._change_start(self.completions[cursel])
+                self._change_start(self._item(cursel))
                 self.hide_window()
                 return "break"
             else:
@@ -359,10 +524,7 @@ class AutoCompleteWindow:
         elif event.char and event.char >= ' ':
             # Regular character with a non-length-1 keycode
             self._change_start(self.start + event.char)
-            self.lasttypedstart = self.start
-            self.listbox.select_clear(0, int(self.listbox.curselection()[0]))
-            self.listbox.select_set(self._binary_search(self.start))
-            self._selection_changed()
+            self._start_changed()
             return "break"
 
         else:
@@ -414,3 +576,4 @@ class AutoCompleteWindow:
         self.listbox = None
         self.autocompletewindow.destroy()
         self.autocompletewindow = None
+        self.matcher = self.shown = None
@@ -10,10 +10,117 @@ Changing the current text line or leaving the cursor in a different
 place before requesting the next selection causes AutoExpand to reset
 its state.
 
+Words are looked up in a WordIndex of the editor's text, kept up to date
+from its ChangeBus, so expanding does not read the whole text.  With
+other-buffers set in the [AutoExpand] section of the extension
+configuration, words from other open editors follow those of the
+current one.
+
 This is an extension file and there is only one instance of AutoExpand.
 '''
+import bisect
 import string
 import re
+from idlelib.configHandler import idleConf
+
+findwords = re.compile(r"\w+").findall
+_wordend = re.compile(r"\w*")
+
+
+class WordIndex:
+    """The words in each line of a TextBuffer, and how often each occurs.
+
+    lines[n] is the tuple of words in line n, with line 0 empty.  The
+    distinct words are also kept sorted, so those with a given prefix
+    are found by bisection.  update() keeps the index in step with the
+    buffer from the Changes published by the editor's ChangeBus.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.counts = {}
+        self.sorted = []
+        lines = buffer.getlines(1, buffer.linecount() + 1)
+        self.lines = [()] + [tuple(findwords(line)) for line in lines]
+        counts = self.counts
+        for words in self.lines:
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+        self.sorted = sorted(counts)
+
+    def _count(self, lines, delta):
+        # Add delta to the counts of the words in lines.
+        counts = self.counts
+        for words in lines:
+            for word in words:
+                count = counts.get(word, 0) + delta
+                if count == 0:
+                    del counts[word]
+                    del self.sorted[bisect.bisect_left(self.sorted, word)]
+                else:
+                    if count == 1 and delta == 1:
+                        bisect.insort(self.sorted, word)
+                    counts[word] = count
+
+    def update(self, change):
+        "Reindex the lines replaced by change, a ChangeBus.Change."
+        buffer = self.buffer
+        first = buffer.position(change.start)[0]
+        last = buffer.position(change.start + change.inserted)[0]
+        delta = buffer.linecount() + 1 - len(self.lines)
+        stop = last + 1 - delta  # Old lines [first, stop) were replaced.
+        old = self.lines[first:stop]
+        new = [tuple(findwords(line))
+               for line in buffer.getlines(first, last + 1)]
+        self.lines[first:stop] = new
+        self._count(new, 1)  # Before removing, so common words stay.
+        self._count(old, -1)
+
+    def prefixed(self, prefix):
+        "Return the sorted list of words longer than prefix that start with it."
+        words = self.sorted
+        i = j = bisect.bisect_right(words, prefix)
+        while j < len(words) and words[j].startswith(prefix):
+            j += 1
+        return words[i:j]
+
+    def expansions(self, prefix, line, col):
+        """Return the words for prefix, the word before (line, col).
+
+        The words are as AutoExpand.getwords returns them: those before
+        the word at (line, col), nearest first, then those after it, and
+        without prefix itself.  Lines are read only until every word
+        with the prefix has been placed.
+        """
+        remaining = set(self.prefixed(prefix))
+        text = self.buffer.getline(line)
+        start = col
+        while start > 0 and (text[start-1].isalnum() or text[start-1] == '_'):
+            start -= 1
+        end = _wordend.match(text, col).end()
+        if self.counts.get(text[start:end]) == 1:
+            remaining.discard(text[start:end])  # Only at the cursor.
+        words = []
+        def take(found):
+            for word in found:
+                if word in remaining:
+                    words.append(word)
+                    remaining.discard(word)
+        take(reversed(findwords(text, 0, start)))
+        lines = self.lines
+        n = line - 1
+        while remaining and n > 0:
+            if not remaining.isdisjoint(lines[n]):
+                take(reversed(lines[n]))
+            n -= 1
+        take(findwords(text, end))
+        n = line + 1
+        while remaining and n < len(lines):
+            if not remaining.isdisjoint(lines[n]):
+                take(lines[n])
+            n += 1
+        return words
+
 
 ###$ event <<expand-word>>
 ###$ win <Alt-slash>
@@ -28,10 +135,15 @@ class AutoExpand:
     ]
 
     wordchars = string.ascii_letters + string.digits + "_"
+    other_buffers = idleConf.GetOption("extensions", "AutoExpand",
+                                       "other-buffers", type="bool",
+                                       default=False)
 
     def __init__(self, editwin):
+        self.editwin = editwin
         self.text = editwin.text
         self.state = None
+        self.index = None
 
     def expand_word_event(self, event):
         "Replace the current word with the next expansion."
@@ -65,14 +177,58 @@ class AutoExpand:
         word = self.getprevword()
         if not word:
             return []
+        index = self.word_index()
+        if index is None:
+            words = self.scanwords(word)
+        else:
+            line, col = map(int, self.text.index("insert").split('.'))
+            words = index.expansions(word, line, col)
+        if self.other_buffers:
+            seen = set(words)
+            for w in self.otherwords(word):
+                if w not in seen:
+                    words.append(w)
+                    seen.add(w)
+        if not words:
+            return []
+        words.append(word)
+        return words
+
+    def word_index(self):
+        "Return the WordIndex of the editor, or None if it has no buffer."
+        changes = getattr(self.editwin, 'changes', None)
+        if changes is None:
+            return None
+        changes.flush()  # Publish edits made since the last idle.
+        if self.index is None:
+            self.index = WordIndex(self.editwin.buffer)
+            changes.subscribe(self.index.update)
+        return self.index
+
+    def otherwords(self, word):
+        "Return the words that start with word in other open editors."
+        words = []
+        flist = getattr(self.editwin, 'flist', None)
+        if flist is None:
+            return words
+        for editwin in flist.inversedict:
+            extensions = getattr(editwin, 'extensions', {})
+            expand = extensions.get('AutoExpand')
+            if editwin is self.editwin or expand is None:
+                continue
+            index = expand.word_index()
+            if index is not None:
+                words.extend(index.prefixed(word))
+        return words
+
+    def scanwords(self, word):
+        "Return the words that match word, searching the text itself."
         before = self.text.get("1.0", "insert wordstart")
         wbefore = re.findall(r"\b" + word + r"\w+\b", before)
         del before
         after = self.text.get("insert wordend", "end")
         wafter = re.findall(r"\b" + word + r"\w+\b", after)
         del after
-        if not wbefore and not wafter:
-            return []
         words = []
         dict = {}
         # search backwards through words before
@@ -88,7 +244,6 @@ class AutoExpand:
                 continue
             words.append(w)
             dict[w] = w
-        words.append(word)
         return words
 
     def getprevword(self):
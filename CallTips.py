@@ -6,15 +6,30 @@ which disappear when you type a closing parenthesis.
 
 """
 import __main__
+import builtins
 import inspect
 import re
 import sys
 import textwrap
+import threading
 import types
+from collections import OrderedDict
 
+from idlelib import AutoComplete
 from idlelib import CallTipWindow
+from idlelib import CodeIndex
 from idlelib.HyperParser import HyperParser
 
+CACHE_SIZE = 64  # Tips kept in each cache of a CallTips.
+PREFETCH_DELAY = 300  # Milliseconds typing pauses before a tip is fetched.
+PREFETCH_POLL = 20  # Milliseconds between checks for a prefetched tip.
+PREFETCH_TRIES = 50  # Checks before a prefetch from the subprocess is dropped.
+
+def _store(cache, key, value):
+    cache[key] = value
+    if len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
 class CallTips:
 
     menudefs = [
@@ -24,16 +39,36 @@ class CallTips:
     ]
 
     def __init__(self, editwin=None):
+        # Tips by the id of the object, where the objects are, each value
+        # being (object, tip) to keep the id in use; and in an editor, tips
+        # by expression.  Both are cleared when user code has run, as told
+        # by AutoComplete.namespace_version.
+        self.cache = OrderedDict()
+        self.expression_cache = OrderedDict()
+        self.cache_version = AutoComplete.namespace_version
         if editwin is None:  # subprocess and test
             self.editwin = None
         else:
             self.editwin = editwin
             self.text = editwin.text
             self.active_calltip = None
+            self.prefetch_id = None
+            self.pending = None  # (rpcclt, seq, expression, version)
             self._calltip_window = self._make_tk_calltip_window
+            changes = getattr(editwin, 'changes', None)
+            if changes is not None:
+                changes.subscribe_cursor(self.cursor_moved)
 
     def close(self):
         self._calltip_window = None
+        if getattr(self, 'prefetch_id', None) is not None:
+            self.text.after_cancel(self.prefetch_id)
+            self.prefetch_id = None
+        if getattr(self, 'pending', None) is not None:
+            self._drop_pending()
+        changes = getattr(self.editwin, 'changes', None)
+        if changes is not None:
+            changes.unsubscribe_cursor(self.cursor_moved)
 
     def _make_tk_calltip_window(self):
         # See __init__ for usage
@@ -59,6 +94,73 @@ class CallTips:
         if self.active_calltip and self.active_calltip.is_active():
             self.open_calltip(False)
 
+    def cursor_moved(self, index):
+        """Fetch the tip for the name before the cursor once typing pauses,
+        so that it is cached by the time '(' is typed.
+        """
+        if self.prefetch_id is not None:
+            self.text.after_cancel(self.prefetch_id)
+            self.prefetch_id = None
+        if self.pending is None:
+            self.prefetch_id = self.text.after(PREFETCH_DELAY, self.prefetch)
+
+    def prefetch(self):
+        """Fetch the tip for the name before the cursor, if it is defined.
+
+        Only names and attributes of modules are looked at, as is_defined
+        does.  With a subprocess, the tip is asked for without waiting,
+        and poll_prefetch() caches it when it comes.
+        """
+        self.prefetch_id = None
+        c = self.text.get("insert-1c")
+        if not (c.isalnum() or c == '_'):
+            return
+        hp = HyperParser(self.editwin, "insert")
+        if not hp.is_in_code():
+            return
+        expression = hp.get_expression()
+        if not expression or '(' in expression:
+            return
+        if self.cached_tip(expression, wait=0) is not None:
+            return
+        rpcclt = self._rpcclt()
+        if rpcclt is None:
+            if is_defined(expression):
+                self.fetch_tip(expression, wait=0)
+            return
+        seq = rpcclt.asynccall("exec", "prefetch_calltip", (expression,), {})
+        # A response read while another call is waited for is kept in
+        # rpcclt.responses only if the seq has a condition variable.
+        rpcclt.cvars[seq] = threading.Condition()
+        self.pending = rpcclt, seq, expression, self.cache_version
+        self.prefetch_id = self.text.after(PREFETCH_POLL, self.poll_prefetch,
+                                           PREFETCH_TRIES)
+
+    def poll_prefetch(self, tries):
+        "Cache the tip asked for by prefetch() if it has come."
+        self.prefetch_id = None
+        rpcclt, seq, expression, version = self.pending
+        response = rpcclt.responses.get(seq)
+        if response is None and not self._running():
+            # Otherwise PyShell reads the socket while user code runs.
+            try:
+                response = rpcclt.pollresponse(seq, wait=0)
+            except (EOFError, OSError):
+                response = 'EOF', None
+        if response is None:
+            if tries > 1:
+                self.prefetch_id = self.text.after(
+                        PREFETCH_POLL, self.poll_prefetch, tries - 1)
+            else:
+                self._drop_pending()
+            return
+        self._drop_pending()
+        how, argspec = response
+        self._check_cache()
+        if how == "OK" and argspec is not None and (
+                version == self.cache_version):
+            _store(self.expression_cache, expression, argspec)
+
     def open_calltip(self, evalfuncs):
         self._remove_calltip_window()
 
@@ -78,7 +180,36 @@ class CallTips:
         self.active_calltip = self._calltip_window()
         self.active_calltip.showtip(argspec, sur_paren[0], sur_paren[1])
 
-    def fetch_tip(self, expression):
+    def _drop_pending(self):
+        rpcclt, seq = self.pending[:2]
+        rpcclt.cvars.pop(seq, None)
+        rpcclt.responses.pop(seq, None)
+        self.pending = None
+
+    def _running(self):
+        "Return whether user code is running in the subprocess."
+        try:
+            return self.editwin.flist.pyshell.interp.active_seq is not None
+        except AttributeError:
+            return False
+
+    def cached_tip(self, expression, wait=None):
+        """Return the tip for expression that the CodeIndex of the editor
+        text gives, waiting for it as BufferIndex.current() does with wait,
+        or that is cached by expression, or None.
+        """
+        self._check_cache()
+        index = CodeIndex.for_editor(self.editwin)
+        info = index and index.current(wait)
+        tip = info and CodeIndex.calltip(info, expression)
+        if tip:
+            return format_tip(*tip)
+        argspec = self.expression_cache.get(expression)
+        if argspec is not None:
+            self.expression_cache.move_to_end(expression)
+        return argspec
+
+    def fetch_tip(self, expression, wait=None):
         """Return the argument list and docstring of a function or class.
 
         If there is a Python subprocess, get the calltip there.  Otherwise,
@@ -91,16 +222,49 @@ class CallTips:
 
         To find methods, fetch_tip must be fed a fully qualified name.
 
+        In an editor window, cached_tip() is asked first.
+
         """
-        try:
-            rpcclt = self.editwin.flist.pyshell.interp.rpcclt
-        except AttributeError:
-            rpcclt = None
+        self._check_cache()
+        if self.editwin is not None:
+            argspec = self.cached_tip(expression, wait)
+            if argspec is not None:
+                return argspec
+        rpcclt = self._rpcclt()
         if rpcclt:
-            return rpcclt.remotecall("exec", "get_the_calltip",
-                                     (expression,), {})
+            argspec = rpcclt.remotecall("exec", "get_the_calltip",
+                                        (expression,), {})
         else:
-            return get_argspec(get_entity(expression))
+            argspec = self.entity_tip(expression)
+        if self.editwin is not None:
+            _store(self.expression_cache, expression, argspec)
+        return argspec
+
+    def _rpcclt(self):
+        "Return the client of the subprocess, or None."
+        try:
+            return self.editwin.flist.pyshell.interp.rpcclt
+        except AttributeError:
+            return None
+
+    def entity_tip(self, expression):
+        "Return the tip for the object expression is, cached by its id."
+        self._check_cache()
+        entity = get_entity(expression)
+        key = id(entity)
+        hit = self.cache.get(key)
+        if hit is not None and hit[0] is entity:
+            self.cache.move_to_end(key)
+            return hit[1]
+        argspec = get_argspec(entity)
+        _store(self.cache, key, (entity, argspec))
+        return argspec
+
+    def _check_cache(self):
+        if self.cache_version != AutoComplete.namespace_version:
+            self.cache.clear()
+            self.expression_cache.clear()
+            self.cache_version = AutoComplete.namespace_version
 
 def get_entity(expression):
     """Return the object corresponding to expression evaluated
@@ -116,6 +280,31 @@ def get_entity(expression):
             # exception, especially if user classes are involved.
             return None
 
+def is_defined(expression):
+    """Return whether a dotted expression names something defined, without
+    getting any attribute, which could run code.
+
+    The first name is looked up in __main__, sys.modules and builtins, and
+    the others only in the dict of the module before them, so expression
+    must be a name or the attribute of a module.  The last name may be
+    only partly typed.
+    """
+    first, *names = expression.split('.')
+    for namespace in (__main__.__dict__, sys.modules, vars(builtins)):
+        if first in namespace:
+            entity = namespace[first]
+            break
+    else:
+        return False
+    for name in names:
+        if type(entity) is not types.ModuleType:
+            return False
+        try:
+            entity = entity.__dict__[name]
+        except KeyError:
+            return False
+    return True
+
 # The following are used in get_argspec and some in tests
 _MAX_COLS = 85
 _MAX_LINES = 5  # enough for bytes
@@ -150,13 +339,20 @@ def get_argspec(ob):
                 isinstance(ob_call, types.MethodType)):
             argspec = _first_param.sub("", argspec)
 
-    lines = (textwrap.wrap(argspec, _MAX_COLS, subsequent_indent=_INDENT)
-            if len(argspec) > _MAX_COLS else [argspec] if argspec else [])
-
     if isinstance(ob_call, types.MethodType):
         doc = ob_call.__doc__
     else:
         doc = getattr(ob, "__doc__", "")
+    return format_tip(argspec, doc)
+
+def format_tip(argspec, doc):
+    """Return the call tip for argspec, wrapped, and the start of doc.
+
+    The doc lines are those up to the first empty line or _MAX_LINES.
+    """
+    lines = (textwrap.wrap(argspec, _MAX_COLS, subsequent_indent=_INDENT)
+            if len(argspec) > _MAX_COLS else [argspec] if argspec else [])
+
     if doc:
         for line in doc.split('\n', _MAX_LINES)[:_MAX_LINES]:
             line = line.strip()
@@ -0,0 +1,123 @@
+"""Tell editor extensions about changes to the text and the cursor.
+
+EditorWindow.changes is a ChangeBus.  The ShadowDelegator at the bottom
+of the Percolator chain reports every edit to it.  Edits are merged
+until Tk is idle, then each subscriber gets a single Change covering
+them all, instead of reacting to every keystroke or polling.
+
+A Change(version, start, end, inserted) says that the characters at
+offsets [start, end) of the text as it was at the last notice were
+replaced by inserted characters, giving version of editwin.buffer.  The
+changed text is now at offsets [start, start+inserted).
+
+Cursor subscribers are called with the 'line.col' index of the insert
+mark when it has moved since they were last called.  Call poke() after
+anything that may move the cursor without changing the text.
+
+View subscribers are called with no arguments after the text scrolled,
+was resized or changed font.  EditorWindow calls view_changed() from
+the text's yscrollcommand and when the font is reset.
+"""
+from collections import namedtuple
+
+Change = namedtuple('Change', 'version start end inserted')
+
+def coalesce(first, second):
+    """Return one (start, end, inserted) edit doing edit first, then second.
+
+    The offsets of second are in the text as first left it.
+    """
+    start1, end1, inserted1 = first
+    start2, end2, inserted2 = second
+    start = min(start1, start2)
+    stop = max(start1 + inserted1, end2)  # End of both, after first.
+    end = stop - (inserted1 - (end1 - start1))
+    return start, end, stop - start + inserted2 - (end2 - start2)
+
+
+class ChangeBus:
+
+    def __init__(self, text, buffer):
+        self.text = text
+        self.buffer = buffer
+        self.subscribers = []
+        self.cursor_subscribers = []
+        self.view_subscribers = []
+        self.pending = None  # Edits not yet published, merged.
+        self.cursor = None  # Insert index last published.
+        self.view_moved = False
+        self.after_id = None
+
+    def subscribe(self, func):
+        "Call func(change) after edits."
+        self.subscribers.append(func)
+
+    def unsubscribe(self, func):
+        self.subscribers.remove(func)
+
+    def subscribe_cursor(self, func):
+        "Call func(index) when the insert mark has moved."
+        self.cursor_subscribers.append(func)
+
+    def unsubscribe_cursor(self, func):
+        self.cursor_subscribers.remove(func)
+
+    def subscribe_view(self, func):
+        "Call func() when the view may have moved."
+        self.view_subscribers.append(func)
+
+    def unsubscribe_view(self, func):
+        self.view_subscribers.remove(func)
+
+    def record(self, start, end, inserted):
+        "Note that [start, end) was replaced with inserted characters."
+        edit = start, end, inserted
+        if self.pending is not None:
+            edit = coalesce(self.pending, edit)
+        self.pending = edit
+        self.poke()
+
+    def view_changed(self, *args):
+        "Note that the view may have moved; args are ignored."
+        self.view_moved = True
+        self.poke()
+
+    def poke(self, event=None):
+        "Publish pending changes once Tk is idle."
+        if self.after_id is None and self.text is not None:
+            self.after_id = self.text.after_idle(self.flush)
+
+    def flush(self):
+        "Publish pending changes now."
+        self.after_id = None
+        if self.text is None:
+            return
+        if self.pending is not None:
+            change = Change(self.buffer.version, *self.pending)
+            self.pending = None
+            for func in list(self.subscribers):
+                func(change)
+        if self.view_moved:
+            self.view_moved = False
+            for func in list(self.view_subscribers):
+                func()
+        if self.cursor_subscribers:
+            cursor = self.text.index("insert")
+            if cursor != self.cursor:
+                self.cursor = cursor
+                for func in list(self.cursor_subscribers):
+                    func(cursor)
+
+    def close(self):
+        if self.after_id is not None:
+            self.text.after_cancel(self.after_id)
+            self.after_id = None
+        self.subscribers = []
+        self.cursor_subscribers = []
+        self.view_subscribers = []
+        self.text = self.buffer = None
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_changebus', verbosity=2)
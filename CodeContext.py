@@ -17,12 +17,121 @@ from idlelib.configHandler import idleConf
 
 BLOCKOPENERS = {"class", "def", "elif", "else", "except", "finally", "for",
                     "if", "try", "while", "with"}
-UPDATEINTERVAL = 100 # millisec
-FONTUPDATEINTERVAL = 1000 # millisec
+CHUNK = 128  # Lines per chunk in an IndentIndex.
 
 getspacesfirstword =\
                    lambda s, c=re.compile(r"^(\s*)(\w*)"): c.match(s).groups()
 
+def line_info(text):
+    """Return the indent of line text and its block start keyword.
+
+    If the line does not start a block, the keyword value is False.
+    The indentation of empty lines (or comment lines) is INFINITY.
+
+    """
+    spaces, firstword = getspacesfirstword(text)
+    opener = firstword in BLOCKOPENERS and firstword
+    if len(text) == len(spaces) or text[len(spaces)] == '#':
+        indent = INFINITY
+    else:
+        indent = len(spaces)
+    return indent, opener
+
+
+class IndentIndex:
+    """The indent and block start keyword of each line of a TextBuffer.
+
+    indents[n] and openers[n] are for line n; line 0 is a dummy with
+    indent -1 that starts the toplevel block.  The least indent in each
+    chunk of CHUNK lines is kept, so that the last line before a given
+    one with less than a given indent is found without looking at every
+    line in between.  update() keeps the index in step with the buffer
+    from the Changes published by the editor's ChangeBus.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.reset()
+
+    def reset(self):
+        "Index the whole buffer."
+        buffer = self.buffer
+        info = [line_info(line)
+                for line in buffer.getlines(1, buffer.linecount() + 1)]
+        self.indents = [-1] + [indent for indent, opener in info]
+        self.openers = [False] + [opener for indent, opener in info]
+        self.mins = []
+        self._rechunk(0, len(self.indents))
+
+    def _rechunk(self, first, last):
+        # Recompute the least indents of chunks holding lines [first, last).
+        indents, mins = self.indents, self.mins
+        nchunks = (len(indents) + CHUNK - 1) // CHUNK
+        del mins[nchunks:]
+        mins.extend([0] * (nchunks - len(mins)))
+        for c in range(first // CHUNK, min((last - 1) // CHUNK + 1, nchunks)):
+            mins[c] = min(indents[c * CHUNK:(c + 1) * CHUNK])
+
+    def update(self, change):
+        "Reindex the lines replaced by change, a ChangeBus.Change."
+        buffer = self.buffer
+        first = buffer.position(change.start)[0]
+        last = buffer.position(change.start + change.inserted)[0]
+        delta = buffer.linecount() + 1 - len(self.indents)
+        info = [line_info(line) for line in buffer.getlines(first, last + 1)]
+        stop = last + 1 - delta  # Old lines [first, stop) were replaced.
+        self.indents[first:stop] = [indent for indent, opener in info]
+        self.openers[first:stop] = [opener for indent, opener in info]
+        self._rechunk(first, len(self.indents) if delta else last + 1)
+
+    def find_back(self, linenum, indent):
+        "Return the last line before linenum indented less than indent."
+        indents, mins = self.indents, self.mins
+        n = linenum - 1
+        c = n // CHUNK
+        while n >= c * CHUNK:
+            if indents[n] < indent:
+                return n
+            n -= 1
+        c -= 1
+        while mins[c] >= indent:  # Ends at chunk 0, as line 0 has -1.
+            c -= 1
+        n = c * CHUNK + CHUNK - 1
+        while indents[n] >= indent:
+            n -= 1
+        return n
+
+    def context(self, topvisible):
+        """Return the block openers enclosing line topvisible.
+
+        The result is a list of (line number, indent, keyword) tuples,
+        outermost first.
+
+        """
+        topvisible = min(topvisible, len(self.indents) - 1)
+        lines = []
+        # The indentation level we are currently in:
+        lastindent = INFINITY
+        linenum = topvisible
+        while linenum > 0:
+            indent = self.indents[linenum]
+            opener = self.openers[linenum]
+            if indent < lastindent:
+                lastindent = indent
+                if opener in ("else", "elif"):
+                    # We also show the if statement
+                    lastindent += 1
+                if opener and linenum < topvisible:
+                    lines.append((linenum, indent, opener))
+                if lastindent <= 0:
+                    break
+            # For a line to be interesting, it must have less indentation
+            # than lastindent.
+            linenum = self.find_back(linenum, lastindent)
+        lines.reverse()
+        return lines
+
+
 class CodeContext:
     menudefs = [('options', [('!Code Conte_xt', '<<toggle-code-context>>')])]
     context_depth = idleConf.GetOption("extensions", "CodeContext",
@@ -36,21 +145,21 @@ class CodeContext:
         self.text = editwin.text
         self.textfont = self.text["font"]
         self.label = None
+        # self.index is an IndentIndex of the text, kept while the context
+        # pane is shown.
+        self.index = None
         # self.info is a list of (line number, indent level, line text, block
         # keyword) tuples providing the block structure associated with
         # self.topvisible (the linenumber of the line displayed at the top of
         # the edit window). self.info[0] is initialized as a 'dummy' line which
         # starts the toplevel 'block' of the module.
         self.info = [(0, -1, "", False)]
-        self.topvisible = 1
+        self.topvisible = None
         visible = idleConf.GetOption("extensions", "CodeContext",
                                      "visible", type="bool", default=False)
         if visible:
             self.toggle_code_context_event()
             self.editwin.setvar('<<toggle-code-context>>', True)
-        # Start two update cycles, one for context lines, one for font changes.
-        self.text.after(UPDATEINTERVAL, self.timer_event)
-        self.text.after(FONTUPDATEINTERVAL, self.font_timer_event)
 
     def toggle_code_context_event(self, event=None):
         if not self.label:
@@ -81,96 +190,52 @@ class CodeContext:
             # thus ensuring that it will appear directly above text_frame
             self.label.pack(side=TOP, fill=X, expand=False,
                             before=self.editwin.text_frame)
+            # Update when the text is edited or scrolled, instead of polling.
+            self.index = IndentIndex(self.editwin.buffer)
+            changes = self.editwin.changes
+            changes.subscribe(self.text_changed)
+            changes.subscribe_view(self.update_code_context)
+            self.topvisible = None
+            self.update_code_context()
         else:
+            changes = self.editwin.changes
+            changes.unsubscribe(self.text_changed)
+            changes.unsubscribe_view(self.update_code_context)
+            self.index = None
             self.label.destroy()
             self.label = None
         idleConf.SetOption("extensions", "CodeContext", "visible",
                            str(self.label is not None))
         idleConf.SaveUserCfgFiles()
 
-    def get_line_info(self, linenum):
-        """Get the line indent value, text, and any block start keyword
-
-        If the line does not start a block, the keyword value is False.
-        The indentation of empty lines (or comment lines) is INFINITY.
-
-        """
-        text = self.text.get("%d.0" % linenum, "%d.end" % linenum)
-        spaces, firstword = getspacesfirstword(text)
-        opener = firstword in BLOCKOPENERS and firstword
-        if len(text) == len(spaces) or text[len(spaces)] == '#':
-            indent = INFINITY
-        else:
-            indent = len(spaces)
-        return indent, text, opener
-
-    def get_context(self, new_topvisible, stopline=1, stopindent=0):
-        """Get context lines, starting at new_topvisible and working backwards.
-
-        Stop when stopline or stopindent is reached. Return a tuple of context
-        data and the indent level at the top of the region inspected.
-
-        """
-        assert stopline > 0
-        lines = []
-        # The indentation level we are currently in:
-        lastindent = INFINITY
-        # For a line to be interesting, it must begin with a block opening
-        # keyword, and have less indentation than lastindent.
-        for linenum in range(new_topvisible, stopline-1, -1):
-            indent, text, opener = self.get_line_info(linenum)
-            if indent < lastindent:
-                lastindent = indent
-                if opener in ("else", "elif"):
-                    # We also show the if statement
-                    lastindent += 1
-                if opener and linenum < new_topvisible and indent >= stopindent:
-                    lines.append((linenum, indent, text, opener))
-                if lastindent <= stopindent:
-                    break
-        lines.reverse()
-        return lines, lastindent
+    def text_changed(self, change):
+        self.index.update(change)
+        self.topvisible = None  # The context may have changed.
+        self.update_code_context()
 
     def update_code_context(self):
         """Update context information and lines visible in the context pane.
 
         """
+        newtextfont = self.text["font"]
+        if newtextfont != self.textfont:
+            self.textfont = newtextfont
+            self.label["font"] = self.textfont
         new_topvisible = int(self.text.index("@0,0").split('.')[0])
         if self.topvisible == new_topvisible:      # haven't scrolled
             return
-        if self.topvisible < new_topvisible:       # scroll down
-            lines, lastindent = self.get_context(new_topvisible,
-                                                 self.topvisible)
-            # retain only context info applicable to the region
-            # between topvisible and new_topvisible:
-            while self.info[-1][1] >= lastindent:
-                del self.info[-1]
-        elif self.topvisible > new_topvisible:     # scroll up
-            stopindent = self.info[-1][1] + 1
-            # retain only context info associated
-            # with lines above new_topvisible:
-            while self.info[-1][0] >= new_topvisible:
-                stopindent = self.info[-1][1]
-                del self.info[-1]
-            lines, lastindent = self.get_context(new_topvisible,
-                                                 self.info[-1][0]+1,
-                                                 stopindent)
-        self.info.extend(lines)
         self.topvisible = new_topvisible
+        getline = self.editwin.buffer.getline
+        self.info[1:] = [(linenum, indent, getline(linenum), opener)
+                         for linenum, indent, opener
+                         in self.index.context(new_topvisible)]
         # empty lines in context pane:
         context_strings = [""] * max(0, self.context_depth - len(self.info))
         # followed by the context hint lines:
         context_strings += [x[2] for x in self.info[-self.context_depth:]]
         self.label["text"] = '\n'.join(context_strings)
 
-    def timer_event(self):
-        if self.label:
-            self.update_code_context()
-        self.text.after(UPDATEINTERVAL, self.timer_event)
 
-    def font_timer_event(self):
-        newtextfont = self.text["font"]
-        if self.label and newtextfont != self.textfont:
-            self.textfont = newtextfont
-            self.label["font"] = self.textfont
-        self.text.after(FONTUPDATEINTERVAL, self.font_timer_event)
+if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_codecontext', verbosity=2)
@@ -0,0 +1,530 @@
+"""Static index of the names in Python source, for completions and tips.
+
+The text of an editor window is parsed with ast in a background thread,
+and so are the modules it imports, found on sys.path without importing
+them.  AutoComplete and CallTips ask the index first, so they work for
+code that has not been run and need no call to the subprocess.  When
+the index cannot say, for instance for a variable or a module written
+in C, they ask the subprocess as before.
+
+Parsed modules are cached by file name and kept while the file's mtime
+and size are unchanged.  An editor's own text is reparsed when it has
+changed; if it does not parse, lines with errors are replaced by 'pass'
+a few times, and failing that the last good parse is kept.
+"""
+import ast
+import builtins
+from collections import namedtuple
+from importlib.machinery import PathFinder
+import os
+import re
+import sys
+import threading
+import tokenize
+import weakref
+
+MAX_DEPTH = 10  # Most imports followed to find one name.
+MAX_REPAIRS = 3  # Most lines blanked to parse text with errors.
+MAX_DEFAULT = 30  # Longest default value shown in a signature.
+
+# kind is 'class', 'function', 'variable', 'module' for 'import a.b as c'
+# (target is (owner, dirs, 'a.b')) or 'import' for 'from a import b'
+# (target is (owner, dirs, 'a', 'b')).  owner is the ModuleInfo of the
+# statement, and dirs the list of directories to find a relative import
+# in, or None.  members is the dict of names in a class, and its target
+# is (owner, bases), with the bases as dotted names, or None for a base
+# that is not a name.
+Symbol = namedtuple('Symbol', 'kind signature doc members target')
+
+_FUNCTIONS = tuple(getattr(ast, name) for name in
+                   ('FunctionDef', 'AsyncFunctionDef') if hasattr(ast, name))
+_ASSIGNS = tuple(getattr(ast, name) for name in
+                 ('Assign', 'AugAssign', 'AnnAssign') if hasattr(ast, name))
+_BLOCKS = tuple(getattr(ast, name) for name in
+                ('If', 'Try', 'With', 'For', 'While') if hasattr(ast, name))
+_first_param = re.compile(r'(?<=\()\w*\,?\s*')
+
+
+def _default(node):
+    # Return the text of a default value.
+    try:
+        text = repr(ast.literal_eval(node))
+    except ValueError:
+        text = _dotted(node) or '...'
+    return text if len(text) <= MAX_DEFAULT else '...'
+
+def _dotted(node):
+    # Return the dotted name node is, or None.
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted(node.value)
+        return value and value + '.' + node.attr
+    return None
+
+def signature(args):
+    "Return the text of an ast.arguments, as in '(a, b=1, *c, d, **e)'."
+    params = []
+    positional = getattr(args, 'posonlyargs', []) + args.args
+    defaults = [None] * (len(positional) - len(args.defaults))
+    for i, (arg, default) in enumerate(zip(positional,
+                                           defaults + args.defaults)):
+        params.append(arg.arg if default is None
+                      else '%s=%s' % (arg.arg, _default(default)))
+        if i + 1 == len(getattr(args, 'posonlyargs', ())):
+            params.append('/')
+    if args.vararg:
+        params.append('*' + args.vararg.arg)
+    elif args.kwonlyargs:
+        params.append('*')
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(arg.arg if default is None
+                      else '%s=%s' % (arg.arg, _default(default)))
+    if args.kwarg:
+        params.append('**' + args.kwarg.arg)
+    return '(%s)' % ', '.join(params)
+
+def _calls_globals(body):
+    # Return whether statements body, but not the functions and classes
+    # they define, call globals() or vars().
+    nodes = list(body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, _FUNCTIONS + (ast.ClassDef, ast.Lambda)):
+            continue
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in ('globals', 'vars')):
+            return True
+        nodes.extend(ast.iter_child_nodes(node))
+    return False
+
+
+class ModuleInfo:
+    """The names defined at the top level of a module.
+
+    names maps names to Symbols, all is the list in __all__ or None, and
+    stars lists the (dirs, module) of 'from module import *'.  dirs is
+    the list holding the module's directory, or None if it has no file,
+    and package the list to find submodules in, or None if this is not a
+    package.  Absolute imports in a script are looked for in its
+    directory first, as when it is run.  dynamic is true if the module may
+    bind names its statements do not show: its top level code calls
+    globals() or vars(), or it defines __getattr__.
+    """
+
+    def __init__(self, tree, dirs=None, package=None, script=False):
+        self.names = {}
+        self.all = None
+        self.stars = []
+        self.dirs = dirs
+        self.package = package
+        self.script = script
+        self._scan(tree.body, self.names)
+        self.dynamic = ('__getattr__' in self.names or
+                        _calls_globals(tree.body))
+
+    def _scan(self, body, names, inclass=False):
+        # Add the names bound by statements body to dict names.
+        for node in body:
+            if isinstance(node, _FUNCTIONS):
+                names[node.name] = Symbol('function', signature(node.args),
+                                          ast.get_docstring(node), None, None)
+            elif isinstance(node, ast.ClassDef):
+                members = {}
+                self._scan(node.body, members, True)
+                bases = tuple(map(_dotted, node.bases))
+                names[node.name] = Symbol('class', None,
+                                          ast.get_docstring(node), members,
+                                          (self, bases))
+            elif isinstance(node, _ASSIGNS):
+                targets = getattr(node, 'targets', None) or [node.target]
+                for target in targets:
+                    for name in ast.walk(target):
+                        if isinstance(name, ast.Name):
+                            names[name.id] = Symbol('variable', None, None,
+                                                    None, None)
+                if (not inclass and len(targets) == 1 and
+                        isinstance(targets[0], ast.Name) and
+                        targets[0].id == '__all__' and node.value):
+                    try:
+                        self.all = list(ast.literal_eval(node.value))
+                    except ValueError:
+                        pass
+            elif isinstance(node, ast.Import) and not inclass:
+                for alias in node.names:
+                    if alias.asname:
+                        names[alias.asname] = Symbol(
+                            'module', None, None, None,
+                            (self, None, alias.name))
+                    else:
+                        top = alias.name.partition('.')[0]
+                        names[top] = Symbol('module', None, None, None,
+                                            (self, None, top))
+            elif isinstance(node, ast.ImportFrom) and not inclass:
+                dirs = self._relative(node.level)
+                if node.level and dirs is None:
+                    continue
+                module = node.module or ''
+                for alias in node.names:
+                    if alias.name == '*':
+                        self.stars.append((dirs, module))
+                    else:
+                        names[alias.asname or alias.name] = Symbol(
+                            'import', None, None, None,
+                            (self, dirs, module, alias.name))
+            elif isinstance(node, _BLOCKS):
+                # Names bound in only some branches are still names;
+                # the first binding wins, as in 'if posix: ... else: ...'.
+                branches = [getattr(node, part, ()) for part in
+                            ('body', 'orelse', 'finalbody')]
+                branches += [handler.body for handler
+                             in getattr(node, 'handlers', ())]
+                for branch in branches:
+                    found = {}
+                    self._scan(branch, found, inclass)
+                    for name, symbol in found.items():
+                        names.setdefault(name, symbol)
+
+    def _relative(self, level):
+        # Return the directories for an import at level, or None.
+        if not level or self.dirs is None:
+            return None
+        base = self.dirs[0]
+        for i in range(level - 1):
+            base = os.path.dirname(base)
+        return [base]
+
+
+_lock = threading.RLock()
+_modules = {}  # Parsed modules, by file name, with their mtime and size.
+
+def find_module(name, dirs=None):
+    """Return the source file of module name, or None.
+
+    The module is looked for in dirs, or on sys.path, without running
+    any code.  Modules without Python source are not found.
+    """
+    parts = name.split('.')
+    path = dirs if dirs is not None else sys.path
+    spec = None
+    for i in range(len(parts)):
+        if path is None:
+            return None
+        try:
+            spec = PathFinder.find_spec('.'.join(parts[:i+1]), path)
+        except (ImportError, ValueError, OSError):
+            return None
+        if spec is None:
+            return None
+        path = spec.submodule_search_locations
+    origin = spec.origin if spec else None
+    if origin and origin.endswith('.py'):
+        return origin
+    return None
+
+def load_module(filename):
+    "Return the ModuleInfo of a file, or None if it cannot be parsed."
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    with _lock:
+        cached = _modules.get(filename)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+    dirname = os.path.dirname(filename)
+    package = [dirname] if (os.path.basename(filename) ==
+                            '__init__.py') else None
+    try:
+        with tokenize.open(filename) as f:
+            tree = ast.parse(f.read(), filename)
+        info = ModuleInfo(tree, [dirname], package)
+    except (OSError, SyntaxError, ValueError, UnicodeDecodeError,
+            RuntimeError, MemoryError):
+        info = None
+    with _lock:
+        _modules[filename] = st.st_mtime_ns, st.st_size, info
+    return info
+
+def parse_source(source, filename=None):
+    """Return the ModuleInfo of source, or None if it cannot be parsed.
+
+    Lines with syntax errors are replaced by 'pass', up to MAX_REPAIRS
+    times, since text being edited is often not valid.
+    """
+    dirs = [os.path.dirname(os.path.abspath(filename))] if filename else None
+    lines = None
+    for attempt in range(MAX_REPAIRS + 1):
+        try:
+            tree = ast.parse(source, filename or '<string>')
+        except SyntaxError as err:
+            if not err.lineno:
+                return None
+            if lines is None:
+                lines = source.split('\n')
+            if not 0 < err.lineno <= len(lines):
+                return None
+            line = lines[err.lineno - 1]
+            indent = line[:len(line) - len(line.lstrip())]
+            lines[err.lineno - 1] = indent + 'pass'
+            source = '\n'.join(lines)
+        except (ValueError, RuntimeError, MemoryError):
+            return None
+        else:
+            return ModuleInfo(tree, dirs, script=True)
+    return None
+
+
+class Resolver:
+    """Find what names mean, following imports without running code.
+
+    Methods return a ModuleInfo, a Symbol, or None if the name is not
+    found.  A Resolver counts the lookups in progress, to give up on
+    import cycles.
+    """
+
+    def __init__(self):
+        self.depth = 0
+
+    def module(self, owner, dirs, name):
+        "Return the ModuleInfo of module name, imported in owner."
+        if dirs is None and owner.script and owner.dirs:
+            dirs = owner.dirs + sys.path
+        filename = find_module(name, dirs) if name else None
+        return load_module(filename) if filename else None
+
+    def resolve(self, symbol):
+        "Return what symbol means, following an import."
+        if symbol.kind == 'module':
+            return self.module(*symbol.target)
+        if symbol.kind != 'import':
+            return symbol
+        owner, dirs, module, name = symbol.target
+        found = None
+        source = self.module(owner, dirs, module)
+        if source is not None:
+            found = self.member(source, name)
+        if found is None:
+            # 'from package import module'
+            found = self.module(owner, dirs,
+                                module + '.' + name if module else name)
+        return found
+
+    def member(self, obj, name):
+        "Return attribute name of obj, a ModuleInfo or class Symbol."
+        if self.depth >= MAX_DEPTH:
+            return None
+        self.depth += 1
+        try:
+            if isinstance(obj, ModuleInfo):
+                symbol = obj.names.get(name)
+                if symbol is not None:
+                    return self.resolve(symbol)
+                for dirs, module in obj.stars:
+                    star = self.module(obj, dirs, module)
+                    if star is not None and name in self.names(star):
+                        return self.member(star, name)
+                if obj.package is not None:
+                    filename = find_module(name, obj.package)
+                    return load_module(filename) if filename else None
+            elif isinstance(obj, Symbol) and obj.kind == 'class':
+                if name in obj.members:
+                    return obj.members[name]
+                for base in self.bases(obj):
+                    found = self.member(base, name)
+                    if found is not None:
+                        return found
+            return None
+        finally:
+            self.depth -= 1
+
+    def bases(self, symbol):
+        "Return the class Symbols found for the bases of class symbol."
+        owner, names = symbol.target
+        bases = []
+        for name in filter(None, names):
+            found = self.lookup(owner, name)
+            if isinstance(found, Symbol) and found.kind == 'class':
+                bases.append(found)
+        return bases
+
+    def lookup(self, info, dotted):
+        "Return what dotted name means at the top level of module info."
+        obj = info
+        for name in dotted.split('.'):
+            obj = self.member(obj, name)
+            if obj is None:
+                return None
+        return obj
+
+    def names(self, obj):
+        "Return the set of attribute names of a ModuleInfo or class Symbol."
+        if self.depth >= MAX_DEPTH:
+            return set()
+        self.depth += 1
+        try:
+            if isinstance(obj, ModuleInfo):
+                names = set(obj.names)
+                for dirs, module in obj.stars:
+                    star = self.module(obj, dirs, module)
+                    if star is not None:
+                        names.update(star.all if star.all is not None else
+                                     (n for n in self.names(star)
+                                      if n[:1] != '_'))
+                return names
+            names = set(obj.members)
+            names.update(dir(object))
+            for base in self.bases(obj):
+                names.update(self.names(base))
+            return names
+        finally:
+            self.depth -= 1
+
+    def complete(self, obj):
+        """Return whether names(obj) has all the names of a ModuleInfo or
+        class Symbol.
+
+        They may not be if a star import or base class is not found, or
+        is not Python source, or if a module binds names dynamically.
+        """
+        if self.depth >= MAX_DEPTH:
+            return False
+        self.depth += 1
+        try:
+            if isinstance(obj, ModuleInfo):
+                if obj.dynamic:
+                    return False
+                if obj.all is not None and not set(obj.all) <= self.names(obj):
+                    return False  # Some are bound in a way not seen.
+                for dirs, module in obj.stars:
+                    star = self.module(obj, dirs, module)
+                    if star is None or (star.all is None and
+                                        not self.complete(star)):
+                        return False
+                return True
+            bases = self.bases(obj)
+            return (len(bases) == len(obj.target[1]) and
+                    all(self.complete(base) for base in bases))
+        finally:
+            self.depth -= 1
+
+
+def _is_dotted(what):
+    return all(part.isidentifier() for part in what.split('.'))
+
+def completions(info, what):
+    """Return (smalll, bigl) for what as AutoComplete.fetch_completions
+    does, or None if the index does not know what it is.
+    """
+    resolver = Resolver()
+    if what == "":
+        if not resolver.complete(info):
+            return None  # Some names are unknown.
+        bigl = sorted(resolver.names(info) | set(dir(builtins)))
+        smalll = [s for s in bigl if s[:1] != '_']
+        return smalll, bigl
+    if not _is_dotted(what):
+        return None
+    obj = resolver.lookup(info, what)
+    if not isinstance(obj, ModuleInfo) and not (
+            isinstance(obj, Symbol) and obj.kind == 'class'):
+        return None
+    if not resolver.complete(obj):
+        return None
+    bigl = sorted(resolver.names(obj))
+    if isinstance(obj, ModuleInfo) and obj.all is not None:
+        smalll = sorted(obj.all)
+    else:
+        smalll = [s for s in bigl if s[:1] != '_']
+    return smalll or bigl, bigl
+
+def calltip(info, expression):
+    """Return (argspec, doc) for callable expression, or None if unknown.
+
+    For classes the argspec is that of __init__, without self.
+    """
+    if not _is_dotted(expression):
+        return None
+    resolver = Resolver()
+    obj = resolver.lookup(info, expression)
+    if not isinstance(obj, Symbol):
+        return None
+    if obj.kind == 'function':
+        return obj.signature, obj.doc
+    if obj.kind == 'class':
+        init = resolver.member(obj, '__init__')
+        if init is None:
+            if len(resolver.bases(obj)) < len(obj.target[1]):
+                return None  # An unknown base may define __init__.
+            return '()', obj.doc
+        if init.kind != 'function':
+            return None
+        return _first_param.sub('', init.signature), obj.doc
+    return None
+
+
+class BufferIndex:
+    """The index of the text of an editor window.
+
+    current() returns the ModuleInfo of the latest text that parsed,
+    starting a new parse in a background thread if the text changed.
+    """
+    wait = 0.2  # Seconds to wait for the first parse.
+
+    def __init__(self, editwin):
+        self.editwin = editwin
+        self.info = None
+        self.version = None  # Version of the text last parsed.
+        self.thread = None
+
+    def current(self, wait=None):
+        buffer = self.editwin.buffer
+        if buffer is None:
+            return self.info
+        if self.version != buffer.version and not (
+                self.thread and self.thread.is_alive()):
+            self.version = buffer.version
+            source = '\n'.join(buffer.getlines(1, buffer.linecount() + 1))
+            io = getattr(self.editwin, 'io', None)
+            filename = io.filename if io else None
+            self.thread = threading.Thread(target=self.build,
+                                           args=(source, filename),
+                                           daemon=True)
+            self.thread.start()
+        if self.info is None and self.thread is not None:
+            self.thread.join(self.wait if wait is None else wait)
+        return self.info
+
+    def build(self, source, filename):
+        info = parse_source(source, filename)
+        if info is None:
+            return
+        # Parse the imported modules now, so lookups are quick.
+        resolver = Resolver()
+        for symbol in list(info.names.values()):
+            if symbol.kind in ('module', 'import'):
+                resolver.module(*symbol.target[:3])
+        for star in info.stars:
+            resolver.module(info, *star)
+        self.info = info
+
+
+_indexes = weakref.WeakKeyDictionary()  # BufferIndex by editor window.
+
+def for_editor(editwin):
+    "Return the BufferIndex of editwin, or None if it is not Python code."
+    if hasattr(editwin, 'interp'):
+        return None  # The shell: its names are in the subprocess.
+    index = _indexes.get(editwin)
+    if index is None:
+        io = getattr(editwin, 'io', None)
+        if (getattr(editwin, 'buffer', None) is None or
+                not editwin.ispythonsource(io.filename if io else None)):
+            return None
+        index = _indexes[editwin] = BufferIndex(editwin)
+    return index
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_codeindex', verbosity=2)
@@ -46,6 +46,8 @@ class EditorWindow(Component):
     from idlelib.Percolator import Percolator
     from idlelib.ColorDelegator import ColorDelegator
     from idlelib.UndoDelegator import UndoDelegator
+    from idlelib.ShadowDelegator import ShadowDelegator
+    from idlelib.ChangeBus import ChangeBus
     from idlelib.IOBinding import IOBinding, filesystemencoding, encoding
     from idlelib import Bindings
     from tkinter import Toplevel
@@ -205,7 +207,6 @@ class EditorWindow(Component):
 
         vbar['command'] = text.yview
         vbar.pack(side=RIGHT, fill=Y)
-        text['yscrollcommand'] = vbar.set
         text['font'] = idleConf.GetFont(self.root, 'main', 'EditorWindow')
         text_frame.pack(side=LEFT, fill=BOTH, expand=1)
         text.pack(side=TOP, fill=BOTH, expand=1)
@@ -241,18 +242,37 @@ class EditorWindow(Component):
         self.context_use_ps1 = False
 
         # When searching backwards for a reliable place to begin parsing,
-        # first start num_context_lines[0] lines back, then
-        # num_context_lines[1] lines back if that didn't work, and so on.
-        # The last value should be huge (larger than the # of lines in a
-        # conceivable file).
+        # without stmt_start(), first start num_context_lines[0] lines back,
+        # then num_context_lines[1] lines back if that didn't work, and so
+        # on.  The last value should be huge (larger than the # of lines in
+        # a conceivable file).
         # Making the initial values larger slows things down more often.
         self.num_context_lines = 50, 500, 5000000
         self.per = per = self.Percolator(text)
+        # A Python copy of the text, for code that reads much of it.  The
+        # shadow filter goes in first, to stay at the bottom of the chain.
+        self.shadow = shadow = self.ShadowDelegator()
+        per.insertfilter(shadow)
+        self.buffer = shadow.buffer
+        # Extensions subscribe to changes to hear of edits and cursor
+        # moves once Tk is idle, rather than on every event.
+        self.changes = changes = self.ChangeBus(text, shadow.buffer)
+        shadow.set_change_hook(changes.record)
+        text.changes = changes  # For dialogs given only the text.
+        changes.subscribe_cursor(self.cursor_moved)
+        self.checkpoints = PyParse.Checkpoints(shadow.buffer)
+        changes.subscribe(self.checkpoints.update)
+        text['yscrollcommand'] = self.set_yview
         self.undo = undo = self.UndoDelegator()
+        undo.max_undo_bytes = idleConf.GetOption('main', 'General',
+                'undo-memory-mb', type='int', default=32) << 20
         per.insertfilter(undo)
         text.undo_block_start = undo.undo_block_start
         text.undo_block_stop = undo.undo_block_stop
+        text.replace_lines = undo.replace_lines
         undo.set_saved_change_hook(self.saved_change_hook)
+        # A LargeFile.Pager, set by IOBinding when a huge file is shown.
+        self.pager = None
         # IOBinding implements file I/O and printing functionality
         self.io = io = self.IOBinding(self)
         io.set_filename_change_hook(self.filename_change_hook)
@@ -355,8 +375,16 @@ class EditorWindow(Component):
         return "break"
 
     def set_line_and_column(self, event=None):
+        self.changes.poke()
+
+    def cursor_moved(self, index):
         self.top.ping_statusbar()
 
+    def set_yview(self, first, last):
+        "Move the scrollbar, and tell change subscribers of the new view."
+        self.vbar.set(first, last)
+        self.changes.view_changed()
+
     menu_specs = [
         ("file", "_File"),
         ("edit", "_Edit"),
@@ -546,16 +574,24 @@ class EditorWindow(Component):
         self.text.event_generate('<Meta-d>')
         return "break"
 
+    def file_text(self):
+        """Return the text to address by line of the file.
+
+        That is the Text widget, or when a huge file is shown a page at
+        a time, the Pager's PagedText, which reads lines from the file.
+        """
+        return self.pager.view if self.pager else self.text
+
     def find_event(self, event):
-        SearchDialog.find(self.text)
+        SearchDialog.find(self.file_text())
         return "break"
 
     def find_again_event(self, event):
-        SearchDialog.find_again(self.text)
+        SearchDialog.find_again(self.file_text())
         return "break"
 
     def find_selection_event(self, event):
-        SearchDialog.find_selection(self.text)
+        SearchDialog.find_selection(self.file_text())
         return "break"
 
     def find_in_files_event(self, event):
@@ -563,13 +599,17 @@ class EditorWindow(Component):
         return "break"
 
     def replace_event(self, event):
-        ReplaceDialog.replace(self.text)
+        if self.pager:
+            self.text.bell()  # Read only.
+        else:
+            ReplaceDialog.replace(self.text)
         return "break"
 
     def goto_line_event(self, event):
-        text = self.text
+        text = self.file_text()
         lineno = querydialog.askinteger(title="Goto",
-                prompt="Go to line number:", parent=text, use_ttk=ui.using_ttk)
+                prompt="Go to line number:", parent=self.text,
+                use_ttk=ui.using_ttk)
         if lineno is None:
             return "break"
         if lineno <= 0:
@@ -647,9 +687,10 @@ class EditorWindow(Component):
 
     def gotoline(self, lineno):
         if lineno is not None and lineno > 0:
-            self.text.mark_set("insert", "%d.0" % lineno)
-            self.text.tag_remove("sel", "1.0", "end")
-            self.text.tag_add("sel", "insert", "insert +1l")
+            text = self.file_text()
+            text.mark_set("insert", "%d.0" % lineno)
+            text.tag_remove("sel", "1.0", "end")
+            text.tag_add("sel", "insert", "insert +1l")
             self.center()
 
     def ispythonsource(self, filename):
@@ -749,6 +790,7 @@ class EditorWindow(Component):
         # Called from configDialog.py
 
         self.text['font'] = idleConf.GetFont(self.root, 'main','EditorWindow')
+        self.changes.view_changed()
 
     def RemoveKeybindings(self):
         "Remove the keybindings before they are changed."
@@ -959,6 +1001,8 @@ class EditorWindow(Component):
         self.io.close()
         self.io = None
         self.undo = None
+        self.changes.close()
+        self.shadow = self.buffer = self.changes = self.checkpoints = None
         if self.color:
             self.color.close(False)
             self.color = None
@@ -1265,17 +1309,15 @@ class EditorWindow(Component):
             lno = index2line(text.index('insert'))
             y = PyParse.Parser(self.indentwidth, self.tabwidth)
             if not self.context_use_ps1:
-                for context in self.num_context_lines:
-                    startat = max(lno - context, 1)
-                    startatindex = repr(startat) + ".0"
-                    rawtext = text.get(startatindex, "insert")
-                    y.set_str(rawtext)
-                    bod = y.find_good_parse_start(
-                              self.context_use_ps1,
-                              self._build_char_in_string_func(startatindex))
-                    if bod is not None or startat == 1:
-                        break
-                y.set_lo(bod or 0)
+                self.changes.flush()  # Publish edits made since the last idle.
+                line, prefix = self.checkpoints.resume(lno - 1)
+                y.set_str(prefix + text.get("%d.0" % line, "insert"))
+                if prefix and y.get_continuation_type() not in (
+                        PyParse.C_BRACKET, PyParse.C_STRING_FIRST_LINE,
+                        PyParse.C_STRING_NEXT_LINES):
+                    # The statement ended after line; parse all of it.
+                    startatindex = "%d.0" % self.stmt_start(lno - 1)
+                    y.set_str(text.get(startatindex, "insert"))
             else:
                 r = text.tag_prevrange("console", "insert")
                 if r:
@@ -1330,6 +1372,13 @@ class EditorWindow(Component):
             text.see("insert")
             text.undo_block_stop()
 
+    def stmt_start(self, lno):
+        """Return the first line of the last statement, not a blank line
+        or comment, starting at or before line lno; see PyParse.Checkpoints.
+        """
+        self.changes.flush()  # Publish edits made since the last idle.
+        return self.checkpoints.stmt_start(lno)
+
     # Our editwin provides a is_char_in_string function that works
     # with a Tk text index, but PyParse only knows about offsets into
     # a string. This builds a function for PyParse that accepts an
@@ -1,15 +1,23 @@
-import os
+import codecs
+import collections
 import fnmatch
-import re  # for htest
+import functools
+import io
+import locale
+import mmap
+import os
+import queue
+import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import StringVar, BooleanVar, Checkbutton  # for GrepDialog
 from tkinter import Tk, Text, Button, SEL, END  # for htest
+from idlelib import GrepIndex
+from idlelib.GrepResults import GrepResultsWindow
 from idlelib import SearchEngine
 from idlelib.SearchDialogBase import SearchDialogBase
 from idlelib import ui
-# Importing OutputWindow fails due to import loop
-# EditorWindow -> GrepDialop -> OutputWindow -> EditorWindow
-
 def grep(text, io=None, flist=None):
     root = text._root()
     engine = SearchEngine.get(root)
@@ -30,6 +38,8 @@ class GrepDialog(SearchDialogBase):
         self.flist = flist
         self.globvar = StringVar(root)
         self.recvar = BooleanVar(root)
+        self.ignorevar = BooleanVar(root, True)
+        self.indexvar = BooleanVar(root, False)
 
     def open(self, text, searchphrase, io=None):
         SearchDialogBase.open(self, text, searchphrase)
@@ -57,6 +67,17 @@ class GrepDialog(SearchDialogBase):
         if not ui.using_ttk:
             btn.select()
 
+        btn = ui.Checkbutton(f, variable=self.ignorevar,
+                             text="Skip ignored files (.gitignore, .git, "
+                                  "__pycache__, ...)")
+        btn.pack(side="top", fill="both")
+        if not ui.using_ttk:
+            btn.select()
+
+        btn = ui.Checkbutton(f, variable=self.indexvar,
+                             text="Use search index (faster repeat searches)")
+        btn.pack(side="top", fill="both")
+
     def create_command_buttons(self):
         SearchDialogBase.create_command_buttons(self)
         self.make_button("Search Files", self.default_command, 1)
@@ -69,61 +90,37 @@ class GrepDialog(SearchDialogBase):
         if not path:
             self.top.bell()
             return
-        from idlelib.OutputWindow import OutputWindow  # leave here!
-        save = sys.stdout
-        try:
-            sys.stdout = OutputWindow(self.flist)
-            self.grep_it(prog, path)
-        finally:
-            sys.stdout = save
+        self.close()
+        dir, base = os.path.split(path)
+        index = GrepIndex.get(dir) if self.indexvar.get() else None
+        job = GrepJob(prog, dir, base, self.recvar.get(),
+                      self.ignorevar.get(), index)
+        GrepResultsWindow(self.flist, job, self.engine.getpat(), path)
 
     def grep_it(self, prog, path):
+        "Search files matching path for prog, printing hits to sys.stdout."
         dir, base = os.path.split(path)
-        list = self.findfiles(dir, base, self.recvar.get())
-        list.sort()
         self.close()
         pat = self.engine.getpat()
         print("Searching %r in %s ..." % (pat, path))
-        hits = 0
+        index = GrepIndex.get(dir) if self.indexvar.get() else None
+        job = GrepJob(prog, dir, base, self.recvar.get(),
+                      self.ignorevar.get(), index)
+        job.start()
         try:
-            for fn in list:
-                try:
-                    with open(fn, errors='replace') as f:
-                        for lineno, line in enumerate(f, 1):
-                            if line[-1:] == '\n':
-                                line = line[:-1]
-                            if prog.search(line):
-                                sys.stdout.write("%s: %s: %s\n" %
-                                                 (fn, lineno, line))
-                                hits += 1
-                except OSError as msg:
-                    print(msg)
-            print(("Hits found: %s\n"
-                  "(Hint: right-click to open locations.)"
-                  % hits) if hits else "No hits.")
+            for fn, hits, error in job.results(block=True):
+                sys.stdout.write(format_hits(fn, hits, error))
+            print(summary(job))
         except AttributeError:
             # Tk window has been closed, OutputWindow.text = None,
             # so in OW.write, OW.text.insert fails.
-            pass
+            job.cancel()
 
     def findfiles(self, dir, base, rec):
-        try:
-            names = os.listdir(dir or os.curdir)
-        except OSError as msg:
+        errors = []
+        list = [fn for fn in iterfiles(dir, base, rec, errors.append)]
+        for msg in errors:
             print(msg)
-            return []
-        list = []
-        subdirs = []
-        for name in names:
-            fn = os.path.join(dir, name)
-            if os.path.isdir(fn):
-                subdirs.append(fn)
-            else:
-                if fnmatch.fnmatch(name, base):
-                    list.append(fn)
-        if rec:
-            for subdir in subdirs:
-                list.extend(self.findfiles(subdir, base, rec))
         return list
 
     def close(self, event=None):
@@ -132,6 +129,420 @@ class GrepDialog(SearchDialogBase):
             self.top.withdraw()
 
 
+# Directories never worth searching when ignore rules are on.
+IGNORED_DIRS = {'.git', '.hg', '.svn', '__pycache__', 'node_modules', '.tox'}
+
+def iterfiles(dir, base, rec, onerror=None, ignore=False, maxsize=0,
+              _rules=()):
+    """Yield the names of files in dir matching base, in sorted order.
+
+    Subdirectories are searched after the files of a directory if rec
+    is true.  An OSError from listing a directory is passed to onerror,
+    if given, and the directory is skipped.
+
+    If ignore is true, skip IGNORED_DIRS, virtual environments (any
+    directory holding a pyvenv.cfg) and whatever .gitignore files in
+    the searched directories exclude.  If maxsize is not 0, skip files
+    larger than maxsize bytes.  Directory entries come from os.scandir,
+    so the file type is usually known without an extra stat call.
+    """
+    try:
+        entries = sorted(os.scandir(dir or os.curdir),
+                         key=lambda entry: entry.name)
+    except OSError as msg:
+        if onerror is not None:
+            onerror(msg)
+        return
+    rules = _rules
+    if ignore:
+        for entry in entries:
+            if entry.name == '.gitignore':
+                rules = rules + tuple(read_gitignore(dir, entry.path))
+                break
+    subdirs = []
+    for entry in entries:
+        name = entry.name
+        fn = os.path.join(dir, name)
+        try:
+            isdir = entry.is_dir()
+        except OSError:
+            continue
+        if ignore:
+            if isdir and (name in IGNORED_DIRS or
+                          os.path.isfile(os.path.join(fn, 'pyvenv.cfg'))):
+                continue
+            if rules and is_ignored(rules, fn, name, isdir):
+                continue
+        if isdir:
+            subdirs.append(fn)
+        elif fnmatch.fnmatch(name, base):
+            if maxsize:
+                try:
+                    if entry.stat().st_size > maxsize:
+                        continue
+                except OSError:
+                    continue
+            yield fn
+    if rec:
+        for subdir in subdirs:
+            yield from iterfiles(subdir, base, rec, onerror, ignore,
+                                 maxsize, rules)
+
+def read_gitignore(dir, path):
+    """Return ignore rules from the .gitignore file at path, in dir.
+
+    A rule is a (dir, pattern, negate, dironly) tuple.  Patterns with a
+    slash other than a trailing one match paths relative to dir; other
+    patterns match names in dir and below.  This covers the common
+    subset of the gitignore syntax.
+    """
+    rules = []
+    try:
+        with open(path, errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dironly = line.endswith('/')
+        line = line.rstrip('/')
+        if line.startswith('**/') and '/' not in line[3:]:
+            line = line[3:]
+        if line.strip('/'):
+            rules.append((dir, line, negate, dironly))
+    return rules
+
+def is_ignored(rules, fn, name, isdir):
+    "Return True if the last of the rules that matches fn ignores it."
+    ignored = False
+    relpaths = {}
+    for dir, pattern, negate, dironly in rules:
+        if dironly and not isdir:
+            continue
+        if '/' in pattern:
+            if dir not in relpaths:
+                relpaths[dir] = os.path.relpath(fn, dir or os.curdir
+                                                ).replace(os.sep, '/')
+            target = relpaths[dir]
+        else:
+            target = name
+        if fnmatch.fnmatchcase(target, pattern.lstrip('/')):
+            ignored = not negate
+    return ignored
+
+# Files are sniffed for NUL bytes in their first SNIFF_SIZE bytes to skip
+# binaries.  Files of at least MMAP_SIZE bytes are searched through mmap
+# with a bytes pattern, when one can be made (see bytes_prefilter).
+SNIFF_SIZE = 8192
+MMAP_SIZE = 1 << 20
+
+def grep_file(prog, fn):
+    "Return a list of (lineno, line) for the lines of file fn matching prog."
+    encoding = locale.getpreferredencoding(False)  # As open() uses.
+    with open(fn, 'rb') as f:
+        if b'\0' in f.read(SNIFF_SIZE):
+            return []  # Binary file.
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_SIZE:
+            bprog = bytes_prefilter(prog.pattern, prog.flags, encoding)
+            if bprog is not None:
+                return _grep_mmap(prog, bprog, f, encoding)
+        f.seek(0)
+        hits = []
+        with io.TextIOWrapper(f, encoding, errors='replace') as text:
+            for lineno, line in enumerate(text, 1):
+                if line[-1:] == '\n':
+                    line = line[:-1]
+                if prog.search(line):
+                    hits.append((lineno, line))
+        return hits
+
+def _grep_mmap(prog, bprog, f, encoding):
+    # Only lines holding a bytes match are decoded and checked with prog.
+    # Lines are split at \n; a \r before it is dropped.
+    hits = []
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        lineno = 1
+        counted = 0  # Newlines in mm[:counted] are included in lineno.
+        pos = 0
+        while pos <= size:
+            m = bprog.search(mm, pos)
+            if not m:
+                break
+            start = mm.rfind(b'\n', 0, m.start()) + 1
+            end = mm.find(b'\n', m.start())
+            if end < 0:
+                end = size
+            lineno += _count_newlines(mm, counted, start)
+            counted = start
+            line = mm[start:end].decode(encoding, 'replace')
+            if line[-1:] == '\r':
+                line = line[:-1]
+            if prog.search(line):
+                hits.append((lineno, line))
+            pos = end + 1
+    return hits
+
+def _count_newlines(mm, start, end):
+    # Count a block at a time, not to copy a huge span between hits.
+    count = 0
+    for pos in range(start, end, MMAP_SIZE):
+        count += mm[pos:min(pos + MMAP_SIZE, end)].count(b'\n')
+    return count
+
+# Non-ASCII characters that match an ASCII letter under re.IGNORECASE.
+_FOLDS = {'i': '\u0130\u0131', 'k': '\u212a', 's': '\u017f'}
+_ASCII_COMPATIBLE = {'utf-8', 'ascii', 'iso8859-1', 'cp1252'}
+
+def _literal_runs(pattern, flags, encoding):
+    # Return the runs of ASCII literals (not newlines) at the top level of
+    # pattern, which any match contains, and the compiled flags.  Return
+    # None if the encoding does not keep ASCII as single bytes.
+    try:
+        encoding = codecs.lookup(encoding).name
+        flags = re.compile(pattern, flags).flags
+        parsed = SearchEngine.sre_parse.parse(pattern, flags)
+    except (LookupError, re.error):
+        return None
+    if encoding not in _ASCII_COMPATIBLE:
+        return None
+    runs = []
+    run = ''
+    for op, av in parsed:
+        if op is SearchEngine.sre_parse.LITERAL and 0 < av < 128 and av != 10:
+            run += chr(av)
+        elif op is not SearchEngine.sre_parse.AT:  # Zero width, skip.
+            runs.append(run)
+            run = ''
+    runs.append(run)
+    return [run for run in runs if run], flags, encoding
+
+@functools.lru_cache(maxsize=32)
+def bytes_prefilter(pattern, flags, encoding):
+    """Return a bytes pattern that every line matching pattern matches.
+
+    The result searches for the longest run of ASCII literals that any
+    match must contain, in the encoded file.  Return None if there is no
+    such run or the encoding does not keep ASCII as single bytes.
+    """
+    res = _literal_runs(pattern, flags, encoding)
+    if not res or not res[0]:
+        return None
+    runs, flags, encoding = res
+    parts = []
+    for c in max(runs, key=len):
+        if flags & re.IGNORECASE and c.isalpha():
+            alts = [c.lower(), c.upper()]
+            if encoding == 'utf-8':
+                alts.extend(_FOLDS.get(c.lower(), ''))
+            parts.append(b'(?:' + b'|'.join(re.escape(a.encode(encoding))
+                                            for a in alts) + b')')
+        else:
+            parts.append(re.escape(c.encode(encoding)))
+    return re.compile(b''.join(parts))
+
+@functools.lru_cache(maxsize=32)
+def required_trigrams(pattern, flags, encoding):
+    """Return the lowercased trigrams every file matching pattern contains.
+
+    Return an empty frozenset if the index cannot narrow the search.
+    """
+    res = _literal_runs(pattern, flags, encoding)
+    if not res:
+        return frozenset()
+    runs, flags, encoding = res
+    tris = set()
+    for run in runs:
+        run = run.lower()
+        if flags & re.IGNORECASE and encoding == 'utf-8':
+            # Non-ASCII characters can match these letters.
+            run = re.sub('[%s]' % ''.join(_FOLDS), '\0', run)
+        tris.update(tri for tri in GrepIndex.trigrams(run.encode(encoding))
+                    if b'\0' not in tri)
+    return frozenset(tris)
+
+def format_hits(fn, hits, error=None):
+    "Return the report lines for one file searched by a GrepJob."
+    if error is not None:
+        return "%s\n" % (error,)
+    return "".join(["%s: %s: %s\n" % (fn, lineno, line)
+                    for lineno, line in hits])
+
+def summary(job):
+    "Return the closing message for a finished or cancelled GrepJob."
+    if job.cancelled.is_set():
+        return "Search cancelled after %d files. Hits found: %s" % (
+                job.searched, job.hits)
+    return ("Hits found: %s\n"
+            "(Hint: right-click to open locations.)"
+            % job.hits) if job.hits else "No hits."
+
+
+class GrepJob:
+    """Search the files found by iterfiles in a pool of worker threads.
+
+    A walker thread submits each file to the pool as soon as it is
+    found, so searching overlaps the directory walk.  Results are
+    returned by results() in walk order, so the hits for one file stay
+    together.  At most max_pending files are queued ahead of the
+    consumer.
+
+    If index, a GrepIndex.TrigramIndex for dir, is given and the pattern
+    has literal text, files the index shows cannot match are skipped
+    without being read.  Files not indexed or changed since are indexed
+    as they are searched.
+    """
+    workers = 8
+    max_pending = 256
+    max_size = 100 << 20  # Larger files are searched without the index.
+
+    def __init__(self, prog, dir, base, rec, ignore=False, index=None):
+        self.prog = prog
+        self.dir = dir
+        self.base = base
+        self.rec = rec
+        self.ignore = ignore
+        self.index = index
+        self.required = frozenset()
+        if index is not None:
+            self.required = required_trigrams(
+                    prog.pattern, prog.flags, locale.getpreferredencoding(False))
+        self.queue = queue.Queue()  # Walker to consumer: (fn, future|error)
+        self.pending = collections.deque()
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.cancelled = threading.Event()
+        self.walked = False
+        self.found = 0  # Files found by the walker.
+        self.searched = 0  # Files returned by results().
+        self.skipped = 0  # Files the index showed cannot match.
+        self.hits = 0
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(self.workers)
+        self.thread = threading.Thread(target=self._walk, daemon=True)
+        self.thread.start()
+
+    def _walk(self):
+        # Runs in the walker thread.
+        index = self.index if self.required else None
+        seen = set()
+        try:
+            if index is not None:
+                index.load()
+                candidates = index.candidates(self.required)
+                prefix = len(os.path.join(self.dir, ''))
+            onerror = lambda msg: self.queue.put((None, msg))
+            for fn in iterfiles(self.dir, self.base, self.rec, onerror,
+                                self.ignore):
+                task = (grep_file, self.prog, fn)
+                if index is not None:
+                    key = fn[prefix:]
+                    try:
+                        st = os.stat(fn)
+                    except OSError:
+                        st = None
+                    if st is None or st.st_size <= self.max_size:
+                        seen.add(key)
+                        fid = index.lookup(key, st) if st else None
+                        if fid is not None and fid not in candidates:
+                            self.skipped += 1
+                            continue
+                        task = (self._grep_indexed, fn, key)
+                while not self.slots.acquire(timeout=0.1):
+                    if self.cancelled.is_set():
+                        return
+                try:
+                    future = self.executor.submit(*task)
+                except RuntimeError:  # Pool shut down by cancel().
+                    return
+                self.found += 1
+                self.queue.put((fn, future))
+            if index is not None and self.rec:
+                index.prune(seen, self.base)
+        finally:
+            self.queue.put(None)
+            if index is not None:
+                self.executor.shutdown(wait=True)
+                index.save()
+
+    def _grep_indexed(self, fn, key):
+        # Runs in a worker thread.  Index fn, then search it if it can match.
+        # The file is read MMAP_SIZE bytes at a time, each piece starting
+        # with the last two bytes of the one before, so that no trigram
+        # is missed and the whole file is never held at once.
+        tris = set()
+        with open(fn, 'rb') as f:
+            st = os.fstat(f.fileno())
+            data = f.read(MMAP_SIZE)
+            binary = b'\0' in data[:SNIFF_SIZE]
+            while data and not binary:
+                tris |= GrepIndex.trigrams(data)
+                more = f.read(MMAP_SIZE)
+                data = data[-2:] + more if more else b''
+        self.index.update(key, st, tris)
+        if binary or not self.required <= tris:
+            return []
+        return grep_file(self.prog, fn)
+
+    def _fetch(self, block):
+        while not self.walked:
+            try:
+                item = self.queue.get(block and not self.pending)
+            except queue.Empty:
+                break
+            if item is None:
+                self.walked = True
+            else:
+                self.pending.append(item)
+
+    def results(self, block=False):
+        """Yield (fn, hits, error) for searched files, in walk order.
+
+        Error is an OSError from listing a directory (with fn None) or
+        from reading the file, else None.  Unless block is true, stop
+        at the first file whose search is not finished yet.
+        """
+        while not self.cancelled.is_set():
+            self._fetch(block)
+            if not self.pending:
+                if self.walked:
+                    self.executor.shutdown(wait=False)
+                return
+            fn, future = self.pending[0]
+            if fn is None:  # Error listing a directory.
+                self.pending.popleft()
+                yield None, [], future  # future is the OSError here.
+                continue
+            if not (block or future.done()):
+                return
+            self.pending.popleft()
+            self.slots.release()
+            try:
+                hits, error = future.result(), None
+            except OSError as msg:
+                hits, error = [], msg
+            self.searched += 1
+            self.hits += len(hits)
+            yield fn, hits, error
+
+    def done(self):
+        return self.cancelled.is_set() or (self.walked and not self.pending)
+
+    def cancel(self):
+        self.cancelled.set()
+        for fn, future in self.pending:
+            if fn is not None:
+                future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
+
+
 def _grep_dialog(parent):  # htest #
     from idlelib.PyShell import PyShellFileList
     root = Tk()
@@ -0,0 +1,176 @@
+"""Trigram index of the files under a directory, to speed up Find in Files.
+
+For each file the index records its mtime and size and the set of
+3-byte sequences (trigrams) it contains, ASCII lowercased.  A pattern
+whose every match must contain some literal text can then only match in
+files that contain all the trigrams of that text, so other files need
+not be read.  Files whose mtime or size changed since they were indexed
+are read and reindexed as they are searched.
+
+Indexes are kept in memory for the session and saved under .idlerc, one
+file per search root.  An index is only a cache: if it cannot be read
+or written, searches just read every file.
+"""
+import array
+import fnmatch
+import hashlib
+import marshal
+import os
+import threading
+
+VERSION = 1
+TYPECODE = 'i'  # For arrays of file ids.
+
+def trigrams(data):
+    "Return the set of 3-byte substrings of bytes data, ASCII lowercased."
+    data = data.lower()
+    return {data[i:i+3] for i in range(len(data) - 2)}
+
+_indexes = {}  # Indexes by the path of their file.
+
+def get(root, indexdir=None):
+    """Return the TrigramIndex for directory root, stored in indexdir.
+
+    The default indexdir is grepindex in the user's .idlerc directory.
+    The same object is returned for the same root for the whole session.
+    """
+    if indexdir is None:
+        from idlelib.configHandler import idleConf
+        indexdir = os.path.join(idleConf.GetUserCfgDir(), 'grepindex')
+    root = os.path.abspath(root or os.curdir)
+    name = hashlib.sha1(root.encode('utf-8', 'surrogateescape')).hexdigest()
+    path = os.path.join(indexdir, name[:16] + '.idx')
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = TrigramIndex(path, root)
+    return index
+
+
+class TrigramIndex:
+    """Map trigrams to the ids of the files containing them.
+
+    Files are keyed by their path relative to the root.  Reindexing a
+    file gives it a new id and leaves the old one dead in the posting
+    arrays; once dead ids outnumber live ones, the index is cleared and
+    refilled by later searches.  Methods may be called from several
+    threads.
+    """
+    min_compact = 1000  # Dead ids tolerated regardless of live ones.
+
+    def __init__(self, path, root):
+        self.path = path
+        self.root = root
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.clear()
+
+    def clear(self):
+        self.files = {}  # Key to (mtime_ns, size, id).
+        self.postings = {}  # Trigram to array of ids, or its bytes.
+        self.next_id = 0
+        self.dead = 0
+        self.changed = True
+
+    def load(self):
+        "Read the index file once; start empty if it is missing or bad."
+        with self.lock:
+            if self.loaded:
+                return
+            self.loaded = True
+            try:
+                with open(self.path, 'rb') as f:
+                    data = marshal.load(f)
+                if data['version'] != VERSION or data['root'] != self.root:
+                    return
+                self.files = data['files']
+                self.postings = data['postings']  # Converted when used.
+                self.next_id = data['next_id']
+                self.dead = data['dead']
+                self.changed = False
+            except (OSError, EOFError, ValueError, TypeError, KeyError):
+                self.clear()
+
+    def save(self):
+        "Write the index file if it changed, replacing the old one at once."
+        with self.lock:
+            if not self.changed:
+                return
+            if self.dead > max(len(self.files), self.min_compact):
+                self.clear()
+            data = {
+                'version': VERSION,
+                'root': self.root,
+                'files': self.files,
+                'postings': {tri: ids.tobytes() if isinstance(ids, array.array)
+                             else ids for tri, ids in self.postings.items()},
+                'next_id': self.next_id,
+                'dead': self.dead,
+                }
+            tmp = self.path + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp, 'wb') as f:
+                    marshal.dump(data, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                return
+            self.changed = False
+
+    def _ids(self, tri):
+        ids = self.postings.get(tri)
+        if isinstance(ids, bytes):
+            buf, ids = ids, array.array(TYPECODE)
+            ids.frombytes(buf)
+            self.postings[tri] = ids
+        return ids
+
+    def candidates(self, required):
+        "Return the set of ids of files that contain all trigrams required."
+        with self.lock:
+            lists = [self._ids(tri) for tri in required]
+            if any(ids is None for ids in lists):
+                return set()
+            lists.sort(key=len)
+            result = set(lists[0]) if lists else set()
+            for ids in lists[1:]:
+                if not result:
+                    break
+                result.intersection_update(ids)
+            return result
+
+    def lookup(self, key, st):
+        "Return the id of key if it is indexed with stat result st, else None."
+        entry = self.files.get(key)
+        if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+            return entry[2]
+        return None
+
+    def update(self, key, st, tris):
+        "Index file key, with stat result st, as containing trigrams tris."
+        with self.lock:
+            if key in self.files:
+                self.dead += 1
+            fid = self.next_id
+            self.next_id += 1
+            self.files[key] = (st.st_mtime_ns, st.st_size, fid)
+            for tri in tris:
+                ids = self._ids(tri)
+                if ids is None:
+                    ids = self.postings[tri] = array.array(TYPECODE)
+                ids.append(fid)
+            self.changed = True
+
+    def prune(self, seen, base):
+        "Forget files matching base that are not in seen, a set of keys."
+        with self.lock:
+            for key in list(self.files):
+                if key not in seen and fnmatch.fnmatch(
+                        os.path.basename(key), base):
+                    del self.files[key]
+                    self.dead += 1
+                    self.changed = True
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_grepindex', verbosity=2)
@@ -0,0 +1,340 @@
+"""Results window for Find in Files.
+
+The hits of a search are kept in compact arrays rather than as text, so
+a search with many hits stays small and fast.  The window draws only
+the rows that are visible, groups hits under a row for their file that
+can be collapsed, and goes straight to the stored location of a hit.
+"""
+import array
+from tkinter import Toplevel, Text
+from tkinter.font import Font
+from idlelib import ui
+
+MAX_LINE = 500  # Longest part of a line drawn.
+
+
+class GrepResults:
+    """The hits of a search, grouped by file.
+
+    Hit i is in file fileids[i], at line lines[i], column cols[i], and
+    the match is spans[i] characters long.  texts[i] is the line.
+
+    The display rows are kept in an array: a row holding n >= 0 is hit
+    n, a row holding -1-f is the header of file f.  The hits of a
+    collapsed file have no rows.
+    """
+
+    def __init__(self):
+        self.files = []  # File names, or error messages, by file id.
+        self.firsts = array.array('l')  # First hit of each file.
+        self.counts = array.array('l')  # Number of hits in each file.
+        self.collapsed = set()  # Ids of collapsed files.
+        self.fileids = array.array('l')
+        self.lines = array.array('l')
+        self.cols = array.array('l')
+        self.spans = array.array('l')
+        self.texts = []
+        self.rows = array.array('l')
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add(self, name, hits, prog=None):
+        """Add file name with hits, a list of (lineno, line) pairs.
+
+        prog, if given, locates the match in each line.  Return the id
+        of the new file.
+        """
+        fid = len(self.files)
+        self.files.append(name)
+        self.firsts.append(len(self.lines))
+        self.counts.append(len(hits))
+        self.rows.append(-1 - fid)
+        for lineno, line in hits:
+            m = prog.search(line) if prog is not None else None
+            col, end = m.span() if m else (0, 0)
+            self.rows.append(len(self.lines))
+            self.fileids.append(fid)
+            self.lines.append(lineno)
+            self.cols.append(col)
+            self.spans.append(end - col)
+            self.texts.append(line)
+        return fid
+
+    def toggle(self, fid):
+        "Collapse file fid if expanded, else expand it."
+        if fid in self.collapsed:
+            self.collapsed.remove(fid)
+        else:
+            self.collapsed.add(fid)
+        self.rows = rows = array.array('l')
+        for f in range(len(self.files)):
+            rows.append(-1 - f)
+            if f not in self.collapsed:
+                first = self.firsts[f]
+                rows.extend(range(first, first + self.counts[f]))
+
+    def location(self, n):
+        "Return (filename, lineno, col, span) for hit n."
+        return (self.files[self.fileids[n]], self.lines[n], self.cols[n],
+                self.spans[n])
+
+    def row_text(self, row):
+        """Return (text, highlight) to draw for a row.
+
+        highlight is the (start, end) of the match in text, or None.
+        """
+        n = self.rows[row]
+        if n < 0:
+            fid = -1 - n
+            count = self.counts[fid]
+            if not count:
+                return self.files[fid], None  # An error message.
+            mark = "+" if fid in self.collapsed else "-"
+            return "%s %s (%d)" % (mark, self.files[fid], count), None
+        prefix = "    %d: " % self.lines[n]
+        line = self.texts[n][:MAX_LINE]
+        start = min(len(prefix) + self.cols[n], len(prefix) + len(line))
+        end = min(start + self.spans[n], len(prefix) + len(line))
+        return prefix + line, (start, end)
+
+
+class GrepResultsWindow:
+    """Show the results of a GrepJob as the search runs.
+
+    Finished files are fetched in batches from a Tk timer, so the GUI
+    stays responsive.  A status line shows progress and a Cancel button
+    while the search runs.
+
+    Click a file row to collapse or expand its hits.  Double-click a hit,
+    or select it with the arrow keys and press Return, to open the file
+    at the match.
+    """
+    poll_interval = 50  # msec
+    batch_files = 500  # Most files fetched per poll.
+
+    def __init__(self, flist, job, pat, path):
+        self.flist = flist
+        self.job = job
+        self.results = GrepResults()
+        self.first = 0  # Row drawn at the top.
+        self.selected = None  # Selected row.
+        self.nvisible = 25
+        self.finished = False
+        self.closed = False
+
+        self.top = top = Toplevel(flist.root)
+        top.title("Find in Files: %r in %s" % (pat, path))
+        top.protocol("WM_DELETE_WINDOW", self.close)
+        top.bind("<Escape>", self.close)
+        frame = ui.Frame(top)
+        frame.pack(side="top", fill="both", expand=True)
+        self.text = text = Text(frame, wrap="none", width=100,
+                                height=self.nvisible, cursor="arrow",
+                                takefocus=True)
+        self.vbar = ui.Scrollbar(frame, command=self.yview)
+        self.vbar.pack(side="right", fill="y")
+        text.pack(side="left", fill="both", expand=True)
+        self.bold = Font(font=text["font"])
+        self.bold.configure(weight="bold")
+        text.tag_configure("file", font=self.bold)
+        text.tag_configure("hit", background="yellow")
+        text.tag_configure("selected", background="#c3d9ff")
+        text.tag_raise("hit")
+        text.config(state="disabled")
+        self.linespace = Font(font=text["font"]).metrics("linespace")
+
+        status = ui.Frame(top)
+        status.pack(side="bottom", fill="x")
+        self.status = ui.Label(status, anchor="w")
+        self.status.pack(side="left", fill="x", expand=True)
+        self.cancel_button = ui.Button(status, text="Cancel",
+                                       command=self.cancel)
+        self.cancel_button.pack(side="right")
+
+        text.bind("<Configure>", self.resize_event)
+        text.bind("<Button-1>", lambda event: "break")  # No text selection.
+        text.bind("<B1-Motion>", lambda event: "break")
+        text.bind("<ButtonRelease-1>", self.click_event)
+        text.bind("<Double-Button-1>", self.double_click_event)
+        text.bind("<Return>", self.goto_event)
+        text.bind("<Up>", lambda event: self.move(-1))
+        text.bind("<Down>", lambda event: self.move(1))
+        text.bind("<Prior>", lambda event: self.move(-self.nvisible))
+        text.bind("<Next>", lambda event: self.move(self.nvisible))
+        text.bind("<MouseWheel>", self.wheel_event)
+        text.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        text.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+        text.focus_set()
+
+        job.start()
+        self.poll()
+
+    # Fetching results
+
+    def poll(self):
+        if self.finished or self.closed:
+            return
+        job = self.job
+        results = self.results
+        nrows = len(results.rows)
+        for i, (fn, hits, error) in enumerate(job.results()):
+            if error is not None:
+                results.add(str(error), [])
+            elif hits:
+                results.add(fn, hits, job.prog)
+            if i >= self.batch_files:
+                break
+        if job.done():
+            self.finish()
+        else:
+            self.set_status("Searched %d of %d files, %d hits" %
+                            (job.searched, job.found, job.hits))
+            self.text.after(self.poll_interval, self.poll)
+        if len(results.rows) != nrows:
+            self.draw()
+
+    def set_status(self, msg):
+        self.status.config(text=msg)
+
+    def cancel(self):
+        self.job.cancel()
+        self.finish()
+
+    def finish(self):
+        self.finished = True
+        if self.cancel_button is not None:
+            self.cancel_button.destroy()
+            self.cancel_button = None
+        job = self.job
+        files = sum(1 for count in self.results.counts if count)
+        if job.cancelled.is_set():
+            msg = "Search cancelled after %d files. " % job.searched
+        else:
+            msg = ""
+        self.set_status(msg + "%d hits in %d files" % (job.hits, files))
+
+    def close(self, event=None):
+        self.closed = True
+        self.job.cancel()
+        self.top.destroy()
+
+    # Drawing
+
+    def draw(self):
+        results = self.results
+        nrows = len(results.rows)
+        self.first = max(0, min(self.first, nrows - self.nvisible))
+        text = self.text
+        text.config(state="normal")
+        text.delete("1.0", "end")
+        last = min(self.first + self.nvisible, nrows)
+        for row in range(self.first, last):
+            line, hit = results.row_text(row)
+            lineno = row - self.first + 1
+            tags = ("file",) if results.rows[row] < 0 else ()
+            text.insert("end", line + "\n", tags)
+            if hit is not None and hit[0] < hit[1]:
+                text.tag_add("hit", "%d.%d" % (lineno, hit[0]),
+                             "%d.%d" % (lineno, hit[1]))
+            if row == self.selected:
+                text.tag_add("selected", "%d.0" % lineno,
+                             "%d.0" % (lineno + 1))
+        text.config(state="disabled")
+        if nrows:
+            self.vbar.set(self.first / nrows, last / nrows)
+        else:
+            self.vbar.set(0, 1)
+
+    def yview(self, *args):
+        "Scroll as the scrollbar asks."
+        nrows = len(self.results.rows)
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * nrows)
+        elif args[0] == "scroll":
+            count = int(args[1])
+            if args[2] == "pages":
+                count *= max(1, self.nvisible - 1)
+            self.first += count
+        self.draw()
+
+    def wheel_event(self, event):
+        self.yview("scroll", -3 if event.delta > 0 else 3, "units")
+        return "break"
+
+    def resize_event(self, event):
+        nvisible = max(1, event.height // self.linespace)
+        if nvisible != self.nvisible:
+            self.nvisible = nvisible
+            self.draw()
+
+    # Selecting and opening hits
+
+    def row_at(self, event):
+        lineno = int(self.text.index("@%d,%d" % (event.x, event.y))
+                     .split(".")[0])
+        row = self.first + lineno - 1
+        if row < min(self.first + self.nvisible, len(self.results.rows)):
+            return row
+        return None
+
+    def click_event(self, event):
+        row = self.row_at(event)
+        if row is None:
+            return "break"
+        self.selected = row
+        n = self.results.rows[row]
+        if n < 0 and self.results.counts[-1 - n]:
+            self.results.toggle(-1 - n)
+        self.draw()
+        self.text.focus_set()
+        return "break"
+
+    def double_click_event(self, event):
+        row = self.row_at(event)
+        if row is not None and self.results.rows[row] >= 0:
+            self.goto(self.results.rows[row])
+        return "break"
+
+    def goto_event(self, event=None):
+        if self.selected is not None:
+            n = self.results.rows[self.selected]
+            if n >= 0:
+                self.goto(n)
+            elif self.results.counts[-1 - n]:
+                self.results.toggle(-1 - n)
+                self.draw()
+        return "break"
+
+    def move(self, delta):
+        nrows = len(self.results.rows)
+        if not nrows:
+            return "break"
+        row = 0 if self.selected is None else self.selected + delta
+        self.selected = row = max(0, min(row, nrows - 1))
+        if row < self.first:
+            self.first = row
+        elif row >= self.first + self.nvisible:
+            self.first = row - self.nvisible + 1
+        self.draw()
+        return "break"
+
+    def goto(self, n):
+        "Open the file of hit n and select the match."
+        filename, lineno, col, span = self.results.location(n)
+        edit = self.flist.open(filename)
+        if edit is None:
+            return
+        edit.gotoline(lineno)
+        text = edit.file_text()
+        first = "%d.%d" % (lineno, col)
+        last = "%s+%dc" % (first, span)
+        text.tag_remove("sel", "1.0", "end")
+        text.tag_add("sel", first, last)
+        text.mark_set("insert", first)
+        text.see("insert")
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_grepresults', verbosity=2)
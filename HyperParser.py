@@ -36,7 +36,13 @@ class HyperParser:
             return int(float(index))
         lno = index2line(text.index(index))
 
-        if not editwin.context_use_ps1:
+        stmt_start = getattr(editwin, 'stmt_start', None)
+        if not editwin.context_use_ps1 and stmt_start is not None:
+            startatindex = "%d.0" % stmt_start(lno)
+            stopatindex = "%d.end" % lno
+            # See below for the added space and newline.
+            parser.set_str(text.get(startatindex, stopatindex)+' \n')
+        elif not editwin.context_use_ps1:
             for context in editwin.num_context_lines:
                 startat = max(lno - context, 1)
                 startatindex = repr(startat) + ".0"
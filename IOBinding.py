@@ -6,8 +6,11 @@ import tempfile
 import tkinter.filedialog as tkFileDialog
 import tkinter.messagebox as tkMessageBox
 import re
+import shutil
+import threading
 from tkinter import *
 from idlelib import querydialog
+from idlelib import LargeFile
 from idlelib.configHandler import idleConf
 
 from codecs import BOM_UTF8
@@ -105,6 +108,160 @@ def coding_spec(data):
     return name
 
 
+class StreamDecoder:
+    """Read a binary file a chunk at a time, decoding it incrementally
+    and converting its end-of-lines to '\n'.
+
+    eol is the first end-of-line read, and nonascii whether any
+    character read was not ASCII.
+    """
+
+    def __init__(self, f, encoding):
+        self.file = f
+        self.size = os.fstat(f.fileno()).st_size
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.cr = ''  # A '\r' held back, in case '\n' starts the next chunk.
+        self.eol = None
+        self.nonascii = False
+        self.done = False
+
+    def read(self, size):
+        "Return the next chunk of text; done is set after the last."
+        data = self.file.read(size)
+        final = not data
+        chars = self.cr + self.decoder.decode(data, final)
+        self.cr = ''
+        if chars.endswith('\r') and not final:
+            chars, self.cr = chars[:-1], '\r'
+        if self.eol is None:
+            firsteol = IOBinding.eol_re.search(chars)
+            if firsteol:
+                self.eol = firsteol.group(0)
+        chars = chars.replace('\r\n', '\n').replace('\r', '\n')
+        if chars and not self.nonascii:
+            self.nonascii = max(chars) > '\x7f'
+        self.done = final
+        return chars
+
+    def progress(self):
+        "Return the percentage of the file read."
+        return self.file.tell() * 100 // max(self.size, 1)
+
+
+def encode_text(chars, fileencoding=None):
+    """Return chars encoded for saving, and why the encoding failed.
+
+    The reason is None unless the declared encoding is unknown or can't
+    encode chars; the text is then encoded as UTF-8 with a BOM.
+    """
+    # Preserve a BOM that might have been present on opening
+    if fileencoding == 'BOM':
+        return BOM_UTF8 + chars.encode("utf-8"), None
+    # See whether there is anything non-ASCII in it.
+    # If not, no need to figure out the encoding.
+    try:
+        return chars.encode('ascii'), None
+    except UnicodeError:
+        pass
+    # Check if there is an encoding declared
+    try:
+        # a string, let coding_spec slice it to the first two lines
+        enc = coding_spec(chars)
+        failed = None
+    except LookupError as msg:
+        failed = msg
+        enc = None
+    else:
+        if not enc:
+            # PEP 3120: default source encoding is UTF-8
+            enc = 'utf-8'
+    if enc:
+        try:
+            return chars.encode(enc), None
+        except UnicodeError:
+            failed = "Invalid encoding '%s'" % enc
+    # Fallback: save as UTF-8, with BOM - ignoring the incorrect
+    # declared encoding
+    return BOM_UTF8 + chars.encode("utf-8"), failed
+
+def write_atomic(filename, data):
+    """Write data to filename without ever leaving it half written.
+
+    The data goes to a temporary file in the same directory, which is
+    flushed to disk and then renamed over filename, so a crash leaves
+    the old file or the new one.  The old file's permissions are kept,
+    and a symbolic link is written through, not replaced.
+    """
+    filename = os.path.realpath(filename)
+    tempname = "%s.%d.tmp" % (filename, os.getpid())
+    try:
+        with open(tempname, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(filename, tempname)
+        except OSError:
+            pass  # A new file.
+        os.replace(tempname, filename)
+    except BaseException:
+        try:
+            os.remove(tempname)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable.
+        try:
+            fd = os.open(os.path.dirname(filename), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+
+def _chain(on_done, then):
+    # Return an on_done for start_write calling on_done, then then.
+    if then is None:
+        return on_done
+    def chained(job):
+        on_done(job)
+        then(job)
+    return chained
+
+
+class WriteJob:
+    """Encode text and write it to a file in a worker thread.
+
+    The text is a snapshot taken when the job is made; its newlines are
+    converted to eol.  When the thread is done, error is the exception
+    that stopped the write, if any, and failed why the text had to be
+    saved as UTF-8, if it did.
+    """
+
+    def __init__(self, filename, chars, eol, fileencoding, on_done=None):
+        self.filename = filename
+        self.chars = chars
+        self.eol = eol
+        self.fileencoding = fileencoding
+        self.on_done = on_done  # Called with the job once it is written.
+        self.version = None  # The buffer version saved.
+        self.error = self.failed = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        chars, self.chars = self.chars, None
+        try:
+            if self.eol != "\n":
+                chars = chars.replace("\n", self.eol)
+            data, self.failed = encode_text(chars, self.fileencoding)
+            write_atomic(self.filename, data)
+        except Exception as msg:
+            self.error = msg
+
+
 class IOBinding:
 
     def __init__(self, editwin):
@@ -118,8 +275,15 @@ class IOBinding:
                                             self.save_a_copy)
         self.fileencoding = None
         self.__id_print = self.text.bind("<<print-window>>", self.print_window)
+        self.stream = None  # The StreamDecoder of a file being loaded.
+        self.stream_id = None
+        self.writing = None  # The WriteJob of a save in progress.
+        self.write_id = None
 
     def close(self):
+        self.wait_for_write()
+        self.cancel_loading()
+        self.unmap()
         # Undo command bindings
         self.text.unbind("<<open-window-from-file>>", self.__id_open)
         self.text.unbind("<<save-window>>", self.__id_save)
@@ -206,8 +370,25 @@ class IOBinding:
     eol = r"(\r\n)|\n|\r"  # \r\n (Windows), \n (UNIX), or \r (Mac)
     eol_re = re.compile(eol)
     eol_convention = os.linesep  # default
+    stream_size = 1 << 22  # Larger files are loaded a slice at a time.
+    stream_chunk = 1 << 18  # Bytes read per slice.
+    map_size = 1 << 27  # Larger files are shown read only, a page at a time.
 
     def loadfile(self, filename):
+        self.cancel_loading()
+        self.unmap()
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            size = 0  # Reported by loadwhole.
+        if size > self.map_size:
+            return self.mapfile(filename)
+        if size > self.stream_size:
+            return self.streamfile(filename)
+        return self.loadwhole(filename)
+
+    def loadwhole(self, filename):
+        "Load filename all at once."
         try:
             # open the file in binary mode so that we can handle
             # end-of-line convention ourselves.
@@ -243,6 +424,166 @@ class IOBinding:
         self.updaterecentfileslist(filename)
         return True
 
+    def streamfile(self, filename):
+        """Load a large file a slice at a time, when Tk is idle.
+
+        The first slice is shown at once and can be edited while the
+        rest is read, decoded and appended.  Loaded text goes in below
+        the undo and colorizer filters, so it can't be undone and is
+        colorized once all is loaded.  Files without a declared encoding
+        are read as UTF-8.  The file is loaded whole instead, with the
+        checks and questions of loadwhole, if its encoding declaration
+        is bad or it fails to decode; if the text was edited by then,
+        the user is asked first.
+        """
+        f = None
+        try:
+            f = open(filename, 'rb')
+            two_lines = f.readline() + f.readline()
+            f.seek(0)
+            if two_lines.startswith(BOM_UTF8):
+                f.seek(3)
+                enc, fileencoding = 'utf-8', 'BOM'
+            else:
+                enc = fileencoding = coding_spec(two_lines)
+            stream = StreamDecoder(f, enc or 'utf-8')
+            chars = stream.read(self.stream_chunk)
+        except OSError as msg:
+            if f:
+                f.close()
+            tkMessageBox.showerror("I/O Error", str(msg), parent=self.text)
+            return False
+        except (LookupError, UnicodeDecodeError):
+            f.close()
+            return self.loadwhole(filename)
+        self.fileencoding = fileencoding
+        self.stream = stream
+        self.text.delete("1.0", "end")
+        self.set_filename(None)
+        self._insert_loaded(chars)
+        self.reset_undo()
+        self.set_filename(filename)
+        self.text.mark_set("insert", "1.0")
+        self.text.yview("insert")
+        self.updaterecentfileslist(filename)
+        self.stream_id = self.text.after_idle(self._load_more)
+        return True
+
+    def mapfile(self, filename):
+        """Show a huge file read only, a page at a time, from a memory map.
+
+        Only the lines around the view are put in the Text widget, so
+        memory use does not grow with the size of the file; see
+        LargeFile.  Files without a declared encoding are read as UTF-8,
+        undecodable bytes are replaced, and files in an encoding such as
+        UTF-16, whose lines can't be found by their bytes, are streamed.
+        """
+        try:
+            with open(filename, 'rb') as f:
+                two_lines = f.readline(1024) + f.readline(1024)
+            start = 0
+            if two_lines.startswith(BOM_UTF8):
+                start = 3
+                enc, fileencoding = 'utf-8', 'BOM'
+            else:
+                try:
+                    enc = fileencoding = coding_spec(two_lines)
+                except LookupError:
+                    enc = fileencoding = None
+                enc = enc or 'utf-8'
+                if '\n'.encode(enc) != b'\n':
+                    return self.streamfile(filename)
+            mapped = LargeFile.MappedFile(filename, enc, start)
+        except OSError as msg:
+            tkMessageBox.showerror("I/O Error", str(msg), parent=self.text)
+            return False
+        self.fileencoding = fileencoding
+        self.text.delete("1.0", "end")
+        self.set_filename(None)
+        self.editwin.pager = LargeFile.Pager(self.editwin, mapped)
+        self.reset_undo()
+        self.set_filename(filename)
+        self.updaterecentfileslist(filename)
+        return True
+
+    def unmap(self):
+        "Stop showing a file a page at a time."
+        pager = getattr(self.editwin, 'pager', None)
+        if pager is not None:
+            pager.close()
+            self.editwin.pager = None
+
+    def _insert_loaded(self, chars):
+        # Insert at the end, below the undo and colorizer filters.
+        shadow = getattr(self.editwin, 'shadow', None)
+        (shadow or self.text).insert("end-1c", chars)
+
+    def _load_more(self):
+        # Load a slice of the file being streamed, and schedule the next.
+        self.stream_id = None
+        stream = self.stream
+        if not stream.done:
+            try:
+                self._insert_loaded(stream.read(self.stream_chunk))
+            except UnicodeDecodeError:
+                self.cancel_loading()
+                self._stream_failed()
+                return
+        if stream.done:
+            self.cancel_loading()
+            if stream.eol:
+                self.eol_convention = stream.eol
+            if self.fileencoding is None and stream.nonascii:
+                self.fileencoding = 'utf-8'
+            color = getattr(self.editwin, 'color', None)
+            if color:
+                color.notify_range("1.0", "end")
+        else:
+            self.stream_id = self.text.after_idle(self._load_more)
+        self.editwin.top.ping_statusbar()
+
+    def _stream_failed(self):
+        # The rest of the file being streamed failed to decode.  Reload it
+        # whole, unless that would discard edits the user wants to keep.
+        # Those stay, but untitled, since saving the part of the file
+        # loaded over the file would cut it short.
+        filename = self.filename
+        message = "File %s\nFailed to decode as %s" % (
+                filename, self.fileencoding or 'utf-8')
+        if self.get_saved():
+            tkMessageBox.showerror("Decoding Error",
+                                   message + "; reloading it.",
+                                   parent=self.text)
+        elif not tkMessageBox.askyesno("Decoding Error",
+                message + " after it was edited.\n\n"
+                "Reload it and discard the edits?  If not, the part "
+                "loaded is kept, with the edits, as an untitled file.",
+                default="no", parent=self.text):
+            self.set_filename(None)
+            self.set_saved(False)
+            return
+        self.loadwhole(filename)
+
+    def cancel_loading(self):
+        "Stop loading a file a slice at a time."
+        if self.stream_id is not None:
+            self.text.after_cancel(self.stream_id)
+            self.stream_id = None
+        if self.stream is not None:
+            self.stream.file.close()
+            self.stream = None
+
+    def load_status(self):
+        "Return a note of the progress of loading, or ''."
+        pager = getattr(self.editwin, 'pager', None)
+        if pager is not None:
+            return pager.status()
+        if self.writing is not None:
+            return "Saving"
+        if self.stream is None:
+            return ''
+        return "Loading %d%%" % self.stream.progress()
+
     def _decode(self, two_lines, bytes):
         "Create a Unicode string."
         chars = None
@@ -324,6 +665,7 @@ class IOBinding:
         if confirm:
             reply = "yes"
             self.save(None)
+            self.wait_for_write()
             if not self.get_saved():
                 reply = "cancel"
         elif confirm is None:
@@ -333,94 +675,141 @@ class IOBinding:
         self.text.focus_set()
         return reply
 
-    def save(self, event):
+    def save(self, event, on_done=None):
+        """Save the text in the background, asking for a name if it has none.
+
+        on_done, if given, is called with the WriteJob once the text is
+        saved; it is not called if the save fails or is cancelled.
+        """
         if not self.filename:
-            self.save_as(event)
+            self.save_as(event, on_done)
         else:
-            if self.writefile(self.filename):
-                self.set_saved(True)
-                try:
-                    self.editwin.store_file_breaks()
-                except AttributeError:  # may be a PyShell
-                    pass
+            self.start_write(self.filename, _chain(self._saved, on_done))
         self.text.focus_set()
         return "break"
 
-    def save_as(self, event):
+    def _saved(self, job):
+        # Mark the text saved, unless it was changed while being written.
+        self.set_saved(self._version() == job.version)
+        try:
+            self.editwin.store_file_breaks()
+        except AttributeError:  # may be a PyShell
+            pass
+
+    def save_as(self, event, on_done=None):
         filename = self.asksavefile()
         if filename:
-            if self.writefile(filename):
-                self.set_filename(filename)
-                self.set_saved(1)
-                try:
-                    self.editwin.store_file_breaks()
-                except AttributeError:
-                    pass
+            self.start_write(filename, _chain(self._saved_as, on_done))
         self.text.focus_set()
-        self.updaterecentfileslist(filename)
         return "break"
 
+    def _saved_as(self, job):
+        self.set_filename(job.filename)
+        self._saved(job)
+        self.updaterecentfileslist(job.filename)
+
     def save_a_copy(self, event):
         filename = self.asksavefile()
         if filename:
-            self.writefile(filename)
+            self.start_write(filename, self._saved_copy)
         self.text.focus_set()
-        self.updaterecentfileslist(filename)
         return "break"
 
+    def _saved_copy(self, job):
+        self.updaterecentfileslist(job.filename)
+
+    write_poll = 50  # Milliseconds between checks on a save in progress.
+
     def writefile(self, filename):
+        "Write the text to filename, waiting; return True if it was written."
+        return self.start_write(filename) is not None and self.wait_for_write()
+
+    def start_write(self, filename, on_done=None):
+        """Start writing the text to filename in a WriteJob.
+
+        The text is copied at once, and encoded and written by a worker
+        thread.  on_done is called with the job, in the Tk thread, once
+        the file is written.  Return the job, or None if the text can't
+        be saved now.
+        """
+        self.wait_for_write()
+        if self.stream is not None:
+            tkMessageBox.showerror("Save Error",
+                                   "The file is still being loaded.",
+                                   parent=self.text)
+            return None
+        if getattr(self.editwin, 'pager', None) is not None:
+            tkMessageBox.showerror("Save Error",
+                                   "The file is too large to edit and "
+                                   "is shown read only.",
+                                   parent=self.text)
+            return None
         self.fixlastline()
-        text = self.text.get("1.0", "end-1c")
-        if self.eol_convention != "\n":
-            text = text.replace("\n", self.eol_convention)
-        chars = self.encode(text)
-        try:
-            with open(filename, "wb") as f:
-                f.write(chars)
+        job = WriteJob(filename, self.text.get("1.0", "end-1c"),
+                       self.eol_convention, self.fileencoding, on_done)
+        job.version = self._version()
+        self.writing = job
+        job.thread.start()
+        self.write_id = self.text.after(self.write_poll, self._poll_write)
+        self._ping_statusbar()
+        return job
+
+    def _poll_write(self):
+        # Finish the save in progress once its thread is done.
+        self.write_id = None
+        if self.writing.thread.is_alive():
+            self.write_id = self.text.after(self.write_poll, self._poll_write)
+        else:
+            self.finish_write()
+
+    def wait_for_write(self):
+        "Wait for a save in progress; return False if it failed."
+        if self.writing is None:
             return True
-        except OSError as msg:
-            tkMessageBox.showerror("I/O Error", str(msg),
+        self.writing.thread.join()
+        return self.finish_write()
+
+    def finish_write(self):
+        "Report on the finished save, and call its on_done if it worked."
+        job, self.writing = self.writing, None
+        if self.write_id is not None:
+            self.text.after_cancel(self.write_id)
+            self.write_id = None
+        self._ping_statusbar()
+        if job.error is not None:
+            tkMessageBox.showerror("I/O Error", str(job.error),
                                    parent=self.text)
             return False
+        if job.failed:
+            tkMessageBox.showerror("I/O Error",
+                                   "%s.\nSaved as UTF-8" % job.failed,
+                                   parent=self.text)
+        if job.on_done:
+            job.on_done(job)
+        return True
+
+    def _version(self):
+        # The version of the editor's buffer, to tell if it has changed.
+        buffer = getattr(self.editwin, 'buffer', None)
+        return buffer.version if buffer is not None else None
+
+    def _ping_statusbar(self):
+        top = getattr(self.editwin, 'top', None)
+        if top is not None:
+            top.ping_statusbar()
 
     def encode(self, chars):
         if isinstance(chars, bytes):
             # This is either plain ASCII, or Tk was returning mixed-encoding
             # text to us. Don't try to guess further.
             return chars
-        # Preserve a BOM that might have been present on opening
-        if self.fileencoding == 'BOM':
-            return BOM_UTF8 + chars.encode("utf-8")
-        # See whether there is anything non-ASCII in it.
-        # If not, no need to figure out the encoding.
-        try:
-            return chars.encode('ascii')
-        except UnicodeError:
-            pass
-        # Check if there is an encoding declared
-        try:
-            # a string, let coding_spec slice it to the first two lines
-            enc = coding_spec(chars)
-            failed = None
-        except LookupError as msg:
-            failed = msg
-            enc = None
-        else:
-            if not enc:
-                # PEP 3120: default source encoding is UTF-8
-                enc = 'utf-8'
-        if enc:
-            try:
-                return chars.encode(enc)
-            except UnicodeError:
-                failed = "Invalid encoding '%s'" % enc
-        tkMessageBox.showerror(
-            "I/O Error",
-            "%s.\nSaving as UTF-8" % failed,
-            parent = self.text)
-        # Fallback: save as UTF-8, with BOM - ignoring the incorrect
-        # declared encoding
-        return BOM_UTF8 + chars.encode("utf-8")
+        chars, failed = encode_text(chars, self.fileencoding)
+        if failed:
+            tkMessageBox.showerror(
+                "I/O Error",
+                "%s.\nSaving as UTF-8" % failed,
+                parent = self.text)
+        return chars
 
     def fixlastline(self):
         c = self.text.get("end-2c")
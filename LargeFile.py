@@ -0,0 +1,443 @@
+"""Show files too large to load into a Text widget, read only.
+
+IOBinding maps a file larger than IOBinding.map_size into memory with a
+MappedFile, and the editor shows it through a Pager, which keeps only a
+page of lines around the view in the Text widget.  A page is at most
+PAGE lines and PAGE_BYTES bytes, and lines longer than WIDTH bytes are
+cut short in it.  Searches and Go to line address the whole file
+through the Pager's PagedText.
+"""
+import bisect
+import mmap
+import os
+import re
+import threading
+from idlelib.Delegator import Delegator
+
+BLOCK = 1 << 16  # Bytes per entry of a MappedFile's line index.
+PAGE = 600  # Most lines held in the Text widget.
+PAGE_BYTES = 1 << 20  # Most bytes of the file read for the widget.
+WIDTH = 10000  # Bytes of a line shown; the rest is replaced by CUT.
+CUT = '\u2026'
+MARGIN = 100  # Lines kept beyond the view before the page is moved.
+POLL = 250  # Milliseconds between status updates while indexing.
+
+
+class Indexing(Exception):
+    "The end of a file was asked for while it is still being indexed."
+
+
+class MappedFile:
+    """A file mapped into memory, read only, with a sparse line index.
+
+    counts[k] is the number of newlines before byte k * BLOCK, so the
+    index takes one int per BLOCK bytes.  A thread builds it in the
+    background; lookups beyond it extend it first.  Lines end at b'\\n',
+    a '\\r' before one is dropped, and line 1 starts at offset start,
+    after any BOM.  The encoding must keep '\\n' a single byte.
+    """
+
+    def __init__(self, filename, encoding='utf-8', start=0):
+        self.file = open(filename, 'rb')
+        try:
+            self.size = os.fstat(self.file.fileno()).st_size
+            self.map = mmap.mmap(self.file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as msg:  # ValueError: empty file.
+            self.file.close()
+            raise OSError(msg)
+        self.encoding = encoding
+        self.start = start
+        self.counts = [0]
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._build, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.map.close()
+            self.file.close()
+
+    def _build(self):
+        # Runs in the indexing thread.
+        while self._extend():
+            pass
+
+    def _extend(self):
+        # Index the next block; return False if all are indexed.
+        with self.lock:
+            pos = (len(self.counts) - 1) * BLOCK
+            if self.closed or pos >= self.size:
+                return False
+            newlines = self.map[pos:pos + BLOCK].count(b'\n')
+            self.counts.append(self.counts[-1] + newlines)
+            return True
+
+    def indexed(self):
+        "Return the number of bytes indexed."
+        return min((len(self.counts) - 1) * BLOCK, self.size)
+
+    def done(self):
+        return self.indexed() >= self.size
+
+    def progress(self):
+        "Return the percentage of the file indexed."
+        return self.indexed() * 100 // max(self.size, 1)
+
+    def linecount(self):
+        "Return the number of lines, estimated until the index is built."
+        counts = self.counts
+        k = len(counts) - 1
+        indexed = min(k * BLOCK, self.size)
+        newlines = counts[k]
+        if indexed < self.size:
+            newlines += (self.size - indexed) * newlines // max(indexed, 1)
+        return newlines + 1
+
+    def indexed_lines(self):
+        "Return the number of lines starting in the part indexed."
+        return self.counts[-1] + 1
+
+    def lastline(self):
+        "Return the number of lines, indexing the whole file if need be."
+        while self._extend():
+            pass
+        return self.counts[-1] + 1
+
+    def offset(self, lno, extend=True):
+        """Return the offset where line lno starts, or None past the end.
+
+        If extend is false, raise Indexing rather than index on to a line
+        past the part indexed.
+        """
+        if lno <= 1:
+            return self.start
+        need = lno - 1  # Newlines before the line.
+        if not extend and self.counts[-1] < need and not self.done():
+            raise Indexing(lno)
+        while self.counts[-1] < need and self._extend():
+            pass
+        counts = self.counts
+        k = bisect.bisect_left(counts, need) - 1
+        if k + 1 >= len(counts):
+            return None
+        pos = k * BLOCK  # The line starts in this block.
+        data = self.map[pos:pos + BLOCK]
+        rest = data.split(b'\n', need - counts[k])[-1]
+        return pos + len(data) - len(rest)
+
+    def get(self, first, last):
+        """Return the text of lines [first, last), each ending in '\\n'.
+
+        As with Text.get, the last line of the file ends in one too.
+        """
+        start = self.offset(first)
+        if start is None:
+            return ''
+        end = self.offset(last) if last > first else start
+        data = self.map[start:self.size if end is None else end]
+        chars = data.decode(self.encoding, 'replace').replace('\r\n', '\n')
+        return chars if end is not None else chars + '\n'
+
+    def page(self, first, count=PAGE, size=PAGE_BYTES, width=WIDTH):
+        """Return (lines, more) for the lines shown from line first.
+
+        lines lists the text of at most count lines, without their ends,
+        read from at most size bytes of the file.  A line longer than
+        width bytes is cut there and CUT added.  more is false if the last
+        line of the file is among them.  A line past one that is cut is
+        found with the index, so the lines may stop at the part indexed;
+        more is None then.
+        """
+        lines = []
+        try:
+            pos = self.offset(first, extend=False)
+        except Indexing:
+            return lines, None
+        read = 0
+        while pos is not None and len(lines) < count and read < size:
+            end = self.map.find(b'\n', pos, pos + width + 1)
+            cut = False
+            if end >= 0:
+                data = self.map[pos:end]
+                pos = end + 1
+            elif pos + width >= self.size:
+                data = self.map[pos:self.size]  # The last line.
+                pos = None
+            else:
+                data = self.map[pos:pos + width]
+                cut = True
+            line = data.decode(self.encoding, 'replace')
+            if line.endswith('\r'):
+                line = line[:-1]
+            lines.append(line + CUT if cut else line)
+            read += len(data)
+            if cut:
+                try:
+                    pos = self.offset(first + len(lines), extend=False)
+                except Indexing:
+                    return lines, None
+        return lines, pos is not None
+
+
+class ReadOnlyDelegator(Delegator):
+    "Refuse edits, ringing the bell."
+
+    def insert(self, index, chars, tags=None):
+        self.bell()
+
+    def delete(self, index1, index2=None):
+        self.bell()
+
+
+class Pager:
+    """Show a MappedFile in an editor's Text widget a page at a time.
+
+    The widget holds count lines of the file, from line first, as
+    MappedFile.page() gives them.  The page moves as the view nears its
+    edges, keeping the view and the insert cursor on the same file lines,
+    and the scrollbar shows the view's place in the whole file.  Lines
+    are put in below the undo and colorizer filters, and a
+    ReadOnlyDelegator on top refuses edits.
+    """
+
+    def __init__(self, editwin, mapped):
+        self.editwin = editwin
+        self.text = text = editwin.text
+        self.file = mapped
+        self.first = 1
+        self.count = 0  # Lines in the widget.
+        self.margin = 1  # Lines kept beyond the view, for count.
+        self.at_end = False  # Whether the page holds the last line.
+        self.follow_id = None
+        self.waiting = []  # Called once the file is indexed.
+        self.pending = None  # First line of a page to show then.
+        self.readonly = ReadOnlyDelegator()
+        editwin.per.insertfilter(self.readonly)
+        self.view = PagedText(self)
+        text['yscrollcommand'] = self.set_yview
+        editwin.vbar['command'] = self.yview
+        self.render(1)
+        text.mark_set("insert", "1.0")
+        self.poll_id = text.after(POLL, self.poll)
+
+    def close(self):
+        text = self.text
+        if self.follow_id is not None:
+            text.after_cancel(self.follow_id)
+        if self.poll_id is not None:
+            text.after_cancel(self.poll_id)
+        self.waiting = []
+        self.editwin.per.removefilter(self.readonly)
+        text['yscrollcommand'] = self.editwin.set_yview
+        self.editwin.vbar['command'] = text.yview
+        self.file.close()
+        self.editwin = self.text = self.view = None
+
+    def status(self):
+        "Return a note for the status bar."
+        if self.file.done():
+            return "Read only"
+        return "Read only, indexing %d%%" % self.file.progress()
+
+    def poll(self):
+        # Update the status bar and scrollbar while the file is indexed.
+        self.poll_id = None
+        self.editwin.top.ping_statusbar()
+        self.set_yview(*self.text.yview())
+        if not self.file.done():
+            self.poll_id = self.text.after(POLL, self.poll)
+            return
+        waiting, self.waiting = self.waiting, []
+        for func in waiting:
+            func()
+
+    def when_indexed(self, func):
+        "Call func once the whole file is indexed; now if it is."
+        if self.file.done():
+            func()
+        else:
+            self.waiting.append(func)
+
+    def render(self, first):
+        "Show the page from file line first, keeping the view and cursor."
+        text = self.text
+        first = max(1, first)
+        self.pending = None
+        if not self.file.done() and first > self.file.indexed_lines():
+            # Rather than index on to find the line here, show the lines
+            # indexed so far, then the page asked for once all are.
+            self.when_indexed(self._render_pending)
+            self.pending = first
+            first = max(1, self.file.indexed_lines() - PAGE + 1)
+        top = self.fileline("@0,0")
+        insert = self.view.index("insert")
+        lines, more = self.file.page(first)
+        if not lines and more is False:  # Past the end; show the last page.
+            first = max(1, self.file.lastline() - PAGE + 1)
+            lines, more = self.file.page(first)
+        elif more is None and self.pending is None:
+            # Stopped at the part indexed, after a line cut short.
+            self.when_indexed(self._render_pending)
+            self.pending = first
+        sink = getattr(self.editwin, 'shadow', None) or text
+        sink.delete("1.0", "end")
+        sink.insert("1.0", '\n'.join(lines))
+        self.first = first
+        self.count = len(lines)
+        self.margin = max(1, min(MARGIN, self.count // 4))
+        self.at_end = more is False
+        text.mark_set("insert", self.view.widget_index(insert))
+        text.yview(self.view.widget_index("%d.0" % top))
+        color = getattr(self.editwin, 'color', None)
+        if color:
+            color.notify_range("1.0", "end")
+
+    def _render_pending(self):
+        # Show the page put off by render(), unless another was shown.
+        if self.pending is not None:
+            self.render(self.pending)
+
+    def fileline(self, index):
+        "Return the file line of a widget index."
+        return int(self.text.index(index).split('.')[0]) + self.first - 1
+
+    def show(self, lno):
+        "Page in the lines around file line lno, unless they are shown."
+        line = lno - self.first + 1
+        low = self.margin if self.first > 1 else 1
+        high = self.count if self.at_end else self.count - self.margin
+        if not low <= line <= high:
+            self.render(lno - self.count // 2)
+            if lno >= self.first + self.count and not self.at_end:
+                self.render(lno)  # Fewer lines fit around it.
+
+    def follow(self):
+        # Move the page if the view has neared one of its edges.
+        self.follow_id = None
+        if self.pending is not None:
+            return  # The page wanted is shown once the file is indexed.
+        top = self.fileline("@0,0") - self.first + 1
+        bottom = self.fileline("@0,65535") - self.first + 1
+        margin = self.margin
+        if ((self.first > 1 and top < margin) or
+                (not self.at_end and bottom > self.count - margin)):
+            self.render(self.first + (top + bottom) // 2 - 1 - self.count // 2)
+
+    def set_yview(self, first, last):
+        # The widget's yscrollcommand: place the scrollbar by file line.
+        total = max(self.file.linecount(), self.first + self.count - 1)
+        offset = self.first - 1
+        self.editwin.set_yview((offset + float(first) * self.count) / total,
+                               (offset + float(last) * self.count) / total)
+        if self.follow_id is None:
+            self.follow_id = self.text.after_idle(self.follow)
+
+    def yview(self, *args):
+        # The scrollbar's command: moveto goes to a line of the file.
+        if args[0] == 'moveto':
+            lno = int(float(args[1]) * self.file.linecount()) + 1
+            self.show(lno)
+            self.text.yview(self.view.widget_index("%d.0" % lno))
+        else:
+            self.text.yview(*args)
+
+
+class PagedText:
+    """The Text widget of a Pager, addressed by file line.
+
+    Indexes 'line.col', with any modifiers after, are places in the
+    file; others, like marks, are resolved by the widget, and 'end' and
+    'end-1c' are the end of the file.  get() reads the file, so code
+    that searches a Text widget searches the whole file through this.
+    Setting a mark or adding a tag pages in the lines it falls on.
+
+    The end is not known until the file is indexed; till then, index()
+    raises Indexing for it, and callers can retry on the Pager's
+    when_indexed().
+    """
+    _index_re = re.compile(r'(\d+)\.(\d+)(.*)$', re.S)
+
+    def __init__(self, pager):
+        self.pager = pager
+        self.text = pager.text
+
+    def __getattr__(self, name):
+        return getattr(self.text, name)
+
+    def widget_index(self, index, show=False):
+        "Return the widget index for index, paging it in if show is true."
+        m = self._index_re.match(index)
+        if not m:
+            return index
+        lno = int(m.group(1))
+        if show:
+            self.pager.show(lno)
+        line = lno - self.pager.first + 1
+        if line < 1:
+            return "1.0"
+        if line > self.pager.count:
+            return "end"
+        return "%d.%s%s" % (line, m.group(2), m.group(3))
+
+    def index(self, index):
+        if index in ('end', 'end-1c'):
+            if not self.pager.file.done():
+                raise Indexing(index)
+            last = self.pager.file.lastline()
+            if index == 'end':
+                return "%d.0" % (last + 1)
+            return "%d.%d" % (last, len(self.pager.file.get(last, last + 1))
+                                      - 1)
+        m = self._index_re.match(index)
+        if m and not m.group(3):
+            return "%d.%d" % (int(m.group(1)), int(m.group(2)))
+        line, col = self.text.index(self.widget_index(index)).split('.')
+        return "%d.%s" % (int(line) + self.pager.first - 1, col)
+
+    def get(self, index1, index2=None):
+        line1, col1 = map(int, self.index(index1).split('.'))
+        if index2 is None:
+            line2, col2 = line1, col1 + 1
+        else:
+            line2, col2 = map(int, self.index(index2).split('.'))
+        if (line2, col2) <= (line1, col1):
+            return ''
+        chars = self.pager.file.get(line1, line2 + 1)
+        if not chars:
+            return ''
+        start = min(col1, chars.index('\n'))
+        if line2 >= line1 + chars.count('\n'):
+            end = len(chars)  # Past the end of the file.
+        else:
+            linestart = chars.rfind('\n', 0, len(chars) - 1) + 1
+            end = min(linestart + col2, len(chars) - 1)
+        return chars[start:end]
+
+    def _wait(self, index, func):
+        # If index is past the lines indexed so far, call func once all
+        # are, instead of indexing on here, and return True.
+        m = self._index_re.match(index)
+        file = self.pager.file
+        if m and not file.done() and int(m.group(1)) > file.indexed_lines():
+            self.pager.when_indexed(func)
+            return True
+        return False
+
+    def mark_set(self, name, index):
+        if not self._wait(index, lambda: self.mark_set(name, index)):
+            self.text.mark_set(name, self.widget_index(index, True))
+
+    def see(self, index):
+        if not self._wait(index, lambda: self.see(index)):
+            self.text.see(self.widget_index(index, True))
+
+    def tag_add(self, tag, index1, *args):
+        index1 = self.widget_index(index1, True)
+        self.text.tag_add(tag, index1, *map(self.widget_index, args))
+
+    def tag_remove(self, tag, index1, *args):
+        self.text.tag_remove(tag, self.widget_index(index1),
+                            *map(self.widget_index, args))
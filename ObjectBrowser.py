@@ -19,6 +19,10 @@ myrepr = Repr()
 myrepr.maxstring = 100
 myrepr.maxother = 100
 
+# Number of children fetched at a time when expanding a container.
+# The remainder is represented by a single "... N more" node.
+PAGE_SIZE = 200
+
 class ObjectTreeItem(TreeItem):
     def __init__(self, labeltext, object, setfunction=None):
         self.labeltext = labeltext
@@ -82,17 +86,37 @@ class SequenceTreeItem(ObjectTreeItem):
     def keys(self):
         return range(len(self.object))
     def GetSubList(self):
+        return self.GetPage(0)
+    def GetPage(self, start, keys=None):
+        """Return items for keys[start:start+PAGE_SIZE] plus a "more" node.
+
+        The keys are computed afresh unless given; the "more" node keeps
+        them, so later pages of one expansion use the same key list.
+        Keys no longer in the container are counted in a note.
+        """
+        if keys is None:
+            keys = self.keys()
         sublist = []
-        for key in self.keys():
+        gone = 0
+        for key in keys[start:start+PAGE_SIZE]:
             try:
                 value = self.object[key]
-            except KeyError:
+            except (KeyError, IndexError):
+                gone += 1
                 continue
             def setfunction(value, key=key, object=self.object):
                 object[key] = value
-            item = make_objecttreeitem("%r:" % (key,), value, setfunction)
+            item = make_objecttreeitem(self.GetKeyLabel(key), value,
+                                       setfunction)
             sublist.append(item)
+        if gone:
+            sublist.append(NoteTreeItem("(%d no longer present)" % gone))
+        rest = len(keys) - start - PAGE_SIZE
+        if rest > 0:
+            sublist.append(MoreTreeItem(self, keys, start + PAGE_SIZE, rest))
         return sublist
+    def GetKeyLabel(self, key):
+        return "%s:" % myrepr.repr(key)
 
 class DictTreeItem(SequenceTreeItem):
     def keys(self):
@@ -103,6 +127,33 @@ class DictTreeItem(SequenceTreeItem):
             pass
         return keys
 
+class MoreTreeItem(TreeItem):
+    """Placeholder for the children of a container not yet fetched.
+
+    Expanding it fetches the next page from the owning item, using the
+    keys the owner listed for the page before.
+    """
+    def __init__(self, owner, keys, start, count):
+        self.owner = owner
+        self.keys = keys
+        self.start = start
+        self.count = count
+    def GetText(self):
+        return "\u2026 %d more" % self.count
+    def IsExpandable(self):
+        return True
+    def GetSubList(self):
+        return self.owner.GetPage(self.start, self.keys)
+
+class NoteTreeItem(TreeItem):
+    "A line of text among the children of a container."
+    def __init__(self, text):
+        self.text = text
+    def GetText(self):
+        return self.text
+    def IsExpandable(self):
+        return False
+
 dispatch = {
     int: AtomicObjectTreeItem,
     float: AtomicObjectTreeItem,
@@ -139,5 +190,8 @@ def _object_browser(parent):
     root.mainloop()
 
 if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_objectbrowser', verbosity=2, exit=False)
+
     from idlelib.idle_test.htest import run
     run(_object_browser)
@@ -5,11 +5,360 @@ paren.  Paren here is used generically; the matching applies to
 parentheses, square brackets, and curly braces.
 """
 
+import re
+from bisect import bisect_left
 from idlelib.HyperParser import HyperParser
+from idlelib.ShadowDelegator import _Fenwick
 from idlelib.configHandler import idleConf
 
 _openers = {')':'(',']':'[','}':'{'}
 CHECK_DELAY = 100 # miliseconds
+CHUNK = 128  # Lines per chunk of a BracketIndex, when first built.
+
+_special = re.compile(r"""[()\[\]{}#'"]""")
+_string_tails = {
+    "'": re.compile(r"(?:[^'\\]|\\.)*'"),
+    '"': re.compile(r'(?:[^"\\]|\\.)*"'),
+    "'''": re.compile(r"(?:[^\\]|\\.)*?'''"),
+    '"""': re.compile(r'(?:[^\\]|\\.)*?"""'),
+    }
+
+def scan_line(line, state=''):
+    """Return the brackets in code in line, and the state after it.
+
+    The brackets are a list of (column, bracket), leaving out those in
+    strings and comments.  A state is '' in code, or the quotes of the
+    string a line starts in.
+    """
+    brackets = []
+    i = 0
+    if state:
+        m = _string_tails[state].match(line)
+        if not m:
+            return brackets, _string_state(line, state)
+        i = m.end()
+    while True:
+        m = _special.search(line, i)
+        if not m:
+            return brackets, ''
+        c = m.group()
+        i = m.end()
+        if c == '#':
+            return brackets, ''
+        elif c in '\'"':
+            if line.startswith(c * 2, i):
+                c *= 3
+                i += 2
+            m = _string_tails[c].match(line, i)
+            if not m:
+                return brackets, _string_state(line, c)
+            i = m.end()
+        else:
+            brackets.append((m.start(), c))
+
+def _string_state(line, quotes):
+    # The state after line, which ends in a string started with quotes.
+    if len(quotes) == 3:
+        return quotes
+    backslashes = len(line) - len(line.rstrip('\\'))
+    return quotes if backslashes % 2 else ''
+
+def balance(brackets):
+    """Return the numbers of closers and of openers left unmatched in
+    brackets, a list of (column, bracket)."""
+    need = excess = 0
+    for col, c in brackets:
+        if c in _openers:  # A closer.
+            if excess:
+                excess -= 1
+            else:
+                need += 1
+        else:
+            excess += 1
+    return need, excess
+
+def _combine(first, second):
+    # The balance of two runs of brackets, one after the other.
+    need1, excess1 = first
+    need2, excess2 = second
+    return (need1 + max(0, need2 - excess1),
+            excess2 + max(0, excess1 - need2))
+
+def _find(brackets, depth, closing):
+    # Return the column of the bracket in brackets, walked in the order
+    # given, that closes depth brackets, and the depth left.
+    for col, c in brackets:
+        if (c in _openers) == closing:  # A closer, when closing.
+            depth -= 1
+            if not depth:
+                return col, 0
+        else:
+            depth += 1
+    return None, depth
+
+def _chunk_balance(chunk):
+    # The balance of the brackets of a chunk of BracketIndex entries.
+    total = (0, 0)
+    for entry in chunk:
+        total = _combine(total, entry[2])
+    return total
+
+
+class BracketIndex:
+    """The brackets outside strings and comments in each line of a
+    TextBuffer.
+
+    Each line has an entry (state, brackets, balance): the scan_line()
+    state it starts in, its brackets and their balance().  As in a
+    TextBuffer, the entries are kept in chunks of about CHUNK lines,
+    with the line counts of the chunks in a Fenwick tree, and their
+    balances in a segment tree.  So an edit within a chunk takes
+    O(log n) time plus O(CHUNK), and finding the bracket matching
+    another descends the segment tree to the chunk it is in.  update()
+    keeps the index in step with the buffer from the Changes published
+    by the editor's ChangeBus, scanning the lines after an edit only
+    until they start in the state they did before.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.reset()
+
+    def reset(self):
+        "Index the whole buffer."
+        lines = self.buffer.getlines(1, self.buffer.linecount() + 1)
+        entries, state = self._scan(lines, '')
+        self._rechunk(entries)
+
+    def _scan(self, lines, state):
+        # Return the entries of the texts in lines, starting in state,
+        # and the state after them.
+        entries = []
+        for line in lines:
+            found, after = scan_line(line, state)
+            entries.append((state, found, balance(found)))
+            state = after
+        return entries, state
+
+    def _rechunk(self, entries):
+        # Rebuild the chunks and trees from the list of all entries.
+        self.chunks = [entries[i:i+CHUNK]
+                       for i in range(0, len(entries), CHUNK)] or [[]]
+        self._retree()
+
+    def _retree(self):
+        # Rebuild the trees after chunks were added or removed.
+        chunks = self.chunks
+        self.sizes = [len(chunk) for chunk in chunks]
+        self.linetree = _Fenwick(self.sizes)
+        size = 1
+        while size < len(chunks):
+            size *= 2
+        self.size = size
+        self.tree = tree = [(0, 0)] * (2 * size)
+        for c, chunk in enumerate(chunks):
+            tree[size + c] = _chunk_balance(chunk)
+        for node in range(size - 1, 0, -1):
+            tree[node] = _combine(tree[2 * node], tree[2 * node + 1])
+
+    def _update(self, c):
+        # Update the trees after chunk c was changed in place.
+        chunk = self.chunks[c]
+        self.linetree.add(c, len(chunk) - self.sizes[c])
+        self.sizes[c] = len(chunk)
+        tree = self.tree
+        node = self.size + c
+        tree[node] = _chunk_balance(chunk)
+        node //= 2
+        while node:
+            tree[node] = _combine(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    def _locate(self, line):
+        # Return (chunk, entry in chunk) for line, which must exist.
+        c, before = self.linetree.search(line - 1)
+        return c, line - 1 - before
+
+    def linecount(self):
+        return self.linetree.prefix(len(self.chunks))
+
+    def entry(self, line):
+        "Return the (state, brackets, balance) of line."
+        c, i = self._locate(line)
+        return self.chunks[c][i]
+
+    def _replace(self, first, stop, entries):
+        # Replace the entries of lines [first, stop) with entries.
+        c1, i1 = self._locate(first)
+        c2, i2 = self._locate(stop - 1)
+        chunks = self.chunks
+        if c1 == c2:
+            chunk = chunks[c1]
+            chunk[i1:i2+1] = entries
+            if chunk and len(chunk) <= 2 * CHUNK:
+                self._update(c1)
+                return
+            new = chunk
+        else:
+            new = chunks[c1][:i1] + entries + chunks[c2][i2+1:]
+        chunks[c1:c2+1] = [new[i:i+CHUNK] for i in range(0, len(new), CHUNK)]
+        if not chunks:
+            chunks.append([])
+        self._retree()
+
+    def update(self, change):
+        "Reindex the lines replaced by change, a ChangeBus.Change."
+        buffer = self.buffer
+        first = buffer.position(change.start)[0]
+        last = buffer.position(change.start + change.inserted)[0]
+        delta = buffer.linecount() - self.linecount()
+        stop = last + 1 - delta  # Old lines [first, stop) were replaced.
+        entries, state = self._scan(buffer.getlines(first, last + 1),
+                                    self.entry(first)[0])
+        self._replace(first, stop, entries)
+        # Rescan the lines after until one starts in the same state.
+        n = last + 1
+        count = buffer.linecount()
+        rescanned = []
+        while n + len(rescanned) <= count:
+            line = n + len(rescanned)
+            if self.entry(line)[0] == state:
+                break
+            entries, state = self._scan([buffer.getline(line)], state)
+            rescanned.extend(entries)
+        if rescanned:
+            self._replace(n, n + len(rescanned), rescanned)
+
+    def bracket_at(self, line, col):
+        "Return the bracket in code at (line, col), or None."
+        if not 0 < line <= self.linecount():
+            return None
+        brackets = self.entry(line)[1]
+        i = bisect_left(brackets, (col,))
+        if i < len(brackets) and brackets[i][0] == col:
+            return brackets[i][1]
+        return None
+
+    def match(self, line, col):
+        """Return the (line, col) of the bracket matching the one at
+        (line, col), or None if it is unmatched."""
+        if self.bracket_at(line, col) in _openers:  # A closer.
+            return self.opener(line, col)
+        return self.closer(line, col + 1)
+
+    def _nodes(self, first, stop):
+        # The segment tree nodes covering chunks [first, stop), in order.
+        left, right = [], []
+        first += self.size
+        stop += self.size
+        while first < stop:
+            if first & 1:
+                left.append(first)
+                first += 1
+            if stop & 1:
+                stop -= 1
+                right.append(stop)
+            first //= 2
+            stop //= 2
+        return left + right[::-1]
+
+    def _closing_chunk(self, c, depth):
+        # Return the first chunk from c on that closes depth brackets, or
+        # None, and the depth left before it.
+        tree, size = self.tree, self.size
+        for node in self._nodes(c, len(self.chunks)):
+            need, excess = tree[node]
+            if need >= depth:
+                while node < size:
+                    need, excess = tree[2 * node]
+                    if need >= depth:
+                        node = 2 * node
+                    else:
+                        depth += excess - need
+                        node = 2 * node + 1
+                return node - size, depth
+            depth += excess - need
+        return None, depth
+
+    def _opening_chunk(self, c, depth):
+        # Return the last chunk before c that opens depth brackets, or
+        # None, and the depth left after it.
+        tree, size = self.tree, self.size
+        for node in reversed(self._nodes(0, c)):
+            need, excess = tree[node]
+            if excess >= depth:
+                while node < size:
+                    need, excess = tree[2 * node + 1]
+                    if excess >= depth:
+                        node = 2 * node + 1
+                    else:
+                        depth += need - excess
+                        node = 2 * node
+                return node - size, depth
+            depth += need - excess
+        return None, depth
+
+    def _close_in(self, c, i, depth):
+        # Return the (line, col) closing depth brackets in the entries of
+        # chunk c from i on, or None, and the depth left.
+        for k, (state, brackets, (need, excess)) in enumerate(
+                self.chunks[c][i:], i):
+            if need >= depth:
+                line = self.linetree.prefix(c) + k + 1
+                return (line, _find(brackets, depth, True)[0]), 0
+            depth += excess - need
+        return None, depth
+
+    def _open_in(self, c, i, depth):
+        # Return the (line, col) opening depth brackets in the entries of
+        # chunk c before i, walked back, or None, and the depth left.
+        chunk = self.chunks[c]
+        for k in range(i - 1, -1, -1):
+            state, brackets, (need, excess) = chunk[k]
+            if excess >= depth:
+                line = self.linetree.prefix(c) + k + 1
+                return (line, _find(reversed(brackets), depth, False)[0]), 0
+            depth += need - excess
+        return None, depth
+
+    def closer(self, line, col, depth=1):
+        """Return the (line, col) of the bracket closing the depth'th
+        bracket open at (line, col), or None."""
+        c, i = self._locate(line)
+        found, depth = _find([b for b in self.chunks[c][i][1] if b[0] >= col],
+                             depth, True)
+        if found is not None:
+            return line, found
+        found, depth = self._close_in(c, i + 1, depth)
+        if found is None:
+            c, depth = self._closing_chunk(c + 1, depth)
+            if c is not None:
+                found = self._close_in(c, 0, depth)[0]
+        return found
+
+    def opener(self, line, col, depth=1):
+        """Return the (line, col) of the depth'th bracket open at
+        (line, col), counting out, or None."""
+        c, i = self._locate(line)
+        found, depth = _find(reversed([b for b in self.chunks[c][i][1]
+                                       if b[0] < col]), depth, False)
+        if found is not None:
+            return line, found
+        found, depth = self._open_in(c, i, depth)
+        if found is None:
+            c, depth = self._opening_chunk(c, depth)
+            if c is not None:
+                found = self._open_in(c, len(self.chunks[c]), depth)[0]
+        return found
+
+    def enclosing(self, line, col):
+        """Return the (line, col) of the innermost brackets around
+        (line, col); either may be None."""
+        opener = self.opener(line, col)
+        if opener is None:
+            return None, None
+        return opener, self.closer(line, col)
+
 
 class ParenMatch:
     """Highlight matching parentheses
@@ -32,10 +381,10 @@ class ParenMatch:
         - implement rest of Emacs highlight styles (see below)
         - print mismatch warning in IDLE status window
 
-    Note: In Emacs, there are several styles of highlight where the
-    matching paren is highlighted whenever the cursor is immediately
-    to the right of a right paren.  I don't know how to do that in Tk,
-    so I haven't bothered.
+    With the cursor-match option, the bracket matching one just before
+    or after the cursor is highlighted whenever the cursor moves, as
+    in some Emacs styles.  Brackets are found in the editor's
+    BracketIndex, so that is cheap in any file.
     """
     menudefs = [
         ('edit', [
@@ -49,6 +398,8 @@ class ParenMatch:
     HILITE_CONFIG = idleConf.GetHighlight(idleConf.CurrentTheme(),'hilite')
     BELL = idleConf.GetOption('extensions','ParenMatch','bell',
             type='bool',default=1)
+    CURSOR_MATCH = idleConf.GetOption('extensions','ParenMatch',
+            'cursor-match', type='bool', default=False)
 
     RESTORE_VIRTUAL_EVENT_NAME = "<<parenmatch-check-restore>>"
     # We want the restore event be called before the usual return and
@@ -67,6 +418,31 @@ class ParenMatch:
         self.counter = 0
         self.is_restore_active = 0
         self.set_style(self.STYLE)
+        self.index = None
+        changes = getattr(editwin, 'changes', None)
+        if self.CURSOR_MATCH and changes is not None:
+            self.text.tag_config("bracketmatch", self.HILITE_CONFIG)
+            changes.subscribe_cursor(self.cursor_moved)
+
+    def close(self):
+        changes = getattr(self.editwin, 'changes', None)
+        if changes is not None:
+            if self.index is not None:
+                changes.unsubscribe(self.index.update)
+            if self.CURSOR_MATCH:
+                changes.unsubscribe_cursor(self.cursor_moved)
+        self.index = None
+
+    def bracket_index(self):
+        "Return the BracketIndex of the editor, or None if it has no buffer."
+        changes = getattr(self.editwin, 'changes', None)
+        if changes is None:
+            return None
+        changes.flush()  # Publish edits made since the last idle.
+        if self.index is None:
+            self.index = BracketIndex(self.editwin.buffer)
+            changes.subscribe(self.index.update)
+        return self.index
 
     def activate_restore(self):
         if not self.is_restore_active:
@@ -90,8 +466,15 @@ class ParenMatch:
             self.set_timeout = self.set_timeout_none
 
     def flash_paren_event(self, event):
-        indices = (HyperParser(self.editwin, "insert")
-                   .get_surrounding_brackets())
+        index = self.bracket_index()
+        if index is None:
+            indices = (HyperParser(self.editwin, "insert")
+                       .get_surrounding_brackets())
+        else:
+            line, col = map(int, self.text.index("insert").split('.'))
+            opener, closer = index.enclosing(line, col)
+            indices = opener and ("%d.%d" % opener,
+                                  "%d.%d" % closer if closer else "insert")
         if indices is None:
             self.warn_mismatched()
             return
@@ -104,10 +487,20 @@ class ParenMatch:
         closer = self.text.get("insert-1c")
         if closer not in _openers:
             return
-        hp = HyperParser(self.editwin, "insert-1c")
-        if not hp.is_in_code():
-            return
-        indices = hp.get_surrounding_brackets(_openers[closer], True)
+        index = self.bracket_index()
+        if index is None:
+            hp = HyperParser(self.editwin, "insert-1c")
+            if not hp.is_in_code():
+                return
+            indices = hp.get_surrounding_brackets(_openers[closer], True)
+        else:
+            line, col = map(int, self.text.index("insert-1c").split('.'))
+            if index.bracket_at(line, col) != closer:
+                return  # In a string or comment.
+            opener = index.opener(line, col)
+            indices = None
+            if opener and index.bracket_at(*opener) == _openers[closer]:
+                indices = "%d.%d" % opener, "%d.%d" % (line, col)
         if indices is None:
             self.warn_mismatched()
             return
@@ -115,6 +508,20 @@ class ParenMatch:
         self.create_tag(indices)
         self.set_timeout()
 
+    def cursor_moved(self, insert):
+        "Highlight the bracket matching one just before or after insert."
+        self.text.tag_remove("bracketmatch", "1.0", "end")
+        index = self.bracket_index()
+        line, col = map(int, insert.split('.'))
+        for col, closing in ((col - 1, True), (col, False)):
+            bracket = index.bracket_at(line, col)
+            if bracket and (bracket in _openers) == closing:
+                other = index.match(line, col)
+                if other:
+                    self.text.tag_add("bracketmatch", "%d.%d" % (line, col))
+                    self.text.tag_add("bracketmatch", "%d.%d" % other)
+                return
+
     def restore_event(self, event=None):
         self.text.tag_delete("paren")
         self.deactivate_restore()
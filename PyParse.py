@@ -1,11 +1,14 @@
 import re
 import sys
+from bisect import bisect_right
 from collections import Mapping
 
 # Reason last stmt is continued (or C_NONE if it's not).
 (C_NONE, C_BACKSLASH, C_STRING_FIRST_LINE,
  C_STRING_NEXT_LINES, C_BRACKET) = range(5)
 
+SPAN = 100  # Lines of a statement between the places parsing resumes.
+
 if 0:   # for throwaway debugging output
     def dump(*stuff):
         sys.__stdout__.write(" ".join(map(str, stuff)) + "\n")
@@ -376,6 +379,8 @@ class Parser:
     #         comment
     #     self.lastopenbracketpos
     #         if continuation is C_BRACKET, index of last open bracket
+    #     self.openbrackets
+    #         indices of the brackets still open at the end, innermost last
 
     def _study2(self):
         if self.study_level >= 2:
@@ -479,6 +484,7 @@ class Parser:
         # end while p < q:
 
         self.lastch = lastch
+        self.openbrackets = tuple(stack)
         if stack:
             self.lastopenbracketpos = stack[-1]
         self.stmt_bracketing = tuple(bracketing)
@@ -489,29 +495,41 @@ class Parser:
     def compute_bracket_indent(self):
         self._study2()
         assert self.continuation == C_BRACKET
-        j = self.lastopenbracketpos
+        i, j = self._first_item(self.lastopenbracketpos)
+        extra = 0
+        if j is None:
+            # nothing interesting follows the bracket;
+            # reproduce the bracket line's indentation + a level
+            i, j = self._bracket_indent(self.lastopenbracketpos)
+            extra = self.indentwidth
+        return len(self.str[i:j].expandtabs(self.tabwidth)) + extra
+
+    # Return (i, j): j is the index of the first list item after the
+    # open bracket at index k, and i the start of its line; j is None
+    # if nothing interesting follows the bracket.
+
+    def _first_item(self, k):
         str = self.str
         n = len(str)
-        origi = i = str.rfind('\n', 0, j) + 1
-        j = j+1     # one beyond open bracket
-        # find first list item; set i to start of its line
+        i = str.rfind('\n', 0, k) + 1
+        j = k+1     # one beyond open bracket
         while j < n:
             m = _itemre(str, j)
             if m:
-                j = m.end() - 1     # index of first interesting char
-                extra = 0
-                break
-            else:
-                # this line is junk; advance to next line
-                i = j = str.find('\n', j) + 1
-        else:
-            # nothing interesting follows the bracket;
-            # reproduce the bracket line's indentation + a level
-            j = i = origi
-            while str[j] in " \t":
-                j = j+1
-            extra = self.indentwidth
-        return len(str[i:j].expandtabs(self.tabwidth)) + extra
+                return i, m.end() - 1   # index of first interesting char
+            # this line is junk; advance to next line
+            i = j = str.find('\n', j) + 1
+        return i, None
+
+    # Return (i, j), the slice of str holding the indentation of the
+    # line with the open bracket at index k.
+
+    def _bracket_indent(self, k):
+        str = self.str
+        j = i = str.rfind('\n', 0, k) + 1
+        while str[j] in " \t":
+            j = j+1
+        return i, j
 
     # Return number of physical lines in last stmt (whether or not
     # it's an interesting stmt!  this is intended to be called when
@@ -615,3 +633,125 @@ class Parser:
     def get_last_stmt_bracketing(self):
         self._study2()
         return self.stmt_bracketing
+
+
+class Checkpoints:
+    """The lines of a TextBuffer known to start statements.
+
+    Whether a line starts a statement, outside any bracket, string or
+    backslash continuation, depends only on the lines before it, so an
+    edit keeps what is known up to its first line.  Lines are studied
+    onward from the last known start only when asked about, so parsing
+    can begin at the nearest statement without searching back for one.
+
+    Inside a long statement, such as a big bracketed literal, the state
+    at every SPAN lines is kept too, as a short text that parses to the
+    same open brackets, first items and string; see resume().
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.lines = [1]  # Statement starts, up to self.studied.
+        self.studied = 1  # Last line known to start a statement or not.
+        self.marks = []  # Lines inside statements with a known state,
+        self.states = []  # and the texts giving it.
+
+    def update(self, change):
+        "Forget the lines after the first one of change, a ChangeBus.Change."
+        first = self.buffer.position(change.start)[0]
+        if first < self.studied:
+            self.studied = first
+            del self.lines[bisect_right(self.lines, first):]
+        k = bisect_right(self.marks, first)
+        del self.marks[k:], self.states[k:]
+
+    def _study(self, lno):
+        # Find the statement starts up to line lno.
+        if lno <= self.studied:
+            return
+        base = self.lines[-1]
+        lines = self.buffer.getlines(base, lno)
+        lines.append('')
+        parser = Parser(0, 0)
+        parser.set_str('\n'.join(lines))
+        parser._study1()
+        goodlines = parser.goodlines
+        if parser.continuation != C_NONE:
+            goodlines = goodlines[:-1]  # The sentinel continues a stmt.
+        self.lines.extend(base + g for g in goodlines[1:])
+        self.studied = lno
+
+    def stmt_start(self, lno):
+        """Return the first line of the last statement starting at or
+        before line lno that is not a blank line or non-indenting comment,
+        or 1 if there is none."""
+        lno = min(lno, self.buffer.linecount())
+        self._study(lno)
+        lines = self.lines
+        getline = self.buffer.getline
+        i = bisect_right(lines, lno) - 1
+        while i and _junkre(getline(lines[i]) + '\n'):
+            i -= 1
+        return lines[i]
+
+    def resume(self, lno):
+        """Return (line, prefix) to parse the statement through line lno.
+
+        Parsing prefix followed by the lines from line through lno finds
+        the same continuation as parsing from stmt_start(lno), and for a
+        bracket continuation the same indent.  prefix is '' when line is
+        stmt_start(lno); then the result is right for any continuation.
+        """
+        start = self.stmt_start(lno)
+        lno = min(lno, self.buffer.linecount())
+        if (lno - start < SPAN or
+                self.lines[bisect_right(self.lines, lno) - 1] != start):
+            return start, ''  # Near the start, or lno is after the stmt.
+        k = bisect_right(self.marks, lno)
+        if k and self.marks[k-1] > start:
+            line, prefix = self.marks[k-1], self.states[k-1]
+        else:
+            line, prefix = start, ''
+        target = line + SPAN
+        while target <= lno:
+            state = self._state(prefix, line, target)
+            if state is not None:
+                self.marks.insert(k, target)
+                self.states.insert(k, state)
+                k += 1
+                line, prefix = target, state
+            target += SPAN
+        return line, prefix
+
+    def _state(self, prefix, line, target):
+        # Return the prefix for the state at line target, parsing on from
+        # prefix at line, or None if it is not a bracket or long string.
+        lines = self.buffer.getlines(line, target)
+        lines.append('')
+        parser = Parser(0, 0)
+        parser.set_str(prefix + '\n'.join(lines))
+        continuation = parser.get_continuation_type()
+        if continuation == C_BRACKET:
+            quote = ''
+        elif continuation in (C_STRING_FIRST_LINE, C_STRING_NEXT_LINES):
+            parser._study2()
+            start = parser.stmt_bracketing[-2][0]  # Of the open string.
+            quote = parser.str[start:start+3]
+            if quote not in ('"""', "'''"):
+                return None  # Continued by backslashes.
+        else:
+            return None
+        parser._study2()
+        text = parser.str
+        state = []
+        for k in parser.openbrackets:
+            i, j = parser._first_item(k)
+            if j is None:
+                # Only the innermost bracket may have no item yet.
+                i, j = parser._bracket_indent(k)
+                state.append(text[i:j] + '(\n')
+            else:
+                indent = ''.join(c if c == '\t' else ' ' for c in text[i:j])
+                state.append('(\n%sx\n' % indent)
+        state.append(quote and quote + '\n')
+        return ''.join(state)
@@ -31,6 +31,7 @@ from idlelib.UndoDelegator import UndoDelegator
 from idlelib.OutputWindow import OutputWindow
 from idlelib.configHandler import idleConf
 from idlelib import rpc
+from idlelib import AutoComplete
 from idlelib import Debugger
 from idlelib import RemoteDebugger
 from idlelib import macosxSupport
@@ -485,6 +486,7 @@ class ModifiedInterpreter(InteractiveInterpreter):
         # Kill subprocess, spawn a new one, accept connection.
         self.rpcclt.close()
         self.terminate_subprocess()
+        AutoComplete.namespace_changed()
         console = self.tkconsole
         was_executing = console.executing
         console.executing = False
@@ -580,6 +582,8 @@ class ModifiedInterpreter(InteractiveInterpreter):
         if response:
             self.tkconsole.resetoutput()
             self.active_seq = None
+            # User code ran in the subprocess.
+            AutoComplete.namespace_changed()
             how, what = response
             console = self.tkconsole.console
             if how == "OK":
@@ -777,8 +781,12 @@ class ModifiedInterpreter(InteractiveInterpreter):
                                                         (code,), {})
             elif debugger:
                 debugger.run(code, self.locals)
+                AutoComplete.namespace_changed()
             else:
-                exec(code, self.locals)
+                try:
+                    exec(code, self.locals)
+                finally:
+                    AutoComplete.namespace_changed()
         except SystemExit:
             if not self.tkconsole.closing:
                 if tkMessageBox.askyesno(
@@ -21,6 +21,7 @@ barrier, in particular frame and traceback objects.
 """
 
 import types
+from idlelib import AutoComplete
 from idlelib import Debugger
 
 debugging = 0
@@ -103,7 +104,10 @@ class IdbAdapter:
 
     def run(self, cmd):
         import __main__
-        self.idb.run(cmd, __main__.__dict__)
+        try:
+            self.idb.run(cmd, __main__.__dict__)
+        finally:
+            AutoComplete.namespace_changed()
 
     def set_break(self, filename, lineno):
         msg = self.idb.set_break(filename, lineno)
@@ -1,3 +1,4 @@
+from idlelib import AutoComplete
 from idlelib import rpc
 
 def remote_object_tree_item(item):
@@ -6,31 +7,174 @@ def remote_object_tree_item(item):
     rpc.objecttable[oid] = wrapper
     return oid
 
+def identity(item):
+    "Return what tells whether two tree items show the same thing."
+    return (type(item), item.GetLabelText(),
+            id(getattr(item, 'object', item)))
+
 class WrappedObjectTreeItem:
     # Lives in PYTHON subprocess
 
+    # The sub-list is fetched afresh on each expansion, as the object may
+    # have changed.  A subitem wrapping the same object as before keeps
+    # its wrapper and oid; the wrappers of the others are unregistered.
+
     def __init__(self, item):
         self.__item = item
+        self.__children = None  # (identity, oid) pairs, once fetched.
 
     def __getattr__(self, name):
         value = getattr(self.__item, name)
         return value
 
     def _GetSubList(self):
-        sub_list = self.__item._GetSubList()
-        return list(map(remote_object_tree_item, sub_list))
+        old = dict(self.__children or ())
+        children = []
+        for item in self.__item._GetSubList():
+            key = identity(item)
+            oid = old.pop(key, None)
+            if oid is None:
+                oid = remote_object_tree_item(item)
+            children.append((key, oid))
+        self.__children = children
+        self._forget(old.values())
+        return [oid for key, oid in children]
+
+    def _forget(self, oids):
+        # Unregister the wrappers of subitems, and theirs.
+        for oid in oids:
+            wrapper = rpc.objecttable.pop(oid, None)
+            if wrapper is not None:
+                wrapper._forget_children()
+
+    def _forget_children(self):
+        self._forget([oid for key, oid in self.__children or ()])
+        self.__children = None
+
+    def SetText(self, text):
+        self.__item.SetText(text)
+        # The new value has its own subitems.
+        self._forget_children()
+
+    def GetRenderInfo(self, depth=1, refresh=False):
+        """Return everything TreeNode needs to draw this item, in one call.
+
+        The result is a dict with the item's text, label, icons,
+        expandability and editability.  If depth > 0 and the item is
+        expandable, 'children' is a list of (oid, info) pairs for the
+        subitems, each rendered with depth-1; otherwise it is None.
+        The subitems are fetched afresh if refresh is true or they have
+        not been fetched before.
+        """
+        item = self.__item
+        children = None
+        if depth > 0 and item._IsExpandable():
+            if refresh or self.__children is None:
+                oids = self._GetSubList()
+            else:
+                oids = [oid for key, oid in self.__children]
+            children = [(oid, rpc.objecttable[oid].GetRenderInfo(depth-1))
+                        for oid in oids]
+        return {
+            'text': item.GetText(),
+            'label': item.GetLabelText(),
+            'icon': item.GetIconName(),
+            'selectedicon': item.GetSelectedIconName(),
+            'expandable': item._IsExpandable(),
+            'editable': item.IsEditable(),
+            'children': children,
+            }
+
+class InfoCache(dict):
+    "Render info by oid, emptied once user code has run."
+
+    def __init__(self):
+        self.version = AutoComplete.namespace_version
+        self.listed = set()  # Oids whose children a TreeNode has.
+        self.unlisted = set()  # Oids whose fresh children are unused.
+
+    def get(self, oid):
+        if self.version != AutoComplete.namespace_version:
+            self.clear()
+            self.unlisted.clear()
+            self.version = AutoComplete.namespace_version
+        return dict.get(self, oid)
 
 class StubObjectTreeItem:
     # Lives in IDLE process
 
-    def __init__(self, sockio, oid):
+    # Drawing a node needs its text, icons and expandability.  Rather than
+    # one rpc round trip for each, GetRenderInfo fetches them for a node and
+    # its children at once.  The results are kept in a cache keyed by oid,
+    # shared by all stubs of one tree, until user code runs.
+    #
+    # Expanding a node lists its children afresh, unless they were fetched
+    # afresh just before, when the node was drawn.  The children of a node
+    # already expanded are not fetched afresh, as that would unregister
+    # the wrappers of those that have changed while their TreeNodes remain.
+
+    def __init__(self, sockio, oid, cache=None):
         self.sockio = sockio
         self.oid = oid
+        if cache is None:
+            cache = InfoCache()
+        self.cache = cache
 
     def __getattr__(self, name):
         value = rpc.MethodProxy(self.sockio, self.oid, name)
         return value
 
+    def _getinfo(self, expand=False):
+        # A node missing from the cache is usually about to be drawn,
+        # and often expanded, so its children are fetched along with it.
+        cache = self.cache
+        info = cache.get(self.oid)
+        if info is None or expand and self.oid not in cache.unlisted:
+            refresh = expand or self.oid not in cache.listed
+            info = self.sockio.remotecall(self.oid, "GetRenderInfo",
+                                          (1, refresh), {})
+            self._store(self.oid, info)
+            if refresh and info['children'] is not None:
+                cache.unlisted.add(self.oid)
+        if expand:
+            cache.unlisted.discard(self.oid)
+            cache.listed.add(self.oid)
+        return info
+
+    def _store(self, oid, info):
+        self.cache[oid] = info
+        for child_oid, child_info in info['children'] or ():
+            self._store(child_oid, child_info)
+
+    def GetText(self):
+        return self._getinfo()['text']
+
+    def GetLabelText(self):
+        return self._getinfo()['label']
+
+    def GetIconName(self):
+        return self._getinfo()['icon']
+
+    def GetSelectedIconName(self):
+        return self._getinfo()['selectedicon']
+
+    def _IsExpandable(self):
+        return self._getinfo()['expandable']
+
+    def IsEditable(self):
+        return self._getinfo()['editable']
+
+    def SetText(self, text):
+        self.sockio.remotecall(self.oid, "SetText", (text,), {})
+        # The new value may change the text and the children.
+        self.cache.pop(self.oid, None)
+
     def _GetSubList(self):
-        sub_list = self.sockio.remotecall(self.oid, "_GetSubList", (), {})
-        return [StubObjectTreeItem(self.sockio, oid) for oid in sub_list]
+        info = self._getinfo(expand=True)
+        children = info['children'] or []
+        return [StubObjectTreeItem(self.sockio, oid, self.cache)
+                for oid, child_info in children]
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_remoteobjectbrowser', verbosity=2)
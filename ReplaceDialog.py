@@ -93,36 +93,21 @@ class ReplaceDialog(SearchDialogBase):
         if self.engine.iswrap():
             line = 1
             col = 0
-        ok = 1
-        first = last = None
+        if self._replace_expand(res[1], repl) is None:
+            return  # Bad replace expression, already reported.
+        if self.engine.isre():
+            expand = lambda m: m.expand(repl)
+        else:
+            expand = lambda m: repl
         # XXX ought to replace circular instead of top-to-bottom when wrapping
-        text.undo_block_start()
-        while 1:
-            res = self.engine.search_forward(text, prog, line, col, 0, ok)
-            if not res:
-                break
-            line, m = res
-            chars = text.get("%d.0" % line, "%d.0" % (line+1))
-            orig = m.group()
-            new = self._replace_expand(m, repl)
-            if new is None:
-                break
-            i, j = m.span()
-            first = "%d.%d" % (line, i)
-            last = "%d.%d" % (line, j)
-            if new == orig:
-                text.mark_set("insert", last)
-            else:
-                text.mark_set("insert", first)
-                if first != last:
-                    text.delete(first, last)
-                if new:
-                    text.insert(first, new)
-            col = i + len(new)
-            ok = 0
-        text.undo_block_stop()
-        if first and last:
-            self.show_hit(first, last)
+        # Compute the new text in Python, then apply the changed lines
+        # as a single undoable edit.
+        lines = text.get("%d.0" % line, "end-1c").split("\n")
+        hunks, hit = SearchEngine.replace_hunks(prog, expand, lines, line, col)
+        if hunks:
+            text.replace_lines(hunks)
+        if hit:
+            self.show_hit(*hit)
         self.close()
 
     def do_find(self, ok=0):
@@ -202,9 +187,14 @@ def _replace_dialog(parent):
     def undo_block_stop():
         pass
 
+    def replace_lines(hunks):
+        from idlelib.UndoDelegator import ReplaceLinesCommand
+        ReplaceLinesCommand(hunks).do(text)
+
     text = Text(root)
     text.undo_block_start = undo_block_start
     text.undo_block_stop = undo_block_stop
+    text.replace_lines = replace_lines
     text.pack()
     text.insert("insert","This is a sample string.\n"*10)
 
@@ -55,13 +55,12 @@ class ScriptBinding:
             self.editwin.text_frame.bind('<<run-module-event-2>>', self._run_module_event)
 
     def check_module_event(self, event):
-        filename = self.getfilename()
-        if not filename:
-            return 'break'
-        if not self.checksyntax(filename):
-            return 'break'
-        if not self.tabnanny(filename):
-            return 'break'
+        self.getfilename(self.check_module)
+        return 'break'
+
+    def check_module(self, filename):
+        if self.checksyntax(filename):
+            self.tabnanny(filename)
 
     def tabnanny(self, filename):
         # XXX: tabnanny should work on binary files as well
@@ -131,16 +130,17 @@ class ScriptBinding:
         then transfer the arguments, set the run environment's working
         directory to the directory of the module being executed and also
         add that directory to its sys.path if not already included.
+        The module is run once it is saved; see getfilename.
         """
+        self.getfilename(self.run_module)
+        return 'break'
 
-        filename = self.getfilename()
-        if not filename:
-            return 'break'
+    def run_module(self, filename):
         code = self.checksyntax(filename)
         if not code:
-            return 'break'
+            return
         if not self.tabnanny(filename):
-            return 'break'
+            return
         interp = self.shell.interp
         if PyShell.use_subprocess:
             interp.restart_subprocess(with_cwd=False, filename=
@@ -163,34 +163,35 @@ class ScriptBinding:
         #         go to __stderr__.  With subprocess, they go to the shell.
         #         Need to change streams in PyShell.ModifiedInterpreter.
         interp.runcode(code)
-        return 'break'
 
-    def getfilename(self):
-        """Get source filename.  If not saved, offer to save (or create) file
+    def getfilename(self, then):
+        """Call then with the source filename.  If not saved, offer to save
+        (or create) file.
 
         The debugger requires a source file.  Make sure there is one, and that
-        the current version of the source buffer has been saved.  If the user
-        declines to save or cancels the Save As dialog, return None.
+        the current version of the source buffer has been saved.  The save
+        is written in the background, and then is called once it is done.
+        If the user declines to save or cancels the Save As dialog, or the
+        save fails, then is not called.
 
         If the user has configured IDLE for Autosave, the file will be
         silently saved if it already exists and is dirty.
 
         """
-        filename = self.editwin.io.filename
-        if not self.editwin.get_saved():
-            autosave = idleConf.GetOption('main', 'General',
-                                          'autosave', type='bool')
-            if autosave and filename:
-                self.editwin.io.save(None)
-            else:
-                confirm = self.ask_save_dialog()
-                self.editwin.text.focus_set()
-                if confirm:
-                    self.editwin.io.save(None)
-                    filename = self.editwin.io.filename
-                else:
-                    filename = None
-        return filename
+        io = self.editwin.io
+        filename = io.filename
+        if self.editwin.get_saved():
+            if filename:
+                then(filename)
+            return
+        autosave = idleConf.GetOption('main', 'General',
+                                      'autosave', type='bool')
+        if not (autosave and filename):
+            confirm = self.ask_save_dialog()
+            self.editwin.text.focus_set()
+            if not confirm:
+                return
+        io.save(None, lambda job: then(job.filename))
 
     def ask_save_dialog(self):
         msg = "Source Must Be Saved\n" + 5*' ' + "OK to Save?"
@@ -1,5 +1,6 @@
 from tkinter import *
 
+from idlelib import LargeFile
 from idlelib import SearchEngine
 from idlelib.SearchDialogBase import SearchDialogBase
 
@@ -37,7 +38,13 @@ class SearchDialog(SearchDialogBase):
             return False
         if not self.engine.getprog():
             return False
-        res = self.engine.search_text(text)
+        try:
+            res = self.engine.search_text(text)
+        except LargeFile.Indexing:
+            # A search wrapping to the end of a large file: search once
+            # the end is known.  The status bar shows the progress.
+            text.pager.when_indexed(lambda: self.find_again(text))
+            return False
         if res:
             line, m = res
             i, j = m.span()
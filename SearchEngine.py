@@ -1,5 +1,12 @@
 '''Define SearchEngine for search dialogs.'''
+import array
+import bisect
+import functools
 import re
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
 from tkinter import StringVar, BooleanVar, TclError
 import tkinter.messagebox as tkMessageBox
 
@@ -70,11 +77,16 @@ class SearchEngine:
             pat = r"\b%s\b" % pat
         return pat
 
-    def getprog(self):
-        "Return compiled cooked search pattern."
+    def getprog(self, report=True):
+        """Return compiled cooked search pattern.
+
+        If the pattern is empty or invalid, report the error unless
+        report is false, and return None.
+        """
         pat = self.getpat()
         if not pat:
-            self.report_error(pat, "Empty regular expression")
+            if report:
+                self.report_error(pat, "Empty regular expression")
             return None
         pat = self.getcookedpat()
         flags = 0
@@ -86,7 +98,8 @@ class SearchEngine:
             args = what.args
             msg = args[0]
             col = args[1] if len(args) >= 2 else -1
-            self.report_error(pat, msg, col)
+            if report:
+                self.report_error(pat, msg, col)
             return None
         return prog
 
@@ -141,73 +154,379 @@ class SearchEngine:
         return res
 
     def search_forward(self, text, prog, line, col, wrap, ok=0):
-        wrapped = 0
-        startline = line
         chars = text.get("%d.0" % line, "%d.0" % (line+1))
-        while chars:
-            m = prog.search(chars[:-1], col)
-            if m:
-                if ok or m.end() > col:
-                    return line, m
-            line = line + 1
-            if wrapped and line > startline:
-                break
-            col = 0
-            ok = 1
-            chars = text.get("%d.0" % line, "%d.0" % (line+1))
-            if not chars and wrap:
-                wrapped = 1
-                wrap = 0
-                line = 1
-                chars = text.get("1.0", "2.0")
-        return None
+        if not chars:
+            return None
+        m = prog.search(chars[:-1], col)
+        if m:
+            if ok or m.end() > col:
+                return line, m
+        res = search_lines(text, prog, line+1)
+        if res is None and wrap:
+            res = search_lines(text, prog, 1, line+1)
+        return res
 
     def search_backward(self, text, prog, line, col, wrap, ok=0):
-        wrapped = 0
-        startline = line
         chars = text.get("%d.0" % line, "%d.0" % (line+1))
-        while 1:
-            m = search_reverse(prog, chars[:-1], col)
-            if m:
-                if ok or m.start() < col:
-                    return line, m
-            line = line - 1
-            if wrapped and line < startline:
-                break
-            ok = 1
-            if line <= 0:
-                if not wrap:
-                    break
-                wrapped = 1
-                wrap = 0
-                pos = text.index("end-1c")
-                line, col = map(int, pos.split("."))
-            chars = text.get("%d.0" % line, "%d.0" % (line+1))
-            col = len(chars) - 1
-        return None
+        m = search_reverse(prog, chars[:-1], col)
+        if m:
+            if ok or m.start() < col:
+                return line, m
+        res = search_lines_backward(text, prog, 1, line)
+        if res is None and wrap:
+            pos = text.index("end-1c")
+            lastline = int(pos.split(".")[0])
+            res = search_lines_backward(text, prog, line, lastline+1)
+        return res
 
 def search_reverse(prog, chars, col):
     '''Search backwards and return an re match object or None.
 
-    This is done by searching forwards until there is no match.
+    The result is the last match, in the sequence found by searching
+    forwards from the end of each previous match, that ends at or
+    before col and starts before it.
     Prog: compiled re object with a search method returning a match.
     Chars: line of text, without \\n.
     Col: stop index for the search; the limit for match.end().
     '''
-    m = prog.search(chars)
-    if not m:
+    starts, ends = _match_spans(prog, chars)
+    k = min(bisect.bisect_left(starts, col), bisect.bisect_right(ends, col))
+    if k == 0:
         return None
-    found = None
-    i, j = m.span()  # m.start(), m.end() == match slice indexes
-    while i < col and j <= col:
-        found = m
+    return prog.match(chars, starts[k-1])
+
+# Spans found by the last call of _match_spans, so that repeating Find
+# Previous on the same line does not scan it again.
+_spans_cache = (None, None, None)
+
+def _match_spans(prog, chars):
+    '''Return arrays of the start and end indexes of matches in chars.
+
+    Matches are found in one pass, each search starting at the end of
+    the previous match, or one past it if the match was empty.  Starts
+    are strictly increasing and ends nondecreasing, so both arrays can
+    be bisected.
+    '''
+    global _spans_cache
+    cached_prog, cached_chars, spans = _spans_cache
+    if cached_prog is prog and cached_chars == chars:
+        return spans
+    starts = array.array('l')
+    ends = array.array('l')
+    j = 0
+    m = prog.search(chars)
+    while m:
+        i, j = m.span()
+        starts.append(i)
+        ends.append(j)
         if i == j:
             j = j+1
+            if j > len(chars):
+                break
         m = prog.search(chars, j)
-        if not m:
+    spans = starts, ends
+    _spans_cache = prog, chars, spans
+    return spans
+
+# Lines are fetched from the text widget in chunks that start at
+# CHUNK_LINES lines and double each time, up to MAX_CHUNK_LINES, so a
+# search makes O(log n) Tk calls and copies about twice the text between
+# start and match, but never holds more than a chunk of a huge file.
+CHUNK_LINES = 64
+MAX_CHUNK_LINES = 1 << 16
+
+def search_lines(text, prog, first, last=None):
+    '''Return (lineno, matchobj) for first line in [first, last) or None.
+
+    The match object is the first match in the line, with spans
+    relative to the line.  A last of None means the end of the text.
+    '''
+    size = CHUNK_LINES
+    while last is None or first < last:
+        stop = first + size
+        if last is not None:
+            stop = min(stop, last)
+        chunk = LineIndex(text, first, stop)
+        res = chunk.search(prog)
+        if res:
+            return res
+        if chunk.stop < stop:  # Reached the end of the text.
             break
+        first = stop
+        size = min(size * 2, MAX_CHUNK_LINES)
+    return None
+
+def search_lines_backward(text, prog, first, last):
+    '''Return (lineno, matchobj) for last line in [first, last) or None.
+
+    The match object is the last match in the line, as found by
+    search_reverse, with spans relative to the line.
+    '''
+    size = CHUNK_LINES
+    while first < last:
+        start = max(first, last - size)
+        chunk = LineIndex(text, start, last)
+        res = chunk.search_backward(prog)
+        if res:
+            return res
+        last = start
+        size = min(size * 2, MAX_CHUNK_LINES)
+    return None
+
+class LineIndex:
+    '''Lines [first, last) of a text widget, fetched with one Tk call.
+
+    Offsets into the fetched string are mapped back to line numbers by
+    bisecting a table of line start offsets.  If the pattern can only
+    match within a line (see line_prog), each search runs once over the
+    whole chunk and only the line holding the match is searched again
+    to get a line-relative match object.  Otherwise every line is
+    searched on its own, as the per-line semantics require.
+    '''
+    def __init__(self, text, first, last):
+        chars = text.get("%d.0" % first, "%d.0" % last)
+        starts = [0]
+        starts.extend(m.end() for m in _newline.finditer(chars))
+        if starts[-1] == len(chars):
+            del starts[-1]  # No line starts after the final newline.
+        self.chars = chars
+        self.starts = starts
+        self.first = first
+        self.stop = first + len(starts)  # One past the last line held.
+
+    def getline(self, line):
+        "Return the text of line, without its newline."
+        i = line - self.first
+        start = self.starts[i]
+        return self.chars[start:self.lineend(i)]
+
+    def lineend(self, i):
+        "Return the offset of the newline ending the i-th line held."
+        if i + 1 < len(self.starts):
+            return self.starts[i+1] - 1
+        if self.chars.endswith("\n"):
+            return len(self.chars) - 1
+        return len(self.chars)
+
+    def lineof(self, offset):
+        "Return the line number holding offset."
+        return self.first + bisect.bisect_right(self.starts, offset) - 1
+
+    def search(self, prog):
+        if not self.starts:
+            return None
+        bufprog = line_prog(prog.pattern, prog.flags)
+        if bufprog is None:
+            for line in range(self.first, self.stop):
+                m = prog.search(self.getline(line))
+                if m:
+                    return line, m
+            return None
+        end = self.lineend(len(self.starts) - 1)
+        pos = 0
+        while pos <= end:
+            found = bufprog.search(self.chars, pos, end)
+            if not found:
+                break
+            line = self.lineof(found.start())
+            m = prog.search(self.getline(line))
+            if m:
+                return line, m
+            pos = self.lineend(line - self.first) + 1
+        return None
+
+    def search_backward(self, prog):
+        if not self.starts:
+            return None
+        bufprog = line_prog(prog.pattern, prog.flags)
+        line = self.stop
+        if bufprog is not None:
+            end = self.lineend(len(self.starts) - 1)
+            found = None
+            for found in bufprog.finditer(self.chars, 0, end):
+                pass
+            if not found:
+                return None
+            line = self.lineof(found.start()) + 1
+        for line in range(line - 1, self.first - 1, -1):
+            chars = self.getline(line)
+            m = search_reverse(prog, chars, len(chars))
+            if m:
+                return line, m
+        return None
+
+    def findall(self, prog):
+        "Return (line, start, end) for each non-empty match of prog."
+        found = []
+        if not self.starts:
+            return found
+        bufprog = line_prog(prog.pattern, prog.flags)
+        if bufprog is None:
+            for line in range(self.first, self.stop):
+                for m in prog.finditer(self.getline(line)):
+                    if m.start() < m.end():
+                        found.append((line, m.start(), m.end()))
+            return found
+        starts = self.starts
+        end = self.lineend(len(starts) - 1)
+        k = 0
+        for m in bufprog.finditer(self.chars, 0, end):
+            i, j = m.span()
+            if i < j:
+                while k + 1 < len(starts) and starts[k+1] <= i:
+                    k += 1
+                found.append((self.first + k, i - starts[k], j - starts[k]))
+        return found
+
+_newline = re.compile("\n")
+
+@functools.lru_cache(maxsize=32)
+def line_prog(pattern, flags):
+    '''Return pattern compiled for searching many lines at once, or None.
+
+    The result has MULTILINE set, so ^ and $ match at line boundaries.
+    It is only returned when the pattern can neither match a newline nor
+    look past the ends of a line, so that its matches in a block of lines
+    are exactly the matches found by searching each line on its own.
+    '''
+    try:
+        flags = re.compile(pattern, flags).flags  # Add inline flags.
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    if flags & re.DOTALL:
+        return None
+    if not _line_local(parsed):
+        return None
+    return re.compile(pattern, flags | re.MULTILINE)
+
+_NEWLINE = ord("\n")
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+_LOCAL_ATS = {sre_parse.AT_BEGINNING, sre_parse.AT_END,
+              sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY}
+_LOCAL_CATEGORIES = {sre_parse.CATEGORY_DIGIT, sre_parse.CATEGORY_WORD}
+
+def _line_local(subpattern):
+    "Return True if parsed subpattern cannot match or look past a newline."
+    for op, av in subpattern:
+        if op is sre_parse.LITERAL:
+            if av == _NEWLINE:
+                return False
+        elif op is sre_parse.ANY:
+            pass
+        elif op is sre_parse.IN:
+            for setop, setav in av:
+                if setop is sre_parse.LITERAL:
+                    if setav == _NEWLINE:
+                        return False
+                elif setop is sre_parse.RANGE:
+                    if setav[0] <= _NEWLINE <= setav[1]:
+                        return False
+                elif setop is sre_parse.CATEGORY:
+                    if setav not in _LOCAL_CATEGORIES:
+                        return False
+                else:  # NEGATE and anything unexpected
+                    return False
+        elif op in _REPEATS:
+            if not _line_local(av[2]):
+                return False
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                if not _line_local(branch):
+                    return False
+        elif op is sre_parse.SUBPATTERN:
+            # av is (group, subpattern), or since 3.6,
+            # (group, add_flags, del_flags, subpattern).
+            if len(av) > 2 and av[1] & re.DOTALL:
+                return False
+            if not _line_local(av[-1]):
+                return False
+        elif op is sre_parse.AT:
+            if av not in _LOCAL_ATS:
+                return False
+        elif op is sre_parse.GROUPREF:
+            pass
+        else:  # Lookarounds, string anchors, conditionals, ...
+            return False
+    return True
+
+# Replace All rewrites each run of changed lines with one delete and one
+# insert.  Runs separated by fewer than MERGE_GAP unchanged lines are
+# merged, which keeps the number of Tk edits small when matches are dense.
+MERGE_GAP = 8
+
+def replace_hunks(prog, expand, lines, firstline, col=0):
+    '''Return (hunks, hit) for replacing every match of prog in lines.
+
+    Lines is a list of strings, without newlines, for the text lines
+    starting at firstline.  On the first line, only matches at or after
+    col are replaced.  Expand is called with each match object and
+    returns its replacement text.
+
+    Hunks is a list of (lineno, oldchars, newchars) tuples in increasing
+    line order, where oldchars is the text of the whole lines starting
+    at lineno, joined by newlines, and newchars is its replacement.
+    Hit is a ('line.col', 'line.col') pair for the last replacement in
+    the new text, or None if nothing matched.
+    '''
+    changed = {}
+    hit = None
+    for i, chars in enumerate(lines):
+        new, span = _substitute(prog, expand, chars, col if i == 0 else 0)
+        if span is None:
+            continue
+        hit = i, new, span
+        if new != chars:
+            changed[i] = new
+    if hit is not None:
+        i, new, (start, end) = hit
+        shift = sum(changed[k].count("\n") for k in changed if k < i)
+        hit = (_offset_index(new, start, firstline + i + shift),
+               _offset_index(new, end, firstline + i + shift))
+    hunks = []
+    run = None
+    for i in sorted(changed):
+        if run and i - run[1] <= MERGE_GAP:
+            run[1] = i
+        else:
+            run = [i, i]
+            hunks.append(run)
+    for k, (a, b) in enumerate(hunks):
+        old = "\n".join(lines[a:b+1])
+        new = "\n".join([changed.get(i, lines[i]) for i in range(a, b+1)])
+        hunks[k] = firstline + a, old, new
+    return hunks, hit
+
+def _substitute(prog, expand, chars, pos=0):
+    '''Return (newchars, span) with each match in chars[pos:] expanded.
+
+    Span is (start, end) of the last replacement in newchars, or None
+    if there was no match.
+    '''
+    pieces = []
+    size = prev = 0
+    span = None
+    for m in prog.finditer(chars, pos):
         i, j = m.span()
-    return found
+        new = expand(m)
+        pieces.append(chars[prev:i])
+        size = size + i - prev
+        pieces.append(new)
+        span = size, size + len(new)
+        size = size + len(new)
+        prev = j
+    if span is None:
+        return chars, None
+    pieces.append(chars[prev:])
+    return "".join(pieces), span
+
+def _offset_index(chars, offset, line):
+    "Return 'line.col' index of offset in chars, which starts at line."
+    head = chars[:offset]
+    line = line + head.count("\n")
+    return "%d.%d" % (line, offset - head.rfind("\n") - 1)
 
 def get_selection(text):
     '''Return tuple of 'line.col' indexes from selection or insert mark.
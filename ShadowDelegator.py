@@ -0,0 +1,280 @@
+"""Keep a Python copy of the text of a Text widget.
+
+ShadowDelegator is a Percolator filter that applies each insert and
+delete to a TextBuffer as well as to the widget.  Code that reads a lot
+of text can then read the buffer instead of calling text.get, which
+crosses into Tcl and copies on every call.  The buffer's version number
+increases with every change, so readers can cache results per version.
+
+The filter must be at the bottom of the Percolator chain, below any
+filter that changes or drops edits, so that it sees exactly the edits
+made to the widget.
+"""
+from idlelib.Delegator import Delegator
+
+BLOCK_LINES = 128  # Lines per block of a TextBuffer, when first built.
+
+
+class _Fenwick:
+    # Prefix sums over a list of ints, with O(log n) updates and searches.
+
+    def __init__(self, values):
+        self.tree = tree = [0] + list(values)
+        n = len(tree)
+        for i in range(1, n):
+            j = i + (i & -i)
+            if j < n:
+                tree[j] += tree[i]
+
+    def add(self, i, delta):
+        "Add delta to value i."
+        tree = self.tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        "Return the sum of values [0, i)."
+        tree = self.tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def search(self, target):
+        """Return (i, prefix(i)) for the value i holding position target.
+
+        That is the smallest i with prefix(i+1) > target, or the number
+        of values if target is past the total.
+        """
+        tree = self.tree
+        pos = 0
+        total = 0
+        step = 1 << (len(tree).bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and total + tree[nxt] <= target:
+                pos = nxt
+                total += tree[nxt]
+            step >>= 1
+        return pos, total
+
+
+class TextBuffer:
+    """The text of a Text widget, without its final newline.
+
+    Lines are numbered from 1 and columns from 0, as in Tk indexes.  The
+    lines are kept in blocks, with the line and character counts of the
+    blocks in Fenwick trees, so that converting between (line, col) and
+    offsets and editing take O(log n) time plus O(BLOCK_LINES).
+    """
+
+    def __init__(self, chars=''):
+        self.version = 0
+        self.set(chars)
+
+    def set(self, chars):
+        "Replace the whole text with chars."
+        lines = chars.split('\n')
+        self.blocks = [lines[i:i+BLOCK_LINES]
+                       for i in range(0, len(lines), BLOCK_LINES)]
+        self._reindex()
+
+    def _reindex(self):
+        # Rebuild the counts after blocks were added or removed.
+        self.nlines = [len(block) for block in self.blocks]
+        self.nchars = [sum(map(len, block)) + len(block)
+                       for block in self.blocks]
+        self.linetree = _Fenwick(self.nlines)
+        self.chartree = _Fenwick(self.nchars)
+        self.version += 1
+
+    def _update(self, b):
+        # Update the counts of block b after it was changed in place.
+        block = self.blocks[b]
+        nlines = len(block)
+        nchars = sum(map(len, block)) + nlines
+        self.linetree.add(b, nlines - self.nlines[b])
+        self.chartree.add(b, nchars - self.nchars[b])
+        self.nlines[b] = nlines
+        self.nchars[b] = nchars
+        self.version += 1
+
+    def _locate(self, line):
+        # Return (block, line in block) for line, which must exist.
+        b, before = self.linetree.search(line - 1)
+        return b, line - 1 - before
+
+    def __len__(self):
+        return self.chartree.prefix(len(self.blocks)) - 1
+
+    def linecount(self):
+        "Return the number of lines; the last has no final newline."
+        return self.linetree.prefix(len(self.blocks))
+
+    def getline(self, line):
+        "Return line, without its newline."
+        b, i = self._locate(line)
+        return self.blocks[b][i]
+
+    def getlines(self, first, last):
+        "Return the list of lines [first, last), clipped to the text."
+        first = max(first, 1)
+        last = min(last, self.linecount() + 1)
+        if first >= last:
+            return []
+        b, i = self._locate(first)
+        lines = []
+        count = last - first
+        while len(lines) < count:
+            block = self.blocks[b]
+            lines.extend(block[i:i + count - len(lines)])
+            b, i = b + 1, 0
+        return lines
+
+    def get(self, start, end):
+        "Return the text from (line, col) start to (line, col) end."
+        (line1, col1), (line2, col2) = start, end
+        lines = self.getlines(line1, line2 + 1)
+        if not lines or start >= end:
+            return ''
+        if len(lines) == 1:
+            return lines[0][col1:col2]
+        lines[0] = lines[0][col1:]
+        lines[-1] = lines[-1][:col2]
+        return '\n'.join(lines)
+
+    def offset(self, line, col):
+        "Return the offset in the text of (line, col)."
+        b, i = self._locate(line)
+        block = self.blocks[b]
+        return (self.chartree.prefix(b) + sum(map(len, block[:i])) + i +
+                min(col, len(block[i])))
+
+    def position(self, offset):
+        "Return (line, col) for offset in the text, clipped to the text."
+        offset = max(0, min(offset, len(self)))
+        b, before = self.chartree.search(offset)
+        line = self.linetree.prefix(b) + 1
+        for text in self.blocks[b]:
+            if offset - before <= len(text):
+                return line, offset - before
+            before += len(text) + 1
+            line += 1
+        raise AssertionError("offset not found")  # pragma: no cover
+
+    def insert(self, line, col, chars):
+        "Insert chars at (line, col)."
+        text = self.getline(line)
+        pieces = chars.split('\n')
+        pieces[0] = text[:col] + pieces[0]
+        pieces[-1] = pieces[-1] + text[col:]
+        self._replace(line, line, pieces)
+
+    def delete(self, start, end):
+        "Delete the text from (line, col) start to (line, col) end."
+        (line1, col1), (line2, col2) = start, end
+        if start >= end:
+            return
+        new = self.getline(line1)[:col1] + self.getline(line2)[col2:]
+        self._replace(line1, line2, [new])
+
+    def _replace(self, line1, line2, new):
+        # Replace lines line1 through line2 with the list of lines new.
+        b1, i1 = self._locate(line1)
+        b2, i2 = self._locate(line2)
+        blocks = self.blocks
+        if b1 == b2:
+            block = blocks[b1]
+            block[i1:i2+1] = new
+            if block and len(block) <= 2 * BLOCK_LINES:
+                self._update(b1)
+                return
+            lines = block
+        else:
+            lines = blocks[b1][:i1] + new + blocks[b2][i2+1:]
+        blocks[b1:b2+1] = [lines[i:i+BLOCK_LINES]
+                           for i in range(0, len(lines), BLOCK_LINES)]
+        if not blocks:
+            blocks.append([''])
+        self._reindex()
+
+
+class ShadowDelegator(Delegator):
+    """Percolator filter keeping buffer, a TextBuffer, in step with text.
+
+    Tk resolves the indexes of each edit, and the edit is applied to the
+    buffer with Tk's rules for the end of the text.
+
+    If a change hook is set, it is called with (start, end, inserted)
+    for each edit: the offsets it replaced in the old text, and the
+    number of characters inserted.
+    """
+
+    def __init__(self):
+        Delegator.__init__(self)
+        self.buffer = TextBuffer()
+        self.change_hook = None
+
+    def set_change_hook(self, hook):
+        self.change_hook = hook
+
+    def setdelegate(self, delegate):
+        Delegator.setdelegate(self, delegate)
+        if delegate is not None:
+            self.buffer.set(delegate.get('1.0', 'end-1c'))
+
+    def _position(self, index):
+        # Return (line, col) for a resolved 'line.col' index.
+        line, col = index.split('.')
+        return int(line), int(col)
+
+    def insert(self, index, chars, tags=None):
+        index = self.delegate.index(index)
+        self.delegate.insert(index, chars, tags)
+        if chars:
+            line, col = self._position(index)
+            buffer = self.buffer
+            last = buffer.linecount()
+            if line > last:
+                # Inserts at 'end' go before the final newline.
+                line, col = last, len(buffer.getline(last))
+            if self.change_hook is not None:
+                start = buffer.offset(line, col)
+                buffer.insert(line, col, chars)
+                self.change_hook(start, start, len(chars))
+            else:
+                buffer.insert(line, col, chars)
+
+    def delete(self, index1, index2=None):
+        index1 = self.delegate.index(index1)
+        if index2 is None:
+            index2 = self.delegate.index(index1 + '+1c')
+        else:
+            index2 = self.delegate.index(index2)
+        self.delegate.delete(index1, index2)
+        start = self._position(index1)
+        end = self._position(index2)
+        if start >= end:
+            return
+        buffer = self.buffer
+        last = buffer.linecount()
+        if end[0] > last:
+            # Tk never deletes the final newline.  Instead, a deletion of
+            # whole lines to the end deletes the newline before them.
+            end = last, len(buffer.getline(last))
+            if start[1] == 0 and start[0] > 1:
+                start = start[0] - 1, len(buffer.getline(start[0] - 1))
+        if self.change_hook is not None:
+            offsets = buffer.offset(*start), buffer.offset(*end)
+            buffer.delete(start, end)
+            self.change_hook(offsets[0], offsets[1], 0)
+        else:
+            buffer.delete(start, end)
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main('idlelib.idle_test.test_shadowdelegator', verbosity=2)
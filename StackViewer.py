@@ -5,7 +5,7 @@ import re
 import tkinter as tk
 
 from idlelib.TreeWidget import TreeNode, TreeItem, ScrolledCanvas
-from idlelib.ObjectBrowser import ObjectTreeItem, make_objecttreeitem
+from idlelib.ObjectBrowser import SequenceTreeItem
 from idlelib.PyShell import PyShellFileList
 
 def StackBrowser(root, flist=None, tb=None, top=None):
@@ -96,7 +96,7 @@ class FrameTreeItem(TreeItem):
             if os.path.isfile(filename):
                 self.flist.gotofileline(filename, lineno)
 
-class VariablesTreeItem(ObjectTreeItem):
+class VariablesTreeItem(SequenceTreeItem):
 
     def GetText(self):
         return self.labeltext
@@ -104,23 +104,10 @@ class VariablesTreeItem(ObjectTreeItem):
     def GetLabelText(self):
         return None
 
-    def IsExpandable(self):
-        return len(self.object) > 0
+    def GetKeyLabel(self, key):
+        return key + " ="
 
-    def GetSubList(self):
-        sublist = []
-        for key in self.object.keys():
-            try:
-                value = self.object[key]
-            except KeyError:
-                continue
-            def setfunction(value, key=key, object=self.object):
-                object[key] = value
-            item = make_objecttreeitem(key + " =", value, setfunction)
-            sublist.append(item)
-        return sublist
-
-    def keys(self):  # unused, left for possible 3rd party use
+    def keys(self):
         return list(self.object.keys())
 
 def _stack_viewer(parent):
@@ -1,4 +1,7 @@
+import marshal
 import string
+import sys
+import zlib
 from tkinter import *
 
 from idlelib.Delegator import Delegator
@@ -18,7 +21,12 @@ from idlelib.Delegator import Delegator
 
 class UndoDelegator(Delegator):
 
+    # The undo list is trimmed from the oldest end to hold at most
+    # max_undo commands and about max_undo_bytes bytes (see Command.size).
+    # The newest command is always kept.  EditorWindow sets the byte
+    # budget from the undo-memory-mb option.
     max_undo = 1000
+    max_undo_bytes = 32 << 20
 
     def __init__(self):
         Delegator.__init__(self)
@@ -49,6 +57,7 @@ class UndoDelegator(Delegator):
         self.was_saved = -1
         self.pointer = 0
         self.undolist = []
+        self.undo_bytes = 0  # Total size of the commands in undolist.
         self.undoblock = 0  # or a CommandSequence instance
         self.set_saved(1)
 
@@ -78,11 +87,23 @@ class UndoDelegator(Delegator):
                 self.saved_change_hook()
 
     def insert(self, index, chars, tags=None):
+        if self.can_merge and self.pointer > 0 and self.undoblock == 0:
+            # Add a typed character to the last command's run without
+            # making a command for it.
+            lastcmd = self.undolist[self.pointer-1]
+            size = lastcmd.size()
+            if lastcmd.extend(self.delegate, index, chars, tags):
+                self.undo_bytes += lastcmd.size() - size
+                self.trim_undo()
+                return
         self.addcmd(InsertCommand(index, chars, tags))
 
     def delete(self, index1, index2=None):
         self.addcmd(DeleteCommand(index1, index2))
 
+    def replace_lines(self, hunks):
+        self.addcmd(ReplaceLinesCommand(hunks))
+
     # Clients should call undo_block_start() and undo_block_stop()
     # around a sequence of editing cmds to be treated as a unit by
     # undo & redo.  Nested matching calls are OK, and the inner calls
@@ -119,20 +140,31 @@ class UndoDelegator(Delegator):
             return
         if self.can_merge and self.pointer > 0:
             lastcmd = self.undolist[self.pointer-1]
+            size = lastcmd.size()
             if lastcmd.merge(cmd):
+                self.undo_bytes += lastcmd.size() - size
+                self.trim_undo()
                 return
+        for oldcmd in self.undolist[self.pointer:]:
+            self.undo_bytes -= oldcmd.size()
         self.undolist[self.pointer:] = [cmd]
+        self.undo_bytes += cmd.size()
         if self.saved > self.pointer:
             self.saved = -1
         self.pointer = self.pointer + 1
-        if len(self.undolist) > self.max_undo:
-            ##print "truncating undo list"
-            del self.undolist[0]
+        self.trim_undo()
+        self.can_merge = True
+        self.check_saved()
+
+    def trim_undo(self):
+        "Drop the oldest commands while over the count or byte budget."
+        undolist = self.undolist
+        while len(undolist) > 1 and (len(undolist) > self.max_undo or
+                                     self.undo_bytes > self.max_undo_bytes):
+            self.undo_bytes -= undolist.pop(0).size()
             self.pointer = self.pointer - 1
             if self.saved >= 0:
                 self.saved = self.saved - 1
-        self.can_merge = True
-        self.check_saved()
 
     def undo_event(self, event):
         if self.pointer == 0:
@@ -157,20 +189,68 @@ class UndoDelegator(Delegator):
         return "break"
 
 
+# Text payloads of at least PACK_SIZE characters are kept compressed.
+PACK_SIZE = 1 << 16
+# Rough memory used by a command apart from its payload.
+COMMAND_SIZE = 200
+
+class _Packed(bytes):
+    # A compressed payload, see pack().
+    __slots__ = ()
+
+def pack(value):
+    "Return value, a string or hunk list, compressed if it is large."
+    if isinstance(value, str):
+        large = len(value) >= PACK_SIZE
+    else:
+        large = sum(len(old) + len(new) for _, old, new in value) >= PACK_SIZE
+    if not large:
+        return value
+    return _Packed(zlib.compress(marshal.dumps(value), 1))
+
+def unpack(value):
+    "Return the value that pack() returned value for."
+    if isinstance(value, _Packed):
+        return marshal.loads(zlib.decompress(value))
+    return value
+
+_last_marks = ()
+
+def _share_marks(marks):
+    # Successive commands usually see the same marks, so reuse the last
+    # tuple when it is equal, rather than keeping a copy per command.
+    global _last_marks
+    if marks == _last_marks:
+        return _last_marks
+    _last_marks = marks
+    return marks
+
 class Command:
 
     # Base class for Undoable commands
 
-    tags = None
+    # Commands are small: slots instead of dicts, interned index strings,
+    # and marks kept as shared tuples of (name, index) pairs.  Large
+    # payloads are compressed (see pack).
+
+    __slots__ = ('index1', 'index2', '_chars', 'tags',
+                 'marks_before', 'marks_after')
 
     def __init__(self, index1, index2, chars, tags=None):
-        self.marks_before = {}
-        self.marks_after = {}
+        self.marks_before = ()
+        self.marks_after = ()
         self.index1 = index1
         self.index2 = index2
         self.chars = chars
-        if tags:
-            self.tags = tags
+        self.tags = tags or None
+
+    @property
+    def chars(self):
+        return unpack(self._chars)
+
+    @chars.setter
+    def chars(self, chars):
+        self._chars = pack(chars) if chars else chars
 
     def __repr__(self):
         s = self.__class__.__name__
@@ -179,6 +259,11 @@ class Command:
             t = t[:-1]
         return s + repr(t)
 
+    def size(self):
+        "Return the approximate number of bytes the command keeps alive."
+        chars = self._chars
+        return COMMAND_SIZE + (sys.getsizeof(chars) if chars else 0)
+
     def do(self, text):
         pass
 
@@ -191,15 +276,18 @@ class Command:
     def merge(self, cmd):
         return 0
 
+    def extend(self, text, index, chars, tags):
+        "Insert chars at index in text as part of this command, if it can."
+        return False
+
     def save_marks(self, text):
-        marks = {}
-        for name in text.mark_names():
-            if name != "insert" and name != "current":
-                marks[name] = text.index(name)
-        return marks
+        marks = tuple((sys.intern(name), sys.intern(text.index(name)))
+                      for name in text.mark_names()
+                      if name != "insert" and name != "current")
+        return _share_marks(marks)
 
     def set_marks(self, text, marks):
-        for name, index in marks.items():
+        for name, index in marks:
             text.mark_set(name, index)
 
 
@@ -207,17 +295,21 @@ class InsertCommand(Command):
 
     # Undoable insert command
 
+    __slots__ = ()
+
     def __init__(self, index1, chars, tags=None):
         Command.__init__(self, index1, None, chars, tags)
 
     def do(self, text):
         self.marks_before = self.save_marks(text)
-        self.index1 = text.index(self.index1)
+        self.index1 = sys.intern(text.index(self.index1))
         if text.compare(self.index1, ">", "end-1c"):
             # Insert before the final newline
-            self.index1 = text.index("end-1c")
-        text.insert(self.index1, self.chars, self.tags)
-        self.index2 = text.index("%s+%dc" % (self.index1, len(self.chars)))
+            self.index1 = sys.intern(text.index("end-1c"))
+        chars = self.chars
+        text.insert(self.index1, chars, self.tags)
+        self.index2 = sys.intern(
+                text.index("%s+%dc" % (self.index1, len(chars))))
         self.marks_after = self.save_marks(text)
         ##sys.__stderr__.write("do: %s\n" % self)
 
@@ -240,15 +332,36 @@ class InsertCommand(Command):
             return False
         if self.index2 != cmd.index1:
             return False
-        if self.tags != cmd.tags:
+        if not self.can_extend(cmd.chars, cmd.tags):
             return False
-        if len(cmd.chars) != 1:
+        self.index2 = cmd.index2
+        self._chars = self._chars + cmd.chars
+        return True
+
+    def extend(self, text, index, chars, tags):
+        # Like do() on a new command followed by merge(), but without
+        # making the command or saving marks.
+        if not self.can_extend(chars, tags):
             return False
-        if self.chars and \
-           self.classify(self.chars[-1]) != self.classify(cmd.chars):
+        if text.index(index) != self.index2:
+            return False
+        if text.compare(self.index2, ">", "end-1c"):
+            return False
+        text.insert(self.index2, chars, self.tags)
+        self.index2 = sys.intern(text.index(self.index2 + "+1c"))
+        self._chars = self._chars + chars
+        return True
+
+    def can_extend(self, chars, tags):
+        # Typing runs of one class of character merge into one command.
+        # Runs are short, so the payload is never packed.
+        if self.tags != (tags or None):
+            return False
+        if len(chars) != 1 or isinstance(self._chars, _Packed):
+            return False
+        if self._chars and \
+           self.classify(self._chars[-1]) != self.classify(chars):
             return False
-        self.index2 = cmd.index2
-        self.chars = self.chars + cmd.chars
         return True
 
     alphanumeric = string.ascii_letters + string.digits + "_"
@@ -265,19 +378,21 @@ class DeleteCommand(Command):
 
     # Undoable delete command
 
+    __slots__ = ()
+
     def __init__(self, index1, index2=None):
         Command.__init__(self, index1, index2, None, None)
 
     def do(self, text):
         self.marks_before = self.save_marks(text)
-        self.index1 = text.index(self.index1)
+        self.index1 = sys.intern(text.index(self.index1))
         if self.index2:
-            self.index2 = text.index(self.index2)
+            self.index2 = sys.intern(text.index(self.index2))
         else:
-            self.index2 = text.index(self.index1 + " +1c")
+            self.index2 = sys.intern(text.index(self.index1 + " +1c"))
         if text.compare(self.index2, ">", "end-1c"):
             # Don't delete the final newline
-            self.index2 = text.index("end-1c")
+            self.index2 = sys.intern(text.index("end-1c"))
         self.chars = text.get(self.index1, self.index2)
         text.delete(self.index1, self.index2)
         self.marks_after = self.save_marks(text)
@@ -297,11 +412,81 @@ class DeleteCommand(Command):
         text.see('insert')
         ##sys.__stderr__.write("undo: %s\n" % self)
 
+class ReplaceLinesCommand(Command):
+
+    # Undoable replacement of runs of whole lines, such as Replace All
+    # makes.  Hunks are (lineno, oldchars, newchars) tuples in increasing
+    # line order, where oldchars is the text of the lines starting at
+    # lineno, without the final newline.  Only changed runs are kept,
+    # so one command holds a compact diff of the whole edit instead of
+    # an insert and a delete command per change.
+
+    __slots__ = ('_hunks',)
+
+    def __init__(self, hunks):
+        Command.__init__(self, "%d.0" % hunks[0][0], None, None)
+        self.hunks = hunks
+
+    @property
+    def hunks(self):
+        return unpack(self._hunks)
+
+    @hunks.setter
+    def hunks(self, hunks):
+        self._hunks = pack(hunks)
+
+    def __repr__(self):
+        return "%s(%s, <%d hunks>)" % (self.__class__.__name__,
+                                       self.index1, len(self.hunks))
+
+    def size(self):
+        hunks = self._hunks
+        if isinstance(hunks, _Packed):
+            return COMMAND_SIZE + len(hunks)
+        return COMMAND_SIZE + sum(sys.getsizeof(old) + sys.getsizeof(new)
+                                  for _, old, new in hunks)
+
+    def do(self, text):
+        self.marks_before = self.save_marks(text)
+        self.apply(text, self.hunks)
+        self.marks_after = self.save_marks(text)
+
+    def redo(self, text):
+        text.mark_set('insert', self.index1)
+        self.apply(text, self.hunks)
+        self.set_marks(text, self.marks_after)
+        text.see('insert')
+
+    def undo(self, text):
+        text.mark_set('insert', self.index1)
+        self.apply(text, self.inverse())
+        self.set_marks(text, self.marks_before)
+        text.see('insert')
+
+    def inverse(self):
+        "Return hunks that restore the old text, in new line numbers."
+        hunks = []
+        shift = 0
+        for lineno, old, new in self.hunks:
+            hunks.append((lineno + shift, new, old))
+            shift = shift + new.count("\n") - old.count("\n")
+        return hunks
+
+    def apply(self, text, hunks):
+        # Work bottom up, so line numbers of earlier hunks stay valid.
+        for lineno, old, new in reversed(hunks):
+            last = lineno + old.count("\n")
+            text.delete("%d.0" % lineno, "%d.end" % last)
+            if new:
+                text.insert("%d.0" % lineno, new)
+
 class CommandSequence(Command):
 
     # Wrapper for a sequence of undoable cmds to be undone/redone
     # as a unit
 
+    __slots__ = ('cmds', 'depth')
+
     def __init__(self):
         self.cmds = []
         self.depth = 0
@@ -322,6 +507,9 @@ class CommandSequence(Command):
     def getcmd(self, i):
         return self.cmds[i]
 
+    def size(self):
+        return COMMAND_SIZE + sum(cmd.size() for cmd in self.cmds)
+
     def redo(self, text):
         for cmd in self.cmds:
             cmd.redo(text)
@@ -361,5 +549,9 @@ def _undo_delegator(parent):
     root.mainloop()
 
 if __name__ == "__main__":
+    import unittest
+    unittest.main('idlelib.idle_test.test_undodelegator', verbosity=2,
+                  exit=False)
+
     from idlelib.idle_test.htest import run
     run(_undo_delegator)
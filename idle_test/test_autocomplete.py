@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from test.support import requires
 from tkinter import Tk, Text
@@ -139,5 +141,101 @@ class AutoCompleteTest(unittest.TestCase):
         pass
 
 
+class FetchCompletionsTest(unittest.TestCase):
+
+    def setUp(self):
+        import __main__
+        self.main = __main__.__dict__
+        self.main['_ac_test'] = self.obj = type('Obj', (), {'spam': 1})()
+        self.autocomplete = ac.AutoComplete()
+
+    def tearDown(self):
+        del self.main['_ac_test']
+
+    def test_attributes(self):
+        fetch = self.autocomplete.fetch_completions
+        smalll, bigl = fetch('_ac_test', ac.COMPLETE_ATTRIBUTES)
+        self.assertEqual(smalll, ['spam'])
+        self.assertIn('__class__', bigl)
+        self.assertIn('_ac_test', fetch('', ac.COMPLETE_ATTRIBUTES)[1])
+        self.assertIn('path', fetch('sys', ac.COMPLETE_ATTRIBUTES)[0])
+        self.assertEqual(fetch('no_such_name', ac.COMPLETE_ATTRIBUTES),
+                         ([], []))
+
+    def test_get_entity(self):
+        get_entity = self.autocomplete.get_entity
+        self.assertIs(get_entity('_ac_test'), self.obj)
+        self.assertIs(get_entity('(lambda: _ac_test)()'), self.obj)
+        self.assertEqual(get_entity('[_ac_test.spam for i in (1, 2)]'),
+                         [1, 1])
+
+    def test_cache(self):
+        fetch = self.autocomplete.fetch_completions
+        first = fetch('_ac_test', ac.COMPLETE_ATTRIBUTES)
+        self.obj.eggs = 2
+        self.assertIs(fetch('_ac_test', ac.COMPLETE_ATTRIBUTES), first)
+        ac.namespace_changed()
+        self.assertEqual(fetch('_ac_test', ac.COMPLETE_ATTRIBUTES)[0],
+                         ['eggs', 'spam'])
+        # A hit evaluates nothing.
+        self.autocomplete.get_entity = None
+        self.assertEqual(fetch('_ac_test', ac.COMPLETE_ATTRIBUTES)[0],
+                         ['eggs', 'spam'])
+
+    def test_cache_size(self):
+        self.autocomplete.fetch_completions('', ac.COMPLETE_ATTRIBUTES)
+        for i in range(ac.CACHE_SIZE + 5):
+            self.autocomplete.fetch_completions(str(i), ac.COMPLETE_ATTRIBUTES)
+        self.assertEqual(len(self.autocomplete.cache), ac.CACHE_SIZE)
+
+
+class FileCompletionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = self.tempdir.name
+        for name in ('b.py', 'a.py', '.hidden'):
+            open(os.path.join(self.path, name), 'w').close()
+        self.autocomplete = ac.AutoComplete()
+
+    def tearDown(self):
+        ac._listings.clear()
+        self.tempdir.cleanup()
+
+    def test_file_completions(self):
+        ac.list_directory(self.path, wait=5)
+        smalll, bigl, done = self.autocomplete.file_completions(self.path)
+        self.assertEqual(smalll, ['a.py', 'b.py'])
+        self.assertEqual(bigl, ['.hidden', 'a.py', 'b.py'])
+        self.assertTrue(done)
+        self.assertEqual(self.autocomplete.fetch_completions(
+                self.path, ac.COMPLETE_FILES), (smalll, bigl))
+        self.assertEqual(self.autocomplete.file_completions(
+                os.path.join(self.path, 'nowhere')), ([], [], True))
+
+    def test_cache(self):
+        ac.list_directory(self.path)
+        listing, = ac._listings.values()
+        ac.list_directory(self.path)
+        self.assertEqual(list(ac._listings.values()), [listing])
+        open(os.path.join(self.path, 'c.py'), 'w').close()
+        os.utime(self.path, ns=(0, 0))
+        names, done = ac.list_directory(self.path, wait=5)
+        self.assertIn('c.py', names)
+        self.assertEqual(len(ac._listings), 2)
+
+    def test_limits(self):
+        limit, kept = ac.LISTING_LIMIT, ac.LISTINGS_KEPT
+        ac.LISTING_LIMIT, ac.LISTINGS_KEPT = 2, 1
+        try:
+            names, done = ac.list_directory(self.path, wait=5)
+            self.assertEqual(len(names), 2)
+            self.assertTrue(done)
+            ac.list_directory(os.path.dirname(self.path))
+            self.assertEqual(len(ac._listings), 1)
+        finally:
+            ac.LISTING_LIMIT, ac.LISTINGS_KEPT = limit, kept
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,72 @@
+'''Test the Matcher in AutoCompleteWindow.py.'''
+
+import random
+import unittest
+from idlelib import AutoCompleteWindow as acw
+from idlelib.AutoCompleteWindow import Matcher
+
+
+class MatcherTest(unittest.TestCase):
+
+    def test_word_starts(self):
+        self.assertEqual(acw._word_starts('get_config'), {0, 4})
+        self.assertEqual(acw._word_starts('getConfigKey2'), {0, 3, 9, 12})
+        self.assertEqual(acw._word_starts('__init__'), {0, 2})
+        self.assertEqual(acw._word_starts('HTTPError'), {0})
+
+    def test_matches(self):
+        matcher = Matcher(['abc', 'axbyc', 'bca', 'cab'])
+        self.assertEqual(matcher.matches(''), [0, 1, 2, 3])
+        self.assertEqual(matcher.matches('ab'), [0, 1, 3])
+        self.assertEqual(matcher.matches('AbC'), [0, 1])
+        self.assertEqual(matcher.matches('abcd'), [])
+        self.assertEqual(matcher.matches('z'), [])
+
+    def test_narrowing(self):
+        # Narrowed matches are the same as those found from scratch.
+        rand = random.Random(43)
+        words = sorted({''.join(rand.choice('abcdE_') for i in range(8))
+                        for j in range(500)})
+        narrowing = Matcher(words)
+        for query in ('', 'a', 'ab', 'abE', 'abE_', 'b', 'bd', 'bdd'):
+            self.assertEqual(narrowing.matches(query),
+                             Matcher(words).matches(query))
+
+    def test_rank(self):
+        words = sorted(['GetConfig', 'get_config', 'getaway', 'get_colour',
+                        'gecko_frog', 'target_conf', 'xyz'])
+        matcher = Matcher(words)
+        rank = lambda typed: [words[i] for i in matcher.rank(typed)]
+        # Prefixes with the case typed first, then without, in list order.
+        self.assertEqual(rank('get')[:4],
+                         ['get_colour', 'get_config', 'getaway', 'GetConfig'])
+        # Word starts beat scattered letters; the case typed breaks ties.
+        self.assertEqual(rank('gc'),
+                         ['get_colour', 'get_config', 'GetConfig',
+                          'gecko_frog', 'target_conf'])
+        self.assertEqual(rank('conf'),
+                         ['GetConfig', 'get_config', 'target_conf'])
+        self.assertEqual(rank('q'), [])
+        # All prefixes are listed, and all names for an empty string.
+        matcher = Matcher(['a%d' % i for i in range(500)] + ['xa'])
+        self.assertEqual(len(matcher.rank('a', limit=10)), 500)
+        self.assertEqual(len(matcher.rank('', limit=10)), 501)
+        self.assertEqual(len(matcher.rank('x', limit=10)), 1)
+
+    def test_rank_scores_only_needed(self):
+        words = (['a%d' % i for i in range(50)] +
+                 ['xa%d' % i for i in range(50)])
+        matcher = Matcher(sorted(words))
+        scored = []
+        score = matcher.score
+        matcher.score = lambda typed, i: scored.append(i) or score(typed, i)
+        self.assertEqual(len(matcher.rank('a', limit=20)), 50)
+        self.assertEqual(scored, [])  # Enough prefixes.
+        ranked = [matcher.completions[i] for i in matcher.rank('a')]
+        self.assertEqual(ranked[:50], sorted(words[:50]))
+        self.assertEqual(len(ranked), 100)
+        self.assertEqual(len(scored), 50)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,9 +1,13 @@
 """Unit tests for idlelib.AutoExpand"""
+import random
+import re
 import unittest
 from test.support import requires
 from tkinter import Text, Tk
 #from idlelib.idle_test.mock_tk import Text
-from idlelib.AutoExpand import AutoExpand
+from idlelib.AutoExpand import AutoExpand, WordIndex
+from idlelib.ChangeBus import Change
+from idlelib.ShadowDelegator import TextBuffer
 
 
 class Dummy_Editwin:
@@ -137,5 +141,53 @@ class AutoExpandTest(unittest.TestCase):
         new_state = self.auto_expand.state
         self.assertNotEqual(initial_state, new_state)
 
+class WordIndexTest(unittest.TestCase):
+
+    def expansions(self, chars, prefix, line, col):
+        return WordIndex(TextBuffer(chars)).expansions(prefix, line, col)
+
+    def test_expansions(self):
+        equal = self.assertEqual
+        equal(self.expansions('ab ac bx ad ab a', 'a', 1, 16),
+              ['ab', 'ad', 'ac'])
+        equal(self.expansions('a, [ab] ac: () bx"" cd ac= ad ya', 'a', 1, 1),
+              ['ab', 'ac', 'ad'])
+        equal(self.expansions('ab xy yz\na ac by ac', 'a', 2, 1),
+              ['ab', 'ac'])
+        equal(self.expansions('bx cy dz a', 'a', 1, 10), [])
+        # The word at the cursor is not its own expansion.
+        equal(self.expansions('x ab\nabc', 'a', 2, 1), ['ab'])
+        equal(self.expansions('abc x ab\nabc', 'a', 2, 1), ['ab', 'abc'])
+
+    def test_update(self):
+        rand = random.Random(40)
+        pieces = ['ab ', 'abc', '\n', 'x', ' ', 'ab\nac ad']
+        chars = 'ab ac\nad ab\n' * 3
+        buffer = TextBuffer(chars)
+        index = WordIndex(buffer)
+        for i in range(300):
+            start = rand.randrange(len(chars) + 1)
+            end = min(len(chars), start + rand.choice((0, 0, 1, 4, 12)))
+            new = rand.choice(pieces) if rand.random() < 0.7 else ''
+            buffer.delete(buffer.position(start), buffer.position(end))
+            buffer.insert(*buffer.position(start), new)
+            chars = chars[:start] + new + chars[end:]
+            index.update(Change(buffer.version, start, end, len(new)))
+            words = re.findall(r'\w+', chars)
+            self.assertEqual(index.sorted, sorted(set(words)))
+            self.assertEqual(sum(index.counts.values()), len(words))
+            # Compare with a search of the text as AutoExpand once did.
+            offset = rand.randrange(len(chars) + 1)
+            line, col = buffer.position(offset)
+            start = re.search(r'\w*\Z', chars[:offset]).start()
+            end = offset + re.match(r'\w*', chars[offset:]).end()
+            expect = []
+            for w in (re.findall(r'\ba\w+', chars[:start])[::-1] +
+                      re.findall(r'\ba\w+', chars[end:])):
+                if w not in expect:
+                    expect.append(w)
+            self.assertEqual(index.expansions('a', line, col), expect)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
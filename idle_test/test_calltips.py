@@ -173,5 +173,144 @@ class Get_entityTest(unittest.TestCase):
     def test_good_entity(self):
         self.assertIs(ct.get_entity('int'), int)
 
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        import __main__
+        self.main = __main__.__dict__
+        self.main['_ct_test'] = lambda a: None
+        self.made = 0
+        self.get_argspec = ct.get_argspec
+        def get_argspec(ob):
+            self.made += 1
+            return '(%s)' % ', '.join(ob.__code__.co_varnames)
+        ct.get_argspec = get_argspec
+
+    def tearDown(self):
+        ct.get_argspec = self.get_argspec
+        del self.main['_ct_test']
+
+    def test_entity_cache(self):
+        calltips = ct.CallTips()
+        self.assertEqual(calltips.fetch_tip('_ct_test'), '(a)')
+        self.assertEqual(calltips.fetch_tip('_ct_test'), '(a)')
+        self.assertEqual(self.made, 1)
+        self.main['_ct_test'] = lambda b: None
+        self.assertEqual(calltips.fetch_tip('_ct_test'), '(b)')
+        ct.AutoComplete.namespace_changed()
+        calltips.fetch_tip('_ct_test')
+        self.assertEqual(self.made, 3)
+
+    def test_expression_cache(self):
+        calls = []
+        def remotecall(oid, method, args, kwargs):
+            calls.append(args)
+            return '(x)'
+        class Editwin:
+            text = None
+        editwin = Editwin()
+        editwin.flist = types.SimpleNamespace(pyshell=types.SimpleNamespace(
+            interp=types.SimpleNamespace(rpcclt=types.SimpleNamespace(
+                remotecall=remotecall))))
+        calltips = ct.CallTips(editwin)
+        for i in range(3):
+            self.assertEqual(calltips.fetch_tip('f'), '(x)')
+        self.assertEqual(calls, [('f',)])
+        ct.AutoComplete.namespace_changed()
+        calltips.fetch_tip('f')
+        self.assertEqual(len(calls), 2)
+        for i in range(ct.CACHE_SIZE + 5):
+            calltips.fetch_tip('f%d' % i)
+        self.assertEqual(len(calltips.expression_cache), ct.CACHE_SIZE)
+
+    def test_is_defined(self):
+        self.assertTrue(ct.is_defined('_ct_test'))
+        self.assertTrue(ct.is_defined('len'))
+        self.assertTrue(ct.is_defined('textwrap'))  # In sys.modules.
+        self.assertTrue(ct.is_defined('textwrap.dedent'))
+        self.assertFalse(ct.is_defined('_ct_tes'))
+        self.assertFalse(ct.is_defined('textwrap.ded'))
+        # Only modules' attributes are looked at, so no code runs.
+        got = []
+        class Obj:
+            @property
+            def prop(self):
+                got.append(1)
+                return len
+        self.main['_ct_obj'] = Obj()
+        self.addCleanup(self.main.pop, '_ct_obj')
+        self.assertFalse(ct.is_defined('_ct_obj.prop'))
+        self.assertFalse(ct.is_defined('textwrap.dedent.__call__'))
+        self.assertEqual(got, [])
+
+    def test_prefetch_remote(self):
+        # With a subprocess, the tip is asked for without waiting, and
+        # cached once it comes.
+        scheduled = []
+        class Text:
+            def after(self, ms, func, *args):
+                scheduled.append((func, args))
+                return 'after#%d' % len(scheduled)
+            def after_cancel(self, after_id):
+                scheduled.pop()
+            def get(self, index):
+                return 'f'
+        class Rpcclt:
+            def __init__(self):
+                self.cvars = {}
+                self.responses = {}
+                self.calls = []
+                self.ready = None
+            def asynccall(self, oid, method, args, kwargs):
+                self.calls.append((method, args))
+                return 7
+            def pollresponse(self, seq, wait):
+                return self.ready
+        class HyperParser:
+            def __init__(self, editwin, index):
+                pass
+            def is_in_code(self):
+                return True
+            def get_expression(self):
+                return '_ct_remote'
+        rpcclt = Rpcclt()
+        class Editwin:
+            text = Text()
+        editwin = Editwin()
+        editwin.flist = types.SimpleNamespace(pyshell=types.SimpleNamespace(
+            interp=types.SimpleNamespace(rpcclt=rpcclt, active_seq=None)))
+        orig_hp = ct.HyperParser
+        ct.HyperParser = HyperParser
+        self.addCleanup(setattr, ct, 'HyperParser', orig_hp)
+        calltips = ct.CallTips(editwin)
+        calltips.cursor_moved('1.1')
+        calltips.cursor_moved('1.2')
+        self.assertEqual(scheduled, [(calltips.prefetch, ())])
+        scheduled.pop()[0]()
+        self.assertEqual(rpcclt.calls, [('prefetch_calltip', ('_ct_remote',))])
+        self.assertIn(7, rpcclt.cvars)
+        func, args = scheduled.pop()
+        func(*args)  # Nothing yet.
+        func, args = scheduled.pop()
+        rpcclt.responses[7] = ('OK', '(x)')  # Read by another call.
+        func(*args)
+        self.assertEqual(scheduled, [])
+        self.assertEqual(rpcclt.cvars, {})
+        self.assertEqual(rpcclt.responses, {})
+        self.assertEqual(calltips.expression_cache, {'_ct_remote': '(x)'})
+        self.assertEqual(calltips.fetch_tip('_ct_remote'), '(x)')
+
+        # A tip that does not come is given up; None is not cached.
+        calltips.expression_cache.clear()
+        calltips.prefetch()
+        rpcclt.ready = ('OK', None)
+        for i in range(ct.PREFETCH_TRIES):
+            if not scheduled:
+                break
+            func, args = scheduled.pop()
+            func(*args)
+        self.assertEqual(calltips.expression_cache, {})
+        self.assertIsNone(calltips.pending)
+
 if __name__ == '__main__':
     unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,120 @@
+'''Test ChangeBus.py.'''
+
+import random
+import unittest
+from idlelib.ChangeBus import ChangeBus, Change, coalesce
+from idlelib.ShadowDelegator import ShadowDelegator
+from idlelib.idle_test.test_shadowdelegator import EndText
+
+
+class IdleText(EndText):
+    "Mock Text whose idle callbacks run when the test calls idle()."
+
+    def __init__(self):
+        EndText.__init__(self)
+        self.idle_calls = []
+
+    def after_idle(self, func):
+        self.idle_calls.append(func)
+        return 'after#%d' % len(self.idle_calls)
+
+    def after_cancel(self, id):
+        self.idle_calls = []
+
+    def idle(self):
+        calls, self.idle_calls = self.idle_calls, []
+        for func in calls:
+            func()
+
+
+def apply(chars, edit, new):
+    start, end, inserted = edit
+    assert len(new) == inserted
+    return chars[:start] + new + chars[end:]
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def test_examples(self):
+        # Typing 'ab' at 3.
+        self.assertEqual(coalesce((3, 3, 1), (4, 4, 1)), (3, 3, 2))
+        # Typing then backspacing.
+        self.assertEqual(coalesce((3, 3, 1), (3, 4, 0)), (3, 3, 0))
+        # Edits apart; the second is after the first.
+        self.assertEqual(coalesce((2, 4, 0), (6, 6, 3)), (2, 8, 7))
+        # The second is before the first.
+        self.assertEqual(coalesce((6, 6, 3), (1, 2, 0)), (1, 6, 7))
+
+    def test_random(self):
+        rand = random.Random(38)
+        for i in range(500):
+            old = ''.join(rand.choice('abc') for i in range(20))
+            chars = old
+            edit = None
+            for j in range(rand.randrange(1, 5)):
+                start = rand.randrange(len(chars) + 1)
+                end = rand.randrange(start, len(chars) + 1)
+                new = 'X' * rand.randrange(4)
+                step = start, end, len(new)
+                chars = apply(chars, step, new)
+                edit = step if edit is None else coalesce(edit, step)
+            start, end, inserted = edit
+            self.assertEqual(apply(old, edit, chars[start:start+inserted]),
+                             chars)
+
+
+class ChangeBusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.text = text = IdleText()
+        text.insert('1.0', 'one\ntwo\n')
+        self.shadow = shadow = ShadowDelegator()
+        shadow.setdelegate(text)
+        self.bus = bus = ChangeBus(text, shadow.buffer)
+        shadow.set_change_hook(bus.record)
+        self.changes = []
+        self.cursors = []
+        bus.subscribe(self.changes.append)
+        bus.subscribe_cursor(self.cursors.append)
+
+    def test_coalesced(self):
+        shadow, text = self.shadow, self.text
+        shadow.insert('1.3', 'X')
+        shadow.insert('1.4', 'Y')
+        shadow.delete('1.0')
+        self.assertEqual(self.changes, [])
+        self.assertEqual(len(text.idle_calls), 1)
+        text.idle()
+        version = shadow.buffer.version
+        self.assertEqual(self.changes, [Change(version, 0, 3, 4)])
+        text.idle()
+        self.assertEqual(len(self.changes), 1)
+
+    def test_cursor(self):
+        text, bus = self.text, self.bus
+        bus.poke()
+        bus.poke()
+        text.idle()
+        self.assertEqual(self.cursors, ['3.0'])
+        self.assertEqual(self.changes, [])
+        bus.poke()
+        text.idle()
+        self.assertEqual(self.cursors, ['3.0'])
+        text.insert('insert', 'x\n')  # Mock insert mark stays at end.
+        bus.poke()
+        text.idle()
+        self.assertEqual(self.cursors, ['3.0', '4.0'])
+
+    def test_unsubscribe_and_close(self):
+        self.bus.unsubscribe(self.changes.append)
+        self.shadow.insert('1.0', 'X')
+        self.text.idle()
+        self.assertEqual(self.changes, [])
+        self.shadow.insert('1.0', 'X')
+        self.bus.close()
+        self.assertEqual(self.text.idle_calls, [])
+        self.shadow.insert('1.0', 'X')  # Ignored after close.
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
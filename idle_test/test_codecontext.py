@@ -0,0 +1,93 @@
+'''Test IndentIndex in CodeContext.py.'''
+
+import random
+import unittest
+from idlelib import CodeContext as cc
+from idlelib.CodeContext import IndentIndex, line_info
+from idlelib.ChangeBus import Change
+from idlelib.ShadowDelegator import TextBuffer
+
+code = '''\
+class C:
+    def f(self):
+        if a:
+            pass
+        else:
+            x = 1
+
+    # comment
+    def g(self):
+        for i in x:
+            y = 2
+'''
+
+
+def scan_context(lines, topvisible):
+    # The original backward scan, one line at a time.
+    result = []
+    lastindent = cc.INFINITY
+    for linenum in range(topvisible, 0, -1):
+        indent, opener = line_info(lines[linenum - 1])
+        if indent < lastindent:
+            lastindent = indent
+            if opener in ("else", "elif"):
+                lastindent += 1
+            if opener and linenum < topvisible:
+                result.append((linenum, indent, opener))
+            if lastindent <= 0:
+                break
+    result.reverse()
+    return result
+
+
+class IndentIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chunk = cc.CHUNK
+        cc.CHUNK = 4  # Exercise many chunks with short texts.
+
+    def tearDown(self):
+        cc.CHUNK = self.chunk
+
+    def check(self, buffer, index):
+        lines = buffer.getlines(1, buffer.linecount() + 1)
+        for top in range(1, len(lines) + 1):
+            self.assertEqual(index.context(top), scan_context(lines, top))
+
+    def test_line_info(self):
+        self.assertEqual(line_info('    if x:'), (4, 'if'))
+        self.assertEqual(line_info('  x = 1'), (2, False))
+        self.assertEqual(line_info('  # if'), (cc.INFINITY, False))
+        self.assertEqual(line_info('   '), (cc.INFINITY, False))
+
+    def test_context(self):
+        index = IndentIndex(TextBuffer(code))
+        self.assertEqual(index.context(6), [(1, 0, 'class'), (2, 4, 'def'),
+                                            (3, 8, 'if'), (5, 8, 'else')])
+        self.assertEqual(index.context(9), [(1, 0, 'class')])
+        self.assertEqual(index.context(11), [(1, 0, 'class'), (9, 4, 'def'),
+                                             (10, 8, 'for')])
+        self.assertEqual(index.context(99), index.context(12))
+
+    def test_update(self):
+        rand = random.Random(39)
+        pieces = ['if x:\n', '    ', 'def f():\n', 'y\n', '\n', 'else:',
+                  '# c\n', '        pass\n']
+        chars = code * 3
+        buffer = TextBuffer(chars)
+        index = IndentIndex(buffer)
+        for i in range(300):
+            start = rand.randrange(len(chars) + 1)
+            end = min(len(chars), start + rand.choice((0, 0, 1, 6, 30)))
+            new = rand.choice(pieces) if rand.random() < 0.7 else ''
+            buffer.delete(buffer.position(start), buffer.position(end))
+            buffer.insert(*buffer.position(start), new)
+            chars = chars[:start] + new + chars[end:]
+            index.update(Change(buffer.version, start, end, len(new)))
+            self.assertEqual(index.indents[1:], [
+                line_info(line)[0] for line in chars.split('\n')])
+        self.check(buffer, index)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
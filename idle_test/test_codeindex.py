@@ -0,0 +1,195 @@
+"""Unit tests for idlelib.CodeIndex."""
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+from idlelib import CodeIndex
+from idlelib.CodeIndex import parse_source, completions, calltip
+
+
+def write(path, source):
+    with open(path, 'w') as f:
+        f.write(textwrap.dedent(source))
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_names(self):
+        info = parse_source(textwrap.dedent('''\
+            import os.path, sys as system
+            from . import sibling
+            __all__ = ['f', 'C']
+            x = y = 1
+            def f(a, b=2, *args, c, d=None, **kw):
+                "Do f."
+            class C(Base):
+                "A C."
+                def __init__(self, n):
+                    pass
+            try:
+                import json
+            except ImportError:
+                json = None
+            '''))
+        names = info.names
+        self.assertEqual(names['os'].kind, 'module')
+        self.assertEqual(names['os'].target[1:], (None, 'os'))
+        self.assertEqual(names['system'].target[1:], (None, 'sys'))
+        self.assertNotIn('sibling', names)  # Relative, with no file.
+        self.assertEqual(info.all, ['f', 'C'])
+        self.assertEqual(names['x'].kind, 'variable')
+        self.assertEqual(names['f'].signature,
+                         '(a, b=2, *args, c, d=None, **kw)')
+        self.assertEqual(names['f'].doc, 'Do f.')
+        self.assertEqual(names['C'].target[1], ('Base',))
+        self.assertEqual(names['C'].members['__init__'].signature,
+                         '(self, n)')
+        self.assertEqual(names['json'].kind, 'module')  # First one wins.
+
+    def test_repair(self):
+        info = parse_source('import os\nos.path.(\ndef f(): pass\n')
+        self.assertEqual(sorted(info.names), ['f', 'os'])
+        self.assertIsNone(parse_source('(\n' * 10))
+
+
+class ResolveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        root = self.tempdir.name
+        pkg = os.path.join(root, 'cipkg')
+        os.mkdir(pkg)
+        write(os.path.join(pkg, '__init__.py'), '''\
+            from .mod import *
+            from . import other
+            ''')
+        write(os.path.join(pkg, 'mod.py'), '''\
+            __all__ = ['Thing', 'make']
+            class Base:
+                def __init__(self, size, colour='red'):
+                    "Make a base."
+                def grow(self):
+                    pass
+            class Thing(Base):
+                "A thing."
+            def make(n=1):
+                "Make n things."
+            def _hidden():
+                pass
+            ''')
+        write(os.path.join(pkg, 'other.py'), 'def hello(): pass\n')
+        self.script = os.path.join(root, 'script.py')
+        self.info = parse_source(textwrap.dedent('''\
+            import cipkg
+            from cipkg.mod import Thing as T
+            import unknown_module_xyz
+            def local(a): pass
+            '''), self.script)
+
+    def tearDown(self):
+        CodeIndex._modules.clear()
+        self.tempdir.cleanup()
+
+    def test_completions(self):
+        smalll, bigl = completions(self.info, '')
+        self.assertIn('cipkg', smalll)
+        self.assertIn('local', smalll)
+        self.assertIn('len', smalll)
+        smalll, bigl = completions(self.info, 'cipkg')
+        self.assertEqual(smalll, ['Thing', 'make', 'other'])
+        smalll, bigl = completions(self.info, 'cipkg.mod')
+        self.assertEqual(smalll, ['Thing', 'make'])
+        self.assertIn('_hidden', bigl)
+        smalll, bigl = completions(self.info, 'T')
+        self.assertEqual(smalll, ['grow'])
+        self.assertIn('__init__', bigl)
+        self.assertEqual(completions(self.info, 'cipkg.other')[0], ['hello'])
+        # Unknown things are left to the subprocess.
+        self.assertIsNone(completions(self.info, 'unknown_module_xyz'))
+        self.assertIsNone(completions(self.info, 'local'))
+        self.assertIsNone(completions(self.info, 'cipkg.make()'))
+
+    def test_incomplete(self):
+        # Modules and classes with names not seen are left to the
+        # subprocess too.
+        root = self.tempdir.name
+        sys.path.insert(0, root)
+        self.addCleanup(sys.path.remove, root)
+        write(os.path.join(root, 'cistar.py'), '''\
+            from math import *
+            from cipkg.mod import *
+            ''')
+        write(os.path.join(root, 'cidynamic.py'), '''\
+            globals().update(RED=1)
+            ''')
+        write(os.path.join(root, 'ciall.py'), '''\
+            __all__ = ['RED', 'f']
+            def f(): pass
+            ''')
+        write(os.path.join(root, 'cifine.py'), '''\
+            from cipkg.mod import *
+            from cifine2 import *
+            class Sub(Thing):
+                pass
+            class Tuple(namedtuple('Tuple', 'a b')):
+                pass
+            ''')
+        write(os.path.join(root, 'cifine2.py'), '''\
+            def g():
+                return globals()
+            ''')
+        info = parse_source(textwrap.dedent('''\
+            import cistar, cidynamic, ciall, cifine
+            from cistar import *
+            '''), self.script)
+        self.assertIsNone(completions(info, 'cistar'))
+        self.assertIsNone(completions(info, 'cidynamic'))
+        self.assertIsNone(completions(info, 'ciall'))
+        self.assertIsNone(completions(info, 'cifine.Tuple'))
+        self.assertIsNone(completions(info, ''))
+        self.assertEqual(completions(info, 'cifine')[0],
+                         ['Sub', 'Thing', 'Tuple', 'g', 'make'])
+        self.assertEqual(completions(info, 'cifine.Sub')[0], ['grow'])
+        self.assertIsNone(calltip(info, 'cifine.Tuple'))
+
+    def test_calltip(self):
+        self.assertEqual(calltip(self.info, 'local'), ('(a)', None))
+        self.assertEqual(calltip(self.info, 'cipkg.make'),
+                         ('(n=1)', 'Make n things.'))
+        self.assertEqual(calltip(self.info, 'T'),
+                         ("(size, colour='red')", 'A thing.'))
+        self.assertEqual(calltip(self.info, 'cipkg.mod.Base.grow'),
+                         ('(self)', None))
+        self.assertIsNone(calltip(self.info, 'unknown_module_xyz.f'))
+
+    def test_cache(self):
+        filename = CodeIndex.find_module('cipkg.other', [self.tempdir.name])
+        info = CodeIndex.load_module(filename)
+        self.assertIs(CodeIndex.load_module(filename), info)
+        write(filename, 'def hello(name): pass\n')
+        os.utime(filename, ns=(0, 0))
+        self.assertIsNot(CodeIndex.load_module(filename), info)
+
+
+class BufferIndexTest(unittest.TestCase):
+
+    def test_current(self):
+        from idlelib.ShadowDelegator import TextBuffer
+
+        class Editwin:
+            buffer = TextBuffer('def f(x): pass\n')
+            io = None
+
+        index = CodeIndex.BufferIndex(Editwin)
+        info = index.current(wait=5)
+        self.assertIn('f', info.names)
+        Editwin.buffer.insert(2, 0, 'def g(): pass')
+        index.thread.join()
+        index.current(wait=0)
+        index.thread.join()
+        self.assertIn('g', index.current().names)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
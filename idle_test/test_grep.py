@@ -9,7 +9,10 @@ import unittest
 from test.support import captured_stdout
 from idlelib.idle_test.mock_tk import Var
 from idlelib.GrepDialog import GrepDialog
+from idlelib import GrepDialog as GrepDialog_mod
+import os
 import re
+import tempfile
 
 class Dummy_searchengine:
     '''GrepDialog.__init__ calls parent SearchDiabolBase which attaches the
@@ -28,6 +31,8 @@ class Dummy_grep:
     findfiles = GrepDialog.findfiles
     # Other stuff needed
     recvar = Var(False)
+    ignorevar = Var(True)
+    indexvar = Var(False)
     engine = searchengine
     def close(self):  # gui method
         pass
@@ -41,6 +46,120 @@ class FindfilesTest(unittest.TestCase):
     # test that recursive flag adds idle_test .py files
     pass
 
+class GrepJobTest(unittest.TestCase):
+    # Test the threaded search that grep_it and the dialog use.
+
+    def test_results_in_walk_order(self):
+        dir = os.path.dirname(__file__)
+        job = GrepDialog_mod.GrepJob(re.compile('^import unittest$'),
+                                     dir, 'test_*.py', False)
+        job.start()
+        results = list(job.results(block=True))
+        names = [fn for fn, hits, error in results]
+        self.assertEqual(names, sorted(names))
+        self.assertIn(__file__, names)
+        self.assertTrue(job.done())
+        self.assertEqual(job.searched, len(names))
+        self.assertEqual(job.hits, sum(len(hits) for _, hits, _ in results))
+
+    def test_cancel(self):
+        job = GrepDialog_mod.GrepJob(re.compile('x'),
+                                     os.path.dirname(__file__), '*', True)
+        job.start()
+        job.cancel()
+        self.assertTrue(job.done())
+        self.assertEqual(list(job.results(block=True)), [])
+
+
+class IterfilesTest(unittest.TestCase):
+    # Test pruning of ignored directories and files.
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.dir = self.tempdir.name
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def make(self, *paths, data=''):
+        for path in paths:
+            path = os.path.join(self.dir, *path.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(data)
+
+    def names(self, **kwds):
+        return [os.path.relpath(fn, self.dir).replace(os.sep, '/') for fn in
+                GrepDialog_mod.iterfiles(self.dir, '*.py', True, **kwds)]
+
+    def test_ignored_dirs(self):
+        self.make('a.py', '.git/b.py', '__pycache__/c.py', 'env/pyvenv.cfg',
+                  'env/d.py', 'sub/e.py')
+        self.assertEqual(self.names(), ['a.py', '.git/b.py',
+                         '__pycache__/c.py', 'env/d.py', 'sub/e.py'])
+        self.assertEqual(self.names(ignore=True), ['a.py', 'sub/e.py'])
+
+    def test_gitignore(self):
+        self.make('a.py', 'gen_a.py', 'keep_gen.py', 'build/b.py',
+                  'sub/gen_c.py', 'sub/d.py', 'sub/x/e.py', 'sub/y/x/g.py',
+                  'x/f.py')
+        self.make('.gitignore', data='# comment\ngen_*.py\nbuild/\n')
+        self.make('sub/.gitignore', data='/x\n!gen_c.py\n')
+        self.assertEqual(self.names(ignore=True),
+                         ['a.py', 'keep_gen.py', 'sub/d.py', 'sub/gen_c.py',
+                          'sub/y/x/g.py', 'x/f.py'])
+
+    def test_maxsize(self):
+        self.make('small.py', data='x')
+        self.make('big.py', data='x' * 100)
+        self.assertEqual(self.names(maxsize=10), ['small.py'])
+
+
+class Grep_fileTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.fn = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.fn)
+
+    def grep(self, pattern, data, flags=0):
+        with open(self.fn, 'wb') as f:
+            f.write(data)
+        return GrepDialog_mod.grep_file(re.compile(pattern, flags), self.fn)
+
+    def test_binary(self):
+        self.assertEqual(self.grep('x', b'x\n\0x\n'), [])
+
+    def test_text(self):
+        self.assertEqual(self.grep('b', b'a\nb\r\nab\n'),
+                         [(2, 'b'), (3, 'ab')])
+
+    def test_mmap(self):
+        # The same hits as searching line by line, with and without
+        # a bytes prefilter.
+        lines = [b'spam %d' % i for i in range(10)] * 20000
+        lines[5] = b'EGGS and ham'
+        lines[-1] = b'final eggs'
+        data = b'\n'.join(lines)
+        self.assertGreater(len(data), GrepDialog_mod.MMAP_SIZE)
+        self.assertEqual(self.grep('eggs', data, re.I),
+                         [(6, 'EGGS and ham'), (200000, 'final eggs')])
+        self.assertEqual(self.grep(r'^s.*am 9\b', data)[:2],
+                         [(10, 'spam 9'), (20, 'spam 9')])
+        self.assertEqual(len(self.grep(r'\bham$', data)), 1)
+
+    def test_bytes_prefilter(self):
+        prefilter = GrepDialog_mod.bytes_prefilter
+        self.assertEqual(prefilter('ab+cde', 0, 'utf-8').pattern, b'cde')
+        self.assertEqual(prefilter('^ab$', 0, 'utf-8').pattern, b'ab')
+        self.assertIsNone(prefilter('.*', 0, 'utf-8'))
+        self.assertIsNone(prefilter('abc', 0, 'utf-16'))
+        self.assertTrue(prefilter('kiss', re.I, 'utf-8').search(
+                        '\u212aI\u017fS'.encode('utf-8')))
+
+
 class Grep_itTest(unittest.TestCase):
     # Test captured reports with 0 and some hits.
     # Should test file names, but Windows reports have mixed / and \ separators
@@ -0,0 +1,167 @@
+"""Unit tests for idlelib.GrepIndex and its use by GrepDialog.GrepJob."""
+import os
+import re
+import tempfile
+from types import SimpleNamespace
+import unittest
+from idlelib import GrepIndex
+from idlelib import GrepDialog
+
+
+class TrigramsTest(unittest.TestCase):
+
+    def test_trigrams(self):
+        self.assertEqual(GrepIndex.trigrams(b'AbcD'), {b'abc', b'bcd'})
+        self.assertEqual(GrepIndex.trigrams(b'ab'), set())
+
+    def test_required_trigrams(self):
+        required = GrepDialog.required_trigrams
+        self.assertEqual(required('abcd', 0, 'utf-8'), {b'abc', b'bcd'})
+        self.assertEqual(required('^Ab.cde$', 0, 'utf-8'), {b'cde'})
+        self.assertEqual(required('abc|def', 0, 'utf-8'), set())
+        self.assertEqual(required('abcd', 0, 'utf-16'), set())
+        # 'k' and 's' can match non-ASCII characters when ignoring case.
+        self.assertEqual(required('desk', re.I, 'utf-8'), set())
+        self.assertEqual(required('desk', re.I, 'latin-1'),
+                         {b'des', b'esk'})
+
+
+class TrigramIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'index', 'root.idx')
+        self.index = GrepIndex.TrigramIndex(self.path, '/root')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def stat(self, mtime, size):
+        return SimpleNamespace(st_mtime_ns=mtime, st_size=size)
+
+    def test_lookup_and_candidates(self):
+        index = self.index
+        index.update('a', self.stat(1, 10), {b'abc', b'bcd'})
+        index.update('b', self.stat(1, 20), {b'abc'})
+        self.assertEqual(index.lookup('a', self.stat(1, 10)), 0)
+        self.assertIsNone(index.lookup('a', self.stat(2, 10)))
+        self.assertIsNone(index.lookup('c', self.stat(1, 10)))
+        self.assertEqual(index.candidates({b'abc'}), {0, 1})
+        self.assertEqual(index.candidates({b'abc', b'bcd'}), {0})
+        self.assertEqual(index.candidates({b'xyz'}), set())
+
+    def test_reindex(self):
+        index = self.index
+        index.update('a', self.stat(1, 10), {b'abc'})
+        index.update('a', self.stat(2, 10), {b'xyz'})
+        self.assertEqual(index.lookup('a', self.stat(2, 10)), 1)
+        self.assertEqual(index.dead, 1)
+        self.assertNotIn(1, index.candidates({b'abc'}))
+
+    def test_save_and_load(self):
+        index = self.index
+        index.update('a', self.stat(1, 10), {b'abc'})
+        index.save()
+        self.assertFalse(index.changed)
+        index = GrepIndex.TrigramIndex(self.path, '/root')
+        index.load()
+        self.assertEqual(index.lookup('a', self.stat(1, 10)), 0)
+        self.assertEqual(index.candidates({b'abc'}), {0})
+        # An index file for another root is not used.
+        index = GrepIndex.TrigramIndex(self.path, '/other')
+        index.load()
+        self.assertEqual(index.files, {})
+
+    def test_bad_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b'junk')
+        self.index.load()
+        self.assertEqual(self.index.files, {})
+
+    def test_prune(self):
+        index = self.index
+        index.update('a.py', self.stat(1, 10), {b'abc'})
+        index.update('b.py', self.stat(1, 10), {b'abc'})
+        index.update('c.txt', self.stat(1, 10), {b'abc'})
+        index.prune({'a.py'}, '*.py')
+        self.assertEqual(sorted(index.files), ['a.py', 'c.txt'])
+
+    def test_compact(self):
+        index = self.index
+        index.min_compact = 1
+        for mtime in range(3):
+            index.update('a', self.stat(mtime, 10), {b'abc'})
+        index.save()
+        self.assertEqual(index.files, {})
+        self.assertEqual(index.postings, {})
+
+
+class IndexedGrepJobTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tempdir.name, 'src')
+        os.mkdir(self.dir)
+        self.index = GrepIndex.get(self.dir, self.tempdir.name)
+        self.write('a.py', 'import spam\n')
+        self.write('b.py', 'import eggs\n')
+
+    def tearDown(self):
+        GrepIndex._indexes.clear()
+        self.tempdir.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.dir, name), 'w') as f:
+            f.write(data)
+
+    def grep(self, pattern):
+        job = GrepDialog.GrepJob(re.compile(pattern), self.dir, '*.py', True,
+                                 index=self.index)
+        job.start()
+        names = [os.path.basename(fn) for fn, hits, error
+                 in job.results(block=True) if hits]
+        job.thread.join()
+        return names, job.skipped
+
+    def test_repeat_search(self):
+        self.assertEqual(self.grep('spam'), (['a.py'], 0))
+        self.assertTrue(os.path.exists(self.index.path))
+        self.assertEqual(self.grep('spam'), (['a.py'], 1))
+        self.assertEqual(self.grep('eggs'), (['b.py'], 1))
+        # Patterns without literal text search every file.
+        self.assertEqual(self.grep('[se]'), (['a.py', 'b.py'], 0))
+
+    def test_changed_file(self):
+        self.grep('spam')
+        self.write('b.py', 'import spam, eggs\n')
+        os.utime(os.path.join(self.dir, 'b.py'), ns=(0, 0))
+        self.assertEqual(self.grep('spam'), (['a.py', 'b.py'], 0))
+        self.assertEqual(self.grep('spam'), (['a.py', 'b.py'], 0))
+        self.assertEqual(self.grep('eggs'), (['b.py'], 1))
+
+    def test_deleted_file(self):
+        self.grep('spam')
+        os.remove(os.path.join(self.dir, 'b.py'))
+        self.grep('spam')
+        self.assertEqual(sorted(self.index.files), ['a.py'])
+
+    def test_indexed_in_pieces(self):
+        # Trigrams spanning the pieces a file is read in are indexed.
+        mmap_size = GrepDialog.MMAP_SIZE
+        GrepDialog.MMAP_SIZE = 4
+        self.addCleanup(setattr, GrepDialog, 'MMAP_SIZE', mmap_size)
+        self.write('c.py', 'x = "aardvark"\n')
+        job = GrepDialog.GrepJob(re.compile('dva'), self.dir, '*.py', True,
+                                 index=self.index)
+        self.assertEqual(job._grep_indexed(os.path.join(self.dir, 'c.py'),
+                                           'c.py'), [(1, 'x = "aardvark"')])
+        with open(os.path.join(self.dir, 'c.py'), 'rb') as f:
+            data = f.read()
+        fid = self.index.files['c.py'][2]
+        self.assertEqual(self.index.candidates(GrepIndex.trigrams(data)),
+                         {fid})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
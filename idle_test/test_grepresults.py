@@ -0,0 +1,61 @@
+"""Unit tests for idlelib.GrepResults.GrepResults.
+
+GrepResultsWindow needs a display and is exercised by the GrepDialog
+htest.
+"""
+import re
+import unittest
+from idlelib.GrepResults import GrepResults, MAX_LINE
+
+
+class GrepResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.results = results = GrepResults()
+        prog = re.compile('spam')
+        results.add('a.py', [(1, 'import spam'), (5, 'spam = 1')], prog)
+        results.add('[Errno 13] Permission denied', [])
+        results.add('b.py', [(3, '  spam()')], prog)
+
+    def test_add(self):
+        results = self.results
+        self.assertEqual(len(results), 3)
+        self.assertEqual(list(results.rows), [-1, 0, 1, -2, -3, 2])
+        self.assertEqual(results.location(0), ('a.py', 1, 7, 4))
+        self.assertEqual(results.location(2), ('b.py', 3, 2, 4))
+
+    def test_toggle(self):
+        results = self.results
+        results.toggle(0)
+        self.assertEqual(list(results.rows), [-1, -2, -3, 2])
+        self.assertEqual(results.row_text(0), ('+ a.py (2)', None))
+        results.toggle(2)
+        self.assertEqual(list(results.rows), [-1, -2, -3])
+        results.toggle(0)
+        self.assertEqual(list(results.rows), [-1, 0, 1, -2, -3])
+        # New files are added expanded.
+        results.add('c.py', [(1, 'spam')])
+        self.assertEqual(list(results.rows), [-1, 0, 1, -2, -3, -4, 3])
+
+    def test_row_text(self):
+        results = self.results
+        self.assertEqual(results.row_text(0), ('- a.py (2)', None))
+        self.assertEqual(results.row_text(1), ('    1: import spam', (14, 18)))
+        self.assertEqual(results.row_text(3),
+                         ('[Errno 13] Permission denied', None))
+
+    def test_long_line(self):
+        results = GrepResults()
+        results.add('a.py', [(1, 'x' * 1000 + 'spam')], re.compile('spam'))
+        text, hit = results.row_text(1)
+        self.assertEqual(len(text), len('    1: ') + MAX_LINE)
+        self.assertEqual(hit, (len(text), len(text)))
+
+    def test_no_prog(self):
+        results = GrepResults()
+        results.add('a.py', [(1, 'spam')])
+        self.assertEqual(results.location(0), ('a.py', 1, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
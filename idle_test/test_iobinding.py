@@ -0,0 +1,198 @@
+'''Test StreamDecoder and saving in IOBinding.py.'''
+
+import os
+import tempfile
+import unittest
+from idlelib import IOBinding as iob
+from idlelib.IOBinding import StreamDecoder, WriteJob, encode_text
+from idlelib.IOBinding import write_atomic
+from idlelib.idle_test.mock_tk import Mbox
+
+
+class StreamDecoderTest(unittest.TestCase):
+
+    def decode(self, data, encoding='utf-8', size=3):
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.seek(0)
+            stream = StreamDecoder(f, encoding)
+            chunks = []
+            while not stream.done:
+                chunks.append(stream.read(size))
+                self.assertLessEqual(stream.progress(), 100)
+        return ''.join(chunks), stream
+
+    def test_eols(self):
+        # '\r\n' is split across chunks at every offset.
+        for size in range(1, 8):
+            chars, stream = self.decode(b'ab\r\ncd\re\nf\r', size=size)
+            self.assertEqual(chars, 'ab\ncd\ne\nf\n')
+            self.assertEqual(stream.eol, '\r\n')
+            self.assertFalse(stream.nonascii)
+
+    def test_multibyte(self):
+        text = 'caf\xe9 €\n' * 5
+        for size in range(1, 5):
+            chars, stream = self.decode(text.encode('utf-8'), size=size)
+            self.assertEqual(chars, text)
+            self.assertEqual(stream.eol, '\n')
+            self.assertTrue(stream.nonascii)
+        chars, stream = self.decode(text.encode('utf-16'), 'utf-16')
+        self.assertEqual(chars, text)
+
+    def test_error(self):
+        with self.assertRaises(UnicodeDecodeError):
+            self.decode(b'abc\xff\n', size=100)
+
+
+class StreamFailedTest(unittest.TestCase):
+    # What _stream_failed does when the rest of a file fails to decode.
+
+    class Dummy:
+        _stream_failed = iob.IOBinding._stream_failed
+        text = None
+        fileencoding = None
+
+        def __init__(self, saved):
+            self.filename = 'file.py'
+            self.saved = saved
+            self.loaded = None
+
+        def get_saved(self):
+            return self.saved
+
+        def set_saved(self, flag):
+            self.saved = flag
+
+        def set_filename(self, filename):
+            self.filename = filename
+
+        def loadwhole(self, filename):
+            self.loaded = filename
+
+    def setUp(self):
+        orig_mbox = iob.tkMessageBox
+        iob.tkMessageBox = Mbox
+        self.addCleanup(setattr, iob, 'tkMessageBox', orig_mbox)
+
+    def test_unedited(self):
+        dummy = self.Dummy(saved=True)
+        dummy._stream_failed()
+        self.assertEqual(dummy.loaded, 'file.py')
+
+    def test_edited(self):
+        dummy = self.Dummy(saved=False)
+        Mbox.askyesno.result = True
+        dummy._stream_failed()
+        self.assertEqual(dummy.loaded, 'file.py')
+
+        dummy = self.Dummy(saved=False)
+        Mbox.askyesno.result = False
+        dummy._stream_failed()
+        self.assertIsNone(dummy.loaded)
+        self.assertIsNone(dummy.filename)  # Saving can't cut the file short.
+        self.assertFalse(dummy.saved)
+
+
+class SaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.filename = os.path.join(self.tempdir.name, 'file.py')
+
+    def read(self, filename=None):
+        with open(filename or self.filename, 'rb') as f:
+            return f.read()
+
+    def test_encode_text(self):
+        self.assertEqual(encode_text('abc'), (b'abc', None))
+        self.assertEqual(encode_text('abc', 'BOM'), (b'\xef\xbb\xbfabc', None))
+        self.assertEqual(encode_text('# coding: latin-1\n\xe9'),
+                         (b'# coding: latin-1\n\xe9', None))
+        data, failed = encode_text('# coding: ascii\n\xe9')
+        self.assertEqual(data, b'\xef\xbb\xbf# coding: ascii\n\xc3\xa9')
+        self.assertEqual(failed, "Invalid encoding 'ascii'")
+
+    def test_write_atomic(self):
+        write_atomic(self.filename, b'old')
+        os.chmod(self.filename, 0o750)
+        link = os.path.join(self.tempdir.name, 'link.py')
+        os.symlink(self.filename, link)
+        write_atomic(link, b'new')
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(self.read(), b'new')
+        self.assertEqual(os.stat(self.filename).st_mode & 0o777, 0o750)
+        self.assertEqual(sorted(os.listdir(self.tempdir.name)),
+                         ['file.py', 'link.py'])
+
+    def test_failed_write(self):
+        write_atomic(self.filename, b'old')
+        os.chmod(self.tempdir.name, 0o500)
+        self.addCleanup(os.chmod, self.tempdir.name, 0o700)
+        if os.access(self.tempdir.name, os.W_OK):
+            self.skipTest('directory still writable (running as root?)')
+        with self.assertRaises(OSError):
+            write_atomic(self.filename, b'new')
+        self.assertEqual(self.read(), b'old')
+
+    def test_job(self):
+        job = WriteJob(self.filename, 'a\nb\n', '\r\n', None)
+        job.thread.start()
+        job.thread.join()
+        self.assertIsNone(job.error)
+        self.assertEqual(self.read(), b'a\r\nb\r\n')
+        job = WriteJob(os.path.join(self.filename, 'x'), 'a', '\n', None)
+        job.thread.start()
+        job.thread.join()
+        self.assertIsInstance(job.error, OSError)
+
+    def test_save_on_done(self):
+        # save() calls on_done once the text is saved, after _saved.
+        calls = []
+
+        class Dummy:
+            save = iob.IOBinding.save
+            filename = 'file.py'
+            text = type('Text', (), {'focus_set': lambda self: None})()
+
+            def start_write(self, filename, on_done=None):
+                self.on_done = on_done
+
+            def _saved(self, job):
+                calls.append('saved')
+
+        dummy = Dummy()
+        dummy.save(None)
+        self.assertEqual(dummy.on_done, dummy._saved)
+        dummy.save(None, lambda job: calls.append(job))
+        dummy.on_done('job')
+        self.assertEqual(calls, ['saved', 'job'])
+
+    def test_failed_job(self):
+        # Any error stops the save, and on_done is not called.
+        done = []
+
+        class Dummy:
+            finish_write = iob.IOBinding.finish_write
+            _ping_statusbar = iob.IOBinding._ping_statusbar
+            editwin = text = write_id = None
+
+        orig_mbox = iob.tkMessageBox
+        iob.tkMessageBox = Mbox
+        self.addCleanup(setattr, iob, 'tkMessageBox', orig_mbox)
+        job = WriteJob(self.filename, '# coding: rot13\n\xe9', '\n', None,
+                       done.append)
+        job.thread.start()
+        job.thread.join()
+        self.assertIsInstance(job.error, LookupError)
+        self.assertFalse(os.path.exists(self.filename))
+        dummy = Dummy()
+        dummy.writing = job
+        self.assertFalse(dummy.finish_write())
+        self.assertEqual(Mbox.showerror.title, 'I/O Error')
+        self.assertEqual(done, [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,161 @@
+'''Test MappedFile and PagedText in LargeFile.py.'''
+
+import os
+import random
+import re
+import tempfile
+import unittest
+from idlelib import LargeFile as lf
+from idlelib.LargeFile import MappedFile, PagedText
+from idlelib import SearchEngine
+
+
+class MappedFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.block = lf.BLOCK
+        lf.BLOCK = 8  # Exercise many blocks with short files.
+        self.files = []
+
+    def tearDown(self):
+        lf.BLOCK = self.block
+        for mapped in self.files:
+            mapped.close()
+
+    def mapped(self, data, encoding='utf-8', start=0):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.remove, f.name)
+        mapped = MappedFile(f.name, encoding, start)
+        self.files.append(mapped)
+        return mapped
+
+    def test_lines(self):
+        rand = random.Random(49)
+        for trial in range(20):
+            lines = [''.join(rand.choice('abé') for i in
+                             range(rand.randrange(20)))
+                     for j in range(rand.randrange(1, 40))]
+            chars = '\n'.join(lines)
+            mapped = self.mapped(chars.replace('\n', '\r\n').encode())
+            if rand.random() < 0.5:
+                mapped.thread.join()
+            for lno in range(1, len(lines) + 1):
+                self.assertEqual(mapped.get(lno, lno + 1),
+                                 lines[lno - 1] + '\n')
+            first = rand.randrange(1, len(lines) + 1)
+            last = rand.randrange(first, len(lines) + 3)
+            self.assertEqual(mapped.get(first, last),
+                             ''.join(line + '\n' for line in
+                                     lines[first - 1:last - 1]))
+            self.assertIsNone(mapped.offset(len(lines) + 1))
+            self.assertEqual(mapped.lastline(), len(lines))
+            self.assertEqual(mapped.linecount(), len(lines))
+
+    def test_bom(self):
+        mapped = self.mapped(b'\xef\xbb\xbfone\ntwo\n', start=3)
+        self.assertEqual(mapped.get(1, 4), 'one\ntwo\n\n')
+        self.assertEqual(mapped.get(3, 4), '\n')
+
+    def test_page(self):
+        rand = random.Random(49)
+        for trial in range(20):
+            lines = ['x' * rand.choice((0, 3, 5, 6, 7, 30))
+                     for j in range(rand.randrange(1, 40))]
+            mapped = self.mapped('\n'.join(lines).encode())
+            mapped.thread.join()
+            first = rand.randrange(1, len(lines) + 1)
+            shown, more = mapped.page(first, 10, size=40, width=6)
+            expect = [line if len(line) <= 6 else line[:6] + lf.CUT
+                      for line in lines[first - 1:first + 9]]
+            self.assertLessEqual(len(shown), 10)
+            read = sum(len(line.rstrip(lf.CUT)) for line in shown)
+            self.assertLess(read, 40 + 6)
+            self.assertEqual(shown, expect[:len(shown)])
+            self.assertEqual(more, first + len(shown) <= len(lines))
+        self.assertEqual(mapped.page(len(lines) + 1), ([], False))
+
+    def test_page_long_line(self):
+        # A file of one huge line is not read whole, nor indexed on.
+        mapped = self.mapped(b'x' * 1000 + b'\ny\n')
+        mapped.thread.join()
+        self.assertEqual(mapped.page(1, width=10),
+                         (['x' * 10 + lf.CUT, 'y', ''], False))
+        mapped.counts = [0]  # As if nothing was indexed.
+        self.assertEqual(mapped.page(1, width=10),
+                         (['x' * 10 + lf.CUT], None))
+        self.assertEqual(mapped.page(2), ([], None))
+        self.assertEqual(mapped.counts, [0])
+
+    def test_estimate(self):
+        mapped = self.mapped(b'x\n' * 50)
+        mapped.thread.join()
+        self.assertEqual(mapped.linecount(), 51)
+        mapped.counts = [0, 4]  # As if only the first block was indexed.
+        self.assertEqual(mapped.linecount(), 51)
+        self.assertEqual(mapped.progress(), 8)
+        self.assertEqual(mapped.indexed_lines(), 5)
+
+
+class PagedTextTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.lines = ['line %d%s' % (i, ' end' if i % 7 == 0 else '')
+                     for i in range(1, 301)]
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write('\n'.join(cls.lines).encode())
+        cls.filename = f.name
+
+        class Pager:
+            file = MappedFile(f.name)
+            text = None
+            first = 1
+            count = 0
+
+        Pager.file.thread.join()
+        cls.view = PagedText(Pager)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.view.pager.file.close()
+        os.remove(cls.filename)
+
+    def test_get(self):
+        get = self.view.get
+        self.assertEqual(get('1.0', '2.0'), 'line 1\n')
+        self.assertEqual(get('2.2', '3.3'), 'ne 2\nlin')
+        self.assertEqual(get('5.99', '6.1'), '\nl')
+        self.assertEqual(get('4.5'), '4')
+        self.assertEqual(get('300.0', '301.0'), 'line 300\n')
+        self.assertEqual(get('300.0', '400.0'), 'line 300\n')
+        self.assertEqual(get('301.0', '302.0'), '')
+        self.assertEqual(get('3.0', '2.0'), '')
+
+    def test_index(self):
+        self.assertEqual(self.view.index('end-1c'), '300.8')
+        self.assertEqual(self.view.index('end'), '301.0')
+        self.assertEqual(self.view.index('12.3'), '12.3')
+
+    def test_index_indexing(self):
+        # The end is not found by indexing the rest of the file.
+        file = self.view.pager.file
+        self.addCleanup(setattr, file, 'counts', file.counts)
+        file.counts = [0]
+        with self.assertRaises(lf.Indexing):
+            self.view.index('end-1c')
+        self.assertEqual(file.counts, [0])
+        self.assertEqual(self.view.index('12.3'), '12.3')
+
+    def test_search(self):
+        prog = re.compile('end')
+        self.assertEqual(SearchEngine.search_lines(self.view, prog, 8)[0],
+                         14)
+        self.assertEqual(SearchEngine.search_lines_backward(
+                self.view, prog, 1, 300)[0], 294)
+        self.assertIsNone(SearchEngine.search_lines(
+                self.view, re.compile('nowhere'), 1))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+'''Test paging of container children in ObjectBrowser.py.'''
+
+import unittest
+from idlelib import ObjectBrowser as ob
+
+
+class PagingTest(unittest.TestCase):
+
+    def test_small_sequence(self):
+        item = ob.make_objecttreeitem('x', [1, 2, 3])
+        sublist = item.GetSubList()
+        self.assertEqual([i.GetLabelText() for i in sublist],
+                         ['0:', '1:', '2:'])
+
+    def test_large_sequence(self):
+        n = ob.PAGE_SIZE * 2 + 5
+        item = ob.make_objecttreeitem('x', list(range(n)))
+        sublist = item.GetSubList()
+        self.assertEqual(len(sublist), ob.PAGE_SIZE + 1)
+        more = sublist[-1]
+        self.assertIsInstance(more, ob.MoreTreeItem)
+        self.assertEqual(more.GetText(), '… %d more' % (n - ob.PAGE_SIZE))
+
+        page = more._GetSubList()
+        self.assertEqual(page[0].GetText(), repr(ob.PAGE_SIZE))
+        last = page[-1]._GetSubList()
+        self.assertEqual(len(last), 5)
+        self.assertEqual(last[-1].GetText(), repr(n - 1))
+
+    def test_dict_keys_sorted_once(self):
+        d = {k: k for k in range(ob.PAGE_SIZE + 1, 0, -1)}
+        item = ob.make_objecttreeitem('d', d)
+        sublist = item.GetSubList()
+        self.assertEqual(sublist[0].GetLabelText(), '1:')
+        del d[ob.PAGE_SIZE + 1]  # Later pages use the saved key list.
+        page = sublist[-1].GetSubList()
+        self.assertEqual([i.GetText() for i in page],
+                         ['(1 no longer present)'])
+
+    def test_reexpand_after_change(self):
+        seq = list(range(ob.PAGE_SIZE + 5))
+        item = ob.make_objecttreeitem('x', seq)
+        self.assertEqual(item.GetSubList()[-1].GetText(), '\u2026 5 more')
+        seq.extend(range(10))
+        sublist = item.GetSubList()
+        self.assertEqual(sublist[-1].GetText(), '\u2026 15 more')
+        page = sublist[-1].GetSubList()
+        self.assertEqual(len(page), 15)
+        self.assertEqual(page[-1].GetText(), '9')
+
+    def test_key_label_bounded(self):
+        item = ob.make_objecttreeitem('d', {'k' * 1000: 1})
+        label = item.GetSubList()[0].GetLabelText()
+        self.assertLess(len(label), 200)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
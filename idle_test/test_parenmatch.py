@@ -2,11 +2,15 @@
 # This must currently be a gui test because ParenMatch methods use
 # several text methods not defined on idlelib.idle_test.mock_tk.Text.
 
+import random
 import unittest
 from unittest.mock import Mock
 from test.support import requires
 from tkinter import Tk, Text
-from idlelib.ParenMatch import ParenMatch
+from idlelib import ParenMatch as pm
+from idlelib.ParenMatch import ParenMatch, BracketIndex, scan_line
+from idlelib.ChangeBus import Change
+from idlelib.ShadowDelegator import TextBuffer
 
 class DummyEditwin:
     def __init__(self, text):
@@ -105,5 +109,82 @@ class ParenMatchTest(unittest.TestCase):
         self.assertFalse(pm.restore_event.called)
 
 
+def entries(index):
+    # The entries of all the lines of index, by line number.
+    return [None] + [entry for chunk in index.chunks for entry in chunk]
+
+def scan_pairs(index):
+    # Match all the brackets in index with a stack.
+    pairs = {}
+    stack = []
+    for line, (state, brackets, balance) in enumerate(entries(index)[1:], 1):
+        for col, c in brackets:
+            if c in '([{':
+                stack.append((line, col))
+            elif stack:
+                opener = stack.pop()
+                pairs[opener] = line, col
+                pairs[line, col] = opener
+    return pairs
+
+
+class BracketIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chunk = pm.CHUNK
+        pm.CHUNK = 4  # Exercise many chunks with short texts.
+
+    def tearDown(self):
+        pm.CHUNK = self.chunk
+
+    def test_scan_line(self):
+        self.assertEqual(scan_line('f(a, "(", [1]) # ('),
+                         ([(1, '('), (10, '['), (12, ']'), (13, ')')], ''))
+        self.assertEqual(scan_line('x = """a ('), ([], '"""'))
+        self.assertEqual(scan_line('b) """ + (1', '"""'), ([(9, '(')], ''))
+        self.assertEqual(scan_line("s = 'a\\"), ([], "'"))
+        self.assertEqual(scan_line("s = 'a\\\\"), ([], ''))
+        self.assertEqual(scan_line(r"r'\'' {}"), ([(6, '{'), (7, '}')], ''))
+
+    def test_match(self):
+        buffer = TextBuffer('f(a,\n  "(",\n  [b])\n)\n')
+        index = BracketIndex(buffer)
+        self.assertEqual(index.match(1, 1), (3, 5))
+        self.assertEqual(index.match(3, 5), (1, 1))
+        self.assertEqual(index.match(3, 2), (3, 4))
+        self.assertIsNone(index.match(4, 0))
+        self.assertEqual(index.enclosing(3, 3), ((3, 2), (3, 4)))
+        self.assertEqual(index.enclosing(2, 0), ((1, 1), (3, 5)))
+        self.assertEqual(index.enclosing(4, 1), (None, None))
+        self.assertIsNone(index.bracket_at(2, 3))  # In a string.
+
+    def test_update(self):
+        rand = random.Random(47)
+        pieces = ['(', ')', '[\n', ']', '{}', '"""', "'", '#', '\n', 'x\\']
+        chars = ''.join(rand.choice(pieces) for i in range(200))
+        buffer = TextBuffer(chars)
+        index = BracketIndex(buffer)
+        self.assertGreater(len(index.chunks), 4)
+        for i in range(300):
+            start = rand.randrange(len(chars) + 1)
+            end = min(len(chars), start + rand.choice((0, 0, 1, 6, 30)))
+            new = ''.join(rand.choice(pieces)
+                          for i in range(rand.choice((0, 1, 1, 4))))
+            buffer.delete(buffer.position(start), buffer.position(end))
+            buffer.insert(*buffer.position(start), new)
+            chars = chars[:start] + new + chars[end:]
+            index.update(Change(buffer.version, start, end, len(new)))
+            fresh = BracketIndex(buffer)
+            self.assertEqual(entries(index), entries(fresh))
+            self.assertEqual(index.tree[1], fresh.tree[1])
+            self.assertEqual(index.linecount(), buffer.linecount())
+        pairs = scan_pairs(index)
+        for line, (state, brackets, balance) in enumerate(entries(index)[1:],
+                                                          1):
+            for col, c in brackets:
+                self.assertEqual(index.match(line, col),
+                                 pairs.get((line, col)))
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,93 @@
+'''Test Checkpoints in PyParse.py.'''
+
+import random
+import unittest
+from idlelib import PyParse
+from idlelib.PyParse import Checkpoints, Parser
+from idlelib.ChangeBus import Change
+from idlelib.ShadowDelegator import TextBuffer
+
+code = '''\
+def f(a,
+      b):
+    s = """one
+two"""
+    x = 1 + \\
+        2
+
+#comment
+    return [
+        1, 2,
+    ]
+'''
+
+
+class CheckpointsTest(unittest.TestCase):
+
+    def test_stmt_start(self):
+        checkpoints = Checkpoints(TextBuffer(code))
+        starts = [checkpoints.stmt_start(lno) for lno in range(1, 14)]
+        self.assertEqual(starts, [1, 1, 3, 3, 5, 5, 5, 5, 9, 9, 9, 9, 9])
+        self.assertEqual(checkpoints.lines, [1, 3, 5, 7, 8, 9, 12])
+
+    def test_update(self):
+        rand = random.Random(46)
+        pieces = ['(\n', ')\n', '"""', '\\\n', 'x\n', '#c\n', '\n', "'"]
+        chars = code * 3
+        buffer = TextBuffer(chars)
+        checkpoints = Checkpoints(buffer)
+        for i in range(300):
+            start = rand.randrange(len(chars) + 1)
+            end = min(len(chars), start + rand.choice((0, 0, 1, 6, 30)))
+            new = rand.choice(pieces) if rand.random() < 0.7 else ''
+            buffer.delete(buffer.position(start), buffer.position(end))
+            buffer.insert(*buffer.position(start), new)
+            chars = chars[:start] + new + chars[end:]
+            checkpoints.update(Change(buffer.version, start, end, len(new)))
+            lno = rand.randrange(1, buffer.linecount() + 1)
+            fresh = Checkpoints(buffer)
+            self.assertEqual(checkpoints.stmt_start(lno),
+                             fresh.stmt_start(lno))
+            self.assertEqual([n for n in checkpoints.lines if n <= lno],
+                             fresh.lines)
+
+    def test_resume(self):
+        # Parsing from where resume() says finds what parsing the whole
+        # statement does, with edits in between.
+        span = PyParse.SPAN
+        PyParse.SPAN = 3
+        self.addCleanup(setattr, PyParse, 'SPAN', span)
+        rand = random.Random(47)
+        pieces = ['(\n', ')\n', '[', ']', '{ ', '"""', "'''", '\\\n',
+                  'x, ', 'y\n', '#c\n', '\n', '\t', '    ', ' # (\n']
+        chars = 'd = {\n' + '    1: [2,\n        3],\n' * 20
+        buffer = TextBuffer(chars)
+        checkpoints = Checkpoints(buffer)
+        continued = (PyParse.C_BRACKET, PyParse.C_STRING_FIRST_LINE,
+                     PyParse.C_STRING_NEXT_LINES)
+        for i in range(300):
+            start = rand.randrange(len(chars) + 1)
+            new = rand.choice(pieces)
+            buffer.insert(*buffer.position(start), new)
+            chars = chars[:start] + new + chars[start:]
+            checkpoints.update(Change(buffer.version, start, start, len(new)))
+            lno = rand.randrange(1, buffer.linecount() + 1)
+            line, prefix = checkpoints.resume(lno)
+            whole = Parser(4, 8)
+            whole.set_str('\n'.join(buffer.getlines(
+                    checkpoints.stmt_start(lno), lno + 1)) + '\n')
+            part = Parser(4, 8)
+            part.set_str(prefix + '\n'.join(buffer.getlines(line, lno + 1))
+                         + '\n')
+            found = part.get_continuation_type()
+            if prefix and found not in continued:
+                continue  # The caller parses the whole statement.
+            self.assertEqual(found, whole.get_continuation_type())
+            if found == PyParse.C_BRACKET:
+                self.assertEqual(part.compute_bracket_indent(),
+                                 whole.compute_bracket_indent())
+        self.assertTrue(checkpoints.marks)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
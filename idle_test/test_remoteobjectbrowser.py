@@ -0,0 +1,99 @@
+'''Test batched rendering info in RemoteObjectBrowser.py.'''
+
+import unittest
+from idlelib import AutoComplete
+from idlelib import rpc
+from idlelib import ObjectBrowser
+from idlelib import RemoteObjectBrowser as rob
+
+
+class LocalSockIO:
+    "Dispatch remotecall to the local objecttable, counting calls."
+
+    def __init__(self):
+        self.calls = []
+
+    def remotecall(self, oid, methodname, args, kwargs):
+        self.calls.append(methodname)
+        return getattr(rpc.objecttable[oid], methodname)(*args, **kwargs)
+
+
+class StubTest(unittest.TestCase):
+
+    def setUp(self):
+        self.value = {'a': 1, 'b': [2, 3], 'c': 'x'}
+        item = ObjectBrowser.make_objecttreeitem('d', self.value,
+                                                 lambda value: None)
+        self.sockio = LocalSockIO()
+        oid = rob.remote_object_tree_item(item)
+        self.stub = rob.StubObjectTreeItem(self.sockio, oid)
+
+    def test_render_info(self):
+        info = rpc.objecttable[self.stub.oid].GetRenderInfo(depth=0)
+        self.assertEqual(info['label'], 'd')
+        self.assertTrue(info['expandable'])
+        self.assertIsNone(info['children'])
+
+    def test_one_call_per_level(self):
+        stub = self.stub
+        self.assertTrue(stub._IsExpandable())
+        self.assertEqual(stub.GetLabelText(), 'd')
+        children = stub._GetSubList()
+        self.assertEqual(self.sockio.calls, ['GetRenderInfo'])
+
+        texts = [(c.GetLabelText(), c.GetText(), c._IsExpandable())
+                 for c in children]
+        self.assertEqual(texts, [("'a':", '1', 0),
+                                 ("'b':", '[2, 3]', True),
+                                 ("'c':", "'x'", 0)])
+        self.assertEqual(self.sockio.calls, ['GetRenderInfo'])
+
+        grandchildren = children[1]._GetSubList()
+        self.assertEqual([c.GetText() for c in grandchildren], ['2', '3'])
+        self.assertEqual(self.sockio.calls, ['GetRenderInfo'] * 2)
+
+    def test_settext_invalidates(self):
+        child = self.stub._GetSubList()[0]
+        self.assertEqual(child.GetText(), '1')
+        child.SetText('42')
+        self.assertEqual(self.value['a'], 42)
+        self.assertEqual(child.GetText(), '42')
+
+    def test_no_leak(self):
+        wrapper = rpc.objecttable[self.stub.oid]
+        first = wrapper.GetRenderInfo(depth=2)
+        size = len(rpc.objecttable)
+        for i in range(3):
+            self.assertEqual(wrapper.GetRenderInfo(depth=2), first)
+        self.assertEqual(len(rpc.objecttable), size)
+        child = self.stub._GetSubList()[1]
+        child.SetText('[4]')
+        self.assertEqual([c.GetText() for c in child._GetSubList()], ['4'])
+        self.assertEqual(len(rpc.objecttable), size - 1)
+
+    def test_reexpand_after_change(self):
+        children = self.stub._GetSubList()
+        oids = [c.oid for c in children]
+        size = len(rpc.objecttable)
+        self.value['b'] = [4]
+        self.value['e'] = 5
+        del self.value['a']
+        children = self.stub._GetSubList()
+        self.assertEqual(self.sockio.calls, ['GetRenderInfo'] * 2)
+        self.assertEqual([c.GetText() for c in children], ['[4]', "'x'", '5'])
+        # 'c' keeps its wrapper; those of 'a' and the old 'b' are dropped.
+        self.assertEqual(children[1].oid, oids[2])
+        self.assertNotIn(oids[0], rpc.objecttable)
+        self.assertNotIn(oids[1], rpc.objecttable)
+        self.assertEqual(len(rpc.objecttable), size)
+
+    def test_namespace_changed(self):
+        text = self.stub.GetText()
+        self.value['a'] = 2
+        self.assertEqual(self.stub.GetText(), text)
+        AutoComplete.namespace_changed()
+        self.assertIn("'a': 2", self.stub.GetText())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -100,6 +100,98 @@ class ReverseSearchTest(unittest.TestCase):
         Equal(se.search_reverse(prog, line, 7).span(), (5, 7))
         Equal(se.search_reverse(prog, line, 6), None)
 
+        # Spans from the last scan are reused for the same line and prog.
+        spans = se._match_spans(prog, line)
+        self.assertIs(se._match_spans(prog, line), spans)
+        Equal(list(spans[0]), [5, 12])
+
+        # Empty matches at the end of the line do not loop forever.
+        prog = re.compile('\w*')
+        Equal(se.search_reverse(prog, 'ab cd', 9).span(), (5, 5))
+
+
+class LineProgTest(unittest.TestCase):
+    # Test which patterns may be searched over many lines at once.
+    def test_line_prog(self):
+        for pat in ('target', r'\btarget\b', r'^\w+$', 'a.c', '[a-z]+\d*',
+                    'one|two', r'(ab)\1'):
+            self.assertIsNotNone(se.line_prog(pat, 0), pat)
+        self.assertEqual(se.line_prog('^x', 0).flags & re.MULTILINE,
+                         re.MULTILINE)
+        for pat in (r'\s+', '[^a]', r'\n', r'\W', r'(?=x)', r'(?<!x)y',
+                    r'\Ax', r'x\Z', '(?s).', '(?s:.)', '[+'):
+            self.assertIsNone(se.line_prog(pat, 0), pat)
+        self.assertIsNone(se.line_prog('.', re.DOTALL))
+
+
+class SearchLinesTest(unittest.TestCase):
+    # Test chunked searches over more lines than one chunk.
+
+    @classmethod
+    def setUpClass(cls):
+        cls.text = mockText()
+        lines = ['line %d' % i for i in range(1, 301)]
+        lines[199] = 'one target, two targets'
+        cls.text.insert('1.0', '\n'.join(lines) + '\n')
+
+    def test_search_lines(self):
+        Equal = self.assertEqual
+        for pat in ('target', r'\s+target'):  # chunk and per-line search
+            prog = re.compile(pat)
+            line, m = se.search_lines(self.text, prog, 1)
+            Equal((line, m.group().strip()), (200, 'target'))
+            Equal(se.search_lines(self.text, prog, 201), None)
+            Equal(se.search_lines(self.text, prog, 1, 200), None)
+
+            line, m = se.search_lines_backward(self.text, prog, 1, 302)
+            Equal((line, m.end()), (200, 22))
+            Equal(se.search_lines_backward(self.text, prog, 1, 200), None)
+            Equal(se.search_lines_backward(self.text, prog, 201, 302), None)
+
+    def test_findall(self):
+        for pat in ('t[a-z]*', r'\s*t[a-z]*\s*'):  # chunk and per-line search
+            found = se.LineIndex(self.text, 150, 250).findall(re.compile(pat))
+            self.assertEqual([(line, self.text.get('%d.%d' % (line, i),
+                                                   '%d.%d' % (line, j)).strip())
+                              for line, i, j in found],
+                             [(200, 'target'), (200, 'two'), (200, 'targets')])
+        self.assertEqual(se.LineIndex(self.text, 1, 3).findall(
+                         re.compile('x*')), [])
+
+
+class ReplaceHunksTest(unittest.TestCase):
+    # Test computing Replace All edits as hunks of whole lines.
+
+    def test_replace_hunks(self):
+        Equal = self.assertEqual
+        lines = ['a x', 'b', 'c x x'] + ['-'] * 20 + ['x']
+        prog = re.compile('x')
+        expand = lambda m: 'yy'
+        hunks, hit = se.replace_hunks(prog, expand, lines, 5)
+        Equal(hunks, [(5, 'a x\nb\nc x x', 'a yy\nb\nc yy yy'),
+                      (28, 'x', 'yy')])
+        Equal(hit, ('28.0', '28.2'))
+
+        hunks, hit = se.replace_hunks(prog, expand, lines[:3], 1, col=2)
+        Equal(hunks[0], (1, 'a x\nb\nc x x', 'a yy\nb\nc yy yy'))
+        hunks, hit = se.replace_hunks(prog, expand, lines[:3], 1, col=3)
+        Equal(hunks[0], (3, 'c x x', 'c yy yy'))
+        Equal(hit, ('3.5', '3.7'))
+
+    def test_multiline_replacement(self):
+        prog = re.compile('(a)')
+        hunks, hit = se.replace_hunks(prog, lambda m: m.expand(r'\1\n'),
+                                      ['xa', 'a'], 1)
+        self.assertEqual(hunks, [(1, 'xa\na', 'xa\n\na\n')])
+        self.assertEqual(hit, ('3.0', '4.0'))
+
+    def test_no_change(self):
+        prog = re.compile('b')
+        hunks, hit = se.replace_hunks(prog, lambda m: 'b', ['abc'], 1)
+        self.assertEqual((hunks, hit), ([], ('1.1', '1.2')))
+        hunks, hit = se.replace_hunks(prog, lambda m: 'b', ['xyz'], 1)
+        self.assertEqual((hunks, hit), ([], None))
+
 
 class SearchEngineTest(unittest.TestCase):
     # Test class methods that do not use Text widget.
@@ -179,6 +271,9 @@ class SearchEngineTest(unittest.TestCase):
         Equal(engine.getprog(), None)
         self.assertEqual(Mbox.showerror.message,
                          'Error: nothing to repeat at position 0\nPattern: +')
+        Mbox.showerror.message = None
+        Equal(engine.getprog(report=False), None)
+        Equal(Mbox.showerror.message, None)
 
     def test_report_error(self):
         showerror = Mbox.showerror
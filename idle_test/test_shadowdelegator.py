@@ -0,0 +1,113 @@
+'''Test TextBuffer and ShadowDelegator in ShadowDelegator.py.'''
+
+import random
+import unittest
+from idlelib import ShadowDelegator as sd
+from idlelib.ShadowDelegator import TextBuffer, ShadowDelegator
+from idlelib.idle_test.mock_tk import Text
+
+
+class TextBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.block_lines = sd.BLOCK_LINES
+        sd.BLOCK_LINES = 4  # Exercise many blocks with short texts.
+
+    def tearDown(self):
+        sd.BLOCK_LINES = self.block_lines
+
+    def check(self, buffer, chars):
+        lines = chars.split('\n')
+        self.assertEqual(len(buffer), len(chars))
+        self.assertEqual(buffer.linecount(), len(lines))
+        self.assertEqual(buffer.getlines(1, len(lines) + 1), lines)
+        offset = 0
+        for line, text in enumerate(lines, 1):
+            self.assertEqual(buffer.getline(line), text)
+            for col in (0, len(text)):
+                self.assertEqual(buffer.offset(line, col), offset + col)
+                self.assertEqual(buffer.position(offset + col), (line, col))
+            offset += len(text) + 1
+
+    def test_set(self):
+        for chars in ('', 'a', '\n', 'a\nb\n', '\n'.join('x' * 30)):
+            self.check(TextBuffer(chars), chars)
+
+    def test_get(self):
+        buffer = TextBuffer('one\ntwo\nthree')
+        self.assertEqual(buffer.get((1, 1), (1, 3)), 'ne')
+        self.assertEqual(buffer.get((1, 2), (3, 2)), 'e\ntwo\nth')
+        self.assertEqual(buffer.get((2, 0), (2, 0)), '')
+        self.assertEqual(buffer.getlines(0, 99), ['one', 'two', 'three'])
+
+    def test_version(self):
+        buffer = TextBuffer('abc')
+        version = buffer.version
+        buffer.insert(1, 1, 'x')
+        self.assertGreater(buffer.version, version)
+        version = buffer.version
+        buffer.delete((1, 0), (1, 2))
+        self.assertGreater(buffer.version, version)
+
+    def test_random_edits(self):
+        rand = random.Random(37)
+        chars = ''
+        buffer = TextBuffer(chars)
+        for i in range(500):
+            if chars and rand.random() < 0.4:
+                a = rand.randrange(len(chars) + 1)
+                b = min(len(chars), a + rand.choice((1, 5, 40)))
+                buffer.delete(buffer.position(a), buffer.position(b))
+                chars = chars[:a] + chars[b:]
+            else:
+                a = rand.randrange(len(chars) + 1)
+                new = rand.choice(('x', '\n', 'ab\ncd', '\n' * 9, 'y' * 7))
+                buffer.insert(*buffer.position(a), new)
+                chars = chars[:a] + new + chars[a:]
+            self.assertEqual(buffer.get((1, 0), buffer.position(len(chars))),
+                             chars)
+        self.check(buffer, chars)
+
+
+class EndText(Text):
+    "Mock Text with the 'end-1c' and 'index+1c' forms the delegator uses."
+
+    def index(self, index):
+        if index == 'end-1c':
+            return Text.index(self, 'insert')
+        if index.endswith('+1c'):
+            line, col = map(int, Text.index(self, index[:-3]).split('.'))
+            if col < len(self.data[line]) - 1 or line == len(self.data) - 1:
+                return '%d.%d' % (line, col + 1)
+            return '%d.0' % (line + 1)
+        return Text.index(self, index)
+
+    def insert(self, index, chars, tags=None):
+        Text.insert(self, index, chars)
+
+    def get(self, index1, index2=None):
+        return Text.get(self, self.index(index1),
+                        index2 and self.index(index2))
+
+
+class ShadowDelegatorTest(unittest.TestCase):
+
+    def test_edits(self):
+        text = EndText()
+        text.insert('1.0', 'one\ntwo\n')
+        shadow = ShadowDelegator()
+        shadow.setdelegate(text)
+        self.assertEqual(shadow.buffer.getlines(1, 9), ['one', 'two', ''])
+        shadow.insert('2.1', 'X\nY')
+        shadow.insert('end', 'end')
+        shadow.delete('1.0', '1.2')
+        shadow.delete('2.2')
+        expect = 'e\ntXYwo\nend'
+        self.assertEqual(text.get('1.0', 'end-1c'), expect)
+        buffer = shadow.buffer
+        self.assertEqual(buffer.get((1, 0), buffer.position(len(buffer))),
+                         expect)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
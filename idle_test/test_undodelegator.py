@@ -0,0 +1,132 @@
+'''Test undoable commands in UndoDelegator.py.'''
+
+import re
+import unittest
+from idlelib import UndoDelegator as ud
+from idlelib.UndoDelegator import ReplaceLinesCommand, InsertCommand
+from idlelib.idle_test.mock_tk import Text
+
+
+class MarkText(Text):
+    "Mock Text with the mark methods and the index forms the commands use."
+
+    def mark_names(self):
+        return ()
+
+    def mark_set(self, name, index):
+        pass
+
+    def see(self, index):
+        pass
+
+    def insert(self, index, chars, tags=None):
+        Text.insert(self, index, chars)
+
+    def bind(self, *args):
+        pass
+
+    unbind = bind
+
+    def index(self, index):
+        # Add 'end-1c' and 'index+Nc' within a line or onto the next.
+        m = re.fullmatch(r'(.*?) *([+-]\d+)c', index)
+        if not m:
+            return Text.index(self, index)
+        if m.group(1, 2) == ('end', '-1'):
+            return Text.index(self, 'insert')  # Before the final newline.
+        line, col = map(int, Text.index(self, m.group(1)).split('.'))
+        col += int(m.group(2))
+        if col > len(self.data[line]) - 1 and line < len(self.data) - 1:
+            line, col = line + 1, 0  # Past the newline.
+        return '%d.%d' % (line, col)
+
+    def compare(self, index1, op, index2):
+        return Text.compare(self, self.index(index1), op, self.index(index2))
+
+
+class ReplaceLinesCommandTest(unittest.TestCase):
+
+    def test_do_undo_redo(self):
+        Equal = self.assertEqual
+        text = MarkText()
+        orig = 'one x\ntwo\nthree x\nfour\nx\n'
+        text.insert('1.0', orig)
+        hunks = [(1, 'one x', 'one y\nz'), (3, 'three x\nfour\nx', 'three y')]
+        cmd = ReplaceLinesCommand(hunks)
+
+        cmd.do(text)
+        new = 'one y\nz\ntwo\nthree y\n'
+        Equal(text.get('1.0', 'end'), new + '\n')
+        Equal(cmd.inverse(), [(1, 'one y\nz', 'one x'),
+                              (4, 'three y', 'three x\nfour\nx')])
+        cmd.undo(text)
+        Equal(text.get('1.0', 'end'), orig + '\n')
+        cmd.redo(text)
+        Equal(text.get('1.0', 'end'), new + '\n')
+
+
+class PackTest(unittest.TestCase):
+
+    def test_pack(self):
+        small = 'x' * 100
+        self.assertIs(ud.pack(small), small)
+        large = 'spam\n' * ud.PACK_SIZE
+        packed = ud.pack(large)
+        self.assertIsInstance(packed, bytes)
+        self.assertLess(len(packed), len(large) // 100)
+        self.assertEqual(ud.unpack(packed), large)
+        hunks = [(1, large, 'eggs')]
+        self.assertEqual(ud.unpack(ud.pack(hunks)), hunks)
+
+    def test_packed_command(self):
+        large = 'spam\n' * ud.PACK_SIZE
+        cmd = InsertCommand('1.0', large)
+        self.assertEqual(cmd.chars, large)
+        self.assertLess(cmd.size(), len(large) // 100)
+        self.assertFalse(hasattr(cmd, '__dict__'))
+
+
+class UndoDelegatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.text = MarkText()
+        self.undo = ud.UndoDelegator()
+        self.undo.setdelegate(self.text)
+
+    def test_typing_run(self):
+        undo, text = self.undo, self.text
+        for c in 'abc de':
+            undo.insert('insert', c)
+        self.assertEqual(text.get('1.0', 'end'), 'abc de\n')
+        self.assertEqual([cmd.chars for cmd in undo.undolist],
+                         ['abc', ' ', 'de'])
+        self.assertEqual(undo.undo_bytes,
+                         sum(cmd.size() for cmd in undo.undolist))
+        undo.undo_event(None)
+        self.assertEqual(text.get('1.0', 'end'), 'abc \n')
+        undo.insert('insert', 'x')  # No merge after undo.
+        self.assertEqual([cmd.chars for cmd in undo.undolist],
+                         ['abc', ' ', 'x'])
+
+    def test_byte_budget(self):
+        undo, text = self.undo, self.text
+        text.insert('1.0', 'line\n' * 10)
+        undo.set_saved(True)
+        undo.max_undo_bytes = 3 * ud.COMMAND_SIZE + 1000
+        for i in range(1, 11):
+            undo.replace_lines([(i, 'line', 'x' * 100)])
+        size = undo.undolist[0].size()
+        self.assertEqual(len(undo.undolist),
+                         undo.max_undo_bytes // size)
+        self.assertEqual(undo.pointer, len(undo.undolist))
+        self.assertEqual(undo.saved, -1)
+        self.assertEqual(undo.undo_bytes,
+                         sum(cmd.size() for cmd in undo.undolist))
+        # The newest command is kept even if over budget.
+        undo.max_undo_bytes = 0
+        undo.replace_lines([(1, 'x' * 100, 'y')])
+        self.assertEqual(len(undo.undolist), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
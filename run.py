@@ -351,6 +351,7 @@ class Executive(object):
                 exec(code, self.locals)
             finally:
                 interruptable = False
+                AutoComplete.namespace_changed()
         except SystemExit:
             # Scripts that raise SystemExit should just
             # return to the interactive prompt
@@ -381,9 +382,18 @@ class Executive(object):
     def get_the_calltip(self, name):
         return self.calltip.fetch_tip(name)
 
+    def prefetch_calltip(self, name):
+        "Return the calltip for name if it is defined, else None."
+        if CallTips.is_defined(name):
+            return self.calltip.fetch_tip(name)
+        return None
+
     def get_the_completion_list(self, what, mode):
         return self.autocomplete.fetch_completions(what, mode)
 
+    def get_the_file_completions(self, what):
+        return self.autocomplete.file_completions(what)
+
     def stackviewer(self, flist_oid=None):
         if self.usr_exc_info:
             typ, val, tb = self.usr_exc_info
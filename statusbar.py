@@ -26,9 +26,11 @@ class Statusbar(Frame):
         self.after_idle(self.update)
         
     def update(self):
-        line, column = self.component.text.index(INSERT).split('.')
+        line, column = self.component.file_text().index(INSERT).split('.')
         self.set_label('column', 'Col: %s' % column)
         self.set_label('line', 'Ln: %s' % line)
+        io = getattr(self.component, 'io', None)
+        self.set_label('load', io.load_status() if io else '', side=RIGHT)
 
     def set_label(self, name, text='', side=LEFT, width=0):
         if name not in self.labels:
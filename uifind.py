@@ -1,9 +1,14 @@
 from tkinter import *
 from tkinter import ttk
+from idlelib import GrepIndex
+from idlelib import LargeFile
+from idlelib.GrepResults import GrepResultsWindow
 from idlelib import SearchEngine
+from idlelib.GrepDialog import GrepJob, iterfiles
+from idlelib.GrepDialog import format_hits, summary
+import bisect
 import re
 import os
-import fnmatch
 import sys
 
 class SearchDialogBase:
@@ -203,14 +208,242 @@ def find_selection(text):
 
 class SearchDialog(SearchDialogBase):
 
+    # Find as you type.  When the pattern or an option changes and typing
+    # pauses for debounce_ms, the first match from where the search began
+    # is selected.  Matches in the visible lines, and margin lines either
+    # side, are tagged "findmatch"; the tags follow the view when it
+    # scrolls.  All matches are counted in slices of slice_lines lines
+    # between Tk events, to show "k of N".  So the work done for each
+    # keystroke is bounded, however long the text.  The editor's
+    # ChangeBus, text.changes, says when the view moves or the text is
+    # edited; a text without one is tagged only when searched.
+
+    debounce_ms = 150
+    margin = 50
+    slice_lines = 2000
+
+    def __init__(self, root, engine):
+        SearchDialogBase.__init__(self, root, engine)
+        self.incvar = BooleanVar(root, True)
+        self.origin = None  # Index where find as you type starts.
+        self.prog = None  # Pattern being highlighted and counted.
+        self.selected = False  # Whether a match of prog was selected.
+        self.matches = None  # Sorted (line, col) of all matches, once counted.
+        self.view = None  # Lines [first, last) tagged.
+        self.after_id = self.count_id = None
+        self.changes = None  # ChangeBus subscribed to.
+
     def create_widgets(self):
         SearchDialogBase.create_widgets(self)
+        frame = self.make_frame()[0]
+        btn = ttk.Checkbutton(frame, variable=self.incvar,
+                              text="Find as you type")
+        btn.pack(side="left")
+        self.countlabel = ttk.Label(frame)
+        self.countlabel.pack(side="right")
         self.make_button("Find Next", self.default_command, 1)
+        engine = self.engine
+        for var in (engine.patvar, engine.revar, engine.casevar,
+                    engine.wordvar, self.incvar):
+            var.trace_variable('w', self.pattern_changed)
+
+    def open(self, text, searchphrase=None):
+        if self.top and text is not getattr(self, 'text', text):
+            self.clear()
+        self.origin = SearchEngine.get_selection(text)[0]
+        SearchDialogBase.open(self, text, searchphrase)
+        self.pattern_changed()
+        changes = getattr(text, 'changes', None)
+        if changes is not self.changes:
+            self.unsubscribe()
+            if changes is not None:
+                changes.subscribe(self.text_changed)
+                changes.subscribe_view(self.view_changed)
+            self.changes = changes
+
+    def close(self, event=None):
+        SearchDialogBase.close(self, event)
+        if self.top:
+            if self.after_id is not None:
+                self.top.after_cancel(self.after_id)
+                self.after_id = None
+            self.unsubscribe()
+            self.clear()
+
+    def unsubscribe(self):
+        changes, self.changes = self.changes, None
+        if changes is not None and changes.text is not None:  # Not closed.
+            changes.unsubscribe(self.text_changed)
+            changes.unsubscribe_view(self.view_changed)
+
+    def pattern_changed(self, *args):
+        "Search again once typing pauses."
+        if not self.top:
+            return
+        if self.after_id is not None:
+            self.top.after_cancel(self.after_id)
+        self.after_id = self.top.after(self.debounce_ms,
+                                       self.incremental_search)
+
+    def incremental_search(self):
+        self.after_id = None
+        self.clear()
+        if not self.incvar.get() or self.top.state() != "normal":
+            return
+        prog = self.engine.getprog(report=False)
+        if prog is None:
+            return
+        self.prog = prog
+        self.tag_view()
+        self.countlabel.config(text="Counting...")
+        self.count_id = self.top.after(1, self.count_slice, prog, 1, [])
+
+    def clear(self):
+        "Stop counting and remove the match tags."
+        if self.count_id is not None:
+            self.top.after_cancel(self.count_id)
+            self.count_id = None
+        self.prog = None
+        self.selected = False
+        self.matches = None
+        self.view = None
+        if self.top:
+            self.countlabel.config(text="")
+        text = getattr(self, 'text', None)
+        if text is not None:
+            text.tag_remove("findmatch", "1.0", "end")
+
+    def visible_lines(self):
+        text = self.text
+        first = int(text.index("@0,0").split(".")[0])
+        last = int(text.index("@0,%d" % text.winfo_height()).split(".")[0])
+        return first, last
+
+    def tag_view(self):
+        "Tag the matches near the visible lines."
+        text = self.text
+        prog = self.prog
+        first, last = self.visible_lines()
+        first = max(1, first - self.margin)
+        last = last + self.margin + 1
+        found = SearchEngine.LineIndex(text, first, last).findall(prog)
+        text.tag_remove("findmatch", "1.0", "end")
+        text.tag_configure("findmatch",
+                           foreground=text.tag_cget("hit", "foreground"),
+                           background=text.tag_cget("hit", "background"))
+        text.tag_lower("findmatch", "sel")
+        for line, i, j in found:
+            text.tag_add("findmatch", "%d.%d" % (line, i), "%d.%d" % (line, j))
+        self.view = first, last
+        if not self.selected:
+            # The first match from the origin is known if it is in view.
+            line, col = SearchEngine.get_line_col(self.origin)
+            if first <= line < last:
+                starts = [(line, i) for line, i, j in found]
+                self.select_from(starts, found, wrap=False)
+
+    def view_changed(self):
+        "Tag the matches that scrolled into view."
+        if self.prog is not None and self.view is not None:
+            first, last = self.visible_lines()
+            if first < self.view[0] or last >= self.view[1]:
+                self.tag_view()
+
+    def text_changed(self, change):
+        "Tag and count the matches again, keeping the selection."
+        if self.prog is None:
+            return
+        if getattr(self.text, 'pager', None) is not None:
+            self.tag_view()  # A read-only file was paged; counts hold.
+            return
+        if self.count_id is not None:
+            self.top.after_cancel(self.count_id)
+        self.matches = None
+        self.tag_view()
+        self.countlabel.config(text="Counting...")
+        self.count_id = self.top.after(1, self.count_slice, self.prog, 1, [])
+
+    def count_slice(self, prog, line, starts):
+        # Count the matches in the next slice of lines, then reschedule.
+        text = self.text
+        indexing = False
+        try:
+            end = int(text.index("end").split(".")[0])
+        except LargeFile.Indexing:
+            # Count the lines indexed so far, then wait for more.
+            end = text.pager.file.indexed_lines()
+            indexing = True
+        last = min(line + self.slice_lines, end)
+        found = SearchEngine.LineIndex(text, line, last).findall(prog)
+        starts.extend((line, i) for line, i, j in found)
+        if last < end or indexing:
+            delay = 1 if last < end else LargeFile.POLL
+            self.count_id = self.top.after(delay, self.count_slice, prog,
+                                           last, starts)
+            return
+        self.count_id = None
+        self.matches = starts
+        if not self.selected:
+            self.select_from(starts, None, wrap=self.engine.iswrap())
+        self.show_count()
+
+    def select_from(self, starts, found, wrap):
+        """Select the match of prog that a search from origin finds.
+
+        starts is the sorted list of (line, col) of the candidate
+        matches; found, if not None, the matching (line, start, end).
+        """
+        origin = SearchEngine.get_line_col(self.origin)
+        if self.engine.isback():
+            k = bisect.bisect_right(starts, origin) - 1
+            if k < 0 and wrap and starts:
+                k = len(starts) - 1
+        else:
+            k = bisect.bisect_left(starts, origin)
+            if k == len(starts) and wrap and starts:
+                k = 0
+        if not 0 <= k < len(starts):
+            return
+        if found is not None:
+            line, i, j = found[k]
+        else:
+            line, i = starts[k]
+            m = self.prog.match(self.text.get("%d.0" % line,
+                                              "%d.0 lineend" % line), i)
+            j = m.end() if m else i
+        first = "%d.%d" % (line, i)
+        last = "%d.%d" % (line, j)
+        text = self.text
+        text.tag_remove("sel", "1.0", "end")
+        text.tag_add("sel", first, last)
+        text.mark_set("insert", self.engine.isback() and first or last)
+        text.see("insert")
+        self.selected = True
+
+    def show_count(self):
+        "Show which of all the matches is selected."
+        if self.matches is None:
+            return
+        total = len(self.matches)
+        if not total:
+            self.countlabel.config(text="No matches")
+            return
+        first = SearchEngine.get_selection(self.text)[0]
+        pos = SearchEngine.get_line_col(first)
+        k = bisect.bisect_left(self.matches, pos)
+        if k < total and self.matches[k] == pos:
+            self.countlabel.config(text="%d of %d" % (k + 1, total))
+        else:
+            self.countlabel.config(text="%d matches" % total)
 
     def default_command(self, event=None):
         if not self.engine.getprog():
             return
-        self.find_again(self.text)
+        if self.find_again(self.text):
+            self.origin = SearchEngine.get_selection(self.text)[0]
+            if self.prog is not None:
+                self.selected = True
+                self.show_count()
 
     def find_again(self, text):
         if not self.engine.getpat():
@@ -218,7 +451,13 @@ class SearchDialog(SearchDialogBase):
             return False
         if not self.engine.getprog():
             return False
-        res = self.engine.search_text(text)
+        try:
+            res = self.engine.search_text(text)
+        except LargeFile.Indexing:
+            # A search wrapping to the end of a large file: search once
+            # the end is known.  The status bar shows the progress.
+            text.pager.when_indexed(lambda: self.find_again(text))
+            return False
         if res:
             line, m = res
             i, j = m.span()
@@ -345,36 +584,21 @@ class ReplaceDialog(SearchDialogBase):
         if self.engine.iswrap():
             line = 1
             col = 0
-        ok = 1
-        first = last = None
+        if self._replace_expand(res[1], repl) is None:
+            return  # Bad replace expression, already reported.
+        if self.engine.isre():
+            expand = lambda m: m.expand(repl)
+        else:
+            expand = lambda m: repl
         # XXX ought to replace circular instead of top-to-bottom when wrapping
-        text.undo_block_start()
-        while 1:
-            res = self.engine.search_forward(text, prog, line, col, 0, ok)
-            if not res:
-                break
-            line, m = res
-            chars = text.get("%d.0" % line, "%d.0" % (line+1))
-            orig = m.group()
-            new = self._replace_expand(m, repl)
-            if new is None:
-                break
-            i, j = m.span()
-            first = "%d.%d" % (line, i)
-            last = "%d.%d" % (line, j)
-            if new == orig:
-                text.mark_set("insert", last)
-            else:
-                text.mark_set("insert", first)
-                if first != last:
-                    text.delete(first, last)
-                if new:
-                    text.insert(first, new)
-            col = i + len(new)
-            ok = 0
-        text.undo_block_stop()
-        if first and last:
-            self.show_hit(first, last)
+        # Compute the new text in Python, then apply the changed lines
+        # as a single undoable edit.
+        lines = text.get("%d.0" % line, "end-1c").split("\n")
+        hunks, hit = SearchEngine.replace_hunks(prog, expand, lines, line, col)
+        if hunks:
+            text.replace_lines(hunks)
+        if hit:
+            self.show_hit(*hit)
         self.close()
 
     def do_find(self, ok=0):
@@ -443,9 +667,6 @@ class ReplaceDialog(SearchDialogBase):
 
 ############################## GREP ##############################
 
-# Importing OutputWindow fails due to import loop
-# EditorWindow -> GrepDialop -> OutputWindow -> EditorWindow
-
 def grep(text, io=None, flist=None):
     root = text._root()
     engine = SearchEngine.get(root)
@@ -466,6 +687,8 @@ class GrepDialog(SearchDialogBase):
         self.flist = flist
         self.globvar = StringVar(root)
         self.recvar = BooleanVar(root)
+        self.ignorevar = BooleanVar(root, True)
+        self.indexvar = BooleanVar(root, False)
 
     def open(self, text, searchphrase, io=None):
         SearchDialogBase.open(self, text, searchphrase)
@@ -492,6 +715,17 @@ class GrepDialog(SearchDialogBase):
         btn.pack(side="top", fill="both")
         btn.select()
 
+        btn = Checkbutton(f, anchor="w",
+                variable=self.ignorevar,
+                text="Skip ignored files (.gitignore, .git, __pycache__, ...)")
+        btn.pack(side="top", fill="both")
+        btn.select()
+
+        btn = Checkbutton(f, anchor="w",
+                variable=self.indexvar,
+                text="Use search index (faster repeat searches)")
+        btn.pack(side="top", fill="both")
+
     def create_command_buttons(self):
         SearchDialogBase.create_command_buttons(self)
         self.make_button("Search Files", self.default_command, 1)
@@ -504,61 +738,37 @@ class GrepDialog(SearchDialogBase):
         if not path:
             self.top.bell()
             return
-        from idlelib.OutputWindow import OutputWindow  # leave here!
-        save = sys.stdout
-        try:
-            sys.stdout = OutputWindow(self.flist)
-            self.grep_it(prog, path)
-        finally:
-            sys.stdout = save
+        self.close()
+        dir, base = os.path.split(path)
+        index = GrepIndex.get(dir) if self.indexvar.get() else None
+        job = GrepJob(prog, dir, base, self.recvar.get(),
+                      self.ignorevar.get(), index)
+        GrepResultsWindow(self.flist, job, self.engine.getpat(), path)
 
     def grep_it(self, prog, path):
+        "Search files matching path for prog, printing hits to sys.stdout."
         dir, base = os.path.split(path)
-        list = self.findfiles(dir, base, self.recvar.get())
-        list.sort()
         self.close()
         pat = self.engine.getpat()
         print("Searching %r in %s ..." % (pat, path))
-        hits = 0
+        index = GrepIndex.get(dir) if self.indexvar.get() else None
+        job = GrepJob(prog, dir, base, self.recvar.get(),
+                      self.ignorevar.get(), index)
+        job.start()
         try:
-            for fn in list:
-                try:
-                    with open(fn, errors='replace') as f:
-                        for lineno, line in enumerate(f, 1):
-                            if line[-1:] == '\n':
-                                line = line[:-1]
-                            if prog.search(line):
-                                sys.stdout.write("%s: %s: %s\n" %
-                                                 (fn, lineno, line))
-                                hits += 1
-                except OSError as msg:
-                    print(msg)
-            print(("Hits found: %s\n"
-                  "(Hint: right-click to open locations.)"
-                  % hits) if hits else "No hits.")
+            for fn, hits, error in job.results(block=True):
+                sys.stdout.write(format_hits(fn, hits, error))
+            print(summary(job))
         except AttributeError:
             # Tk window has been closed, OutputWindow.text = None,
             # so in OW.write, OW.text.insert fails.
-            pass
+            job.cancel()
 
     def findfiles(self, dir, base, rec):
-        try:
-            names = os.listdir(dir or os.curdir)
-        except OSError as msg:
+        errors = []
+        list = [fn for fn in iterfiles(dir, base, rec, errors.append)]
+        for msg in errors:
             print(msg)
-            return []
-        list = []
-        subdirs = []
-        for name in names:
-            fn = os.path.join(dir, name)
-            if os.path.isdir(fn):
-                subdirs.append(fn)
-            else:
-                if fnmatch.fnmatch(name, base):
-                    list.append(fn)
-        if rec:
-            for subdir in subdirs:
-                list.extend(self.findfiles(subdir, base, rec))
         return list
 
     def close(self, event=None):
@@ -604,9 +814,14 @@ def _replace_dialog(parent):
     def undo_block_stop():
         pass
 
+    def replace_lines(hunks):
+        from idlelib.UndoDelegator import ReplaceLinesCommand
+        ReplaceLinesCommand(hunks).do(text)
+
     text = Text(root)
     text.undo_block_start = undo_block_start
     text.undo_block_stop = undo_block_stop
+    text.replace_lines = replace_lines
     text.pack()
     text.insert("insert","This is a sample string.\n"*10)
 